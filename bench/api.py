@@ -0,0 +1,194 @@
+"""Latency of the API hot paths on seeded catalogs of different size, stored as JSON and compared between runs.
+
+Usage (from the repository root):
+
+    python -m bench.api run [--scales 1k 100k 1M] [--requests 200] [--output bench-api.json]
+    python -m bench.api compare BASELINE.json CANDIDATE.json [--tolerance 0.2]
+
+run seeds a scratch database of the prod profile per scale with bench.data and drives the routes in-process through
+the ASGI app, every scale in a fresh interpreter since the engines are configured at import. Reads pick random
+products and builds, so the response cache of single products and builds is exercised as it would be in service.
+compare exits with 1 if the median of any route grew by more than the tolerance.
+"""
+
+import argparse
+import asyncio
+import datetime as dti
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCALES = {'1k': 1000, '100k': 100_000, '1M': 1_000_000}
+ROUTES = (
+    'get_products',
+    'product_by_id',
+    'get_product_builds',
+    'get_product_build_by_id',
+    'add_build',
+    'login',
+    'search',
+)
+LOGINS = 10  # bcrypt makes a login take a quarter second, fewer samples suffice
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='measure and write JSON')
+    run.add_argument('--scales', nargs='+', choices=SCALES, default=list(SCALES))
+    run.add_argument('--requests', type=int, default=200, help='timed requests per route')
+    run.add_argument('--seed', type=int, default=42)
+    run.add_argument('--output', default='bench-api.json')
+    run.add_argument('--scale', choices=SCALES, help='measure one scale in this process and print JSON')
+    compare = commands.add_parser('compare', help='flag routes that got slower')
+    compare.add_argument('baseline')
+    compare.add_argument('candidate')
+    compare.add_argument('--tolerance', type=float, default=0.2, help='allowed relative growth of the median')
+    return parser.parse_args(argv)
+
+
+def summary(samples: list[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        'n': len(ordered),
+        'median_us': statistics.median(ordered) * 1e6,
+        'p95_us': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1e6,
+        'mean_us': statistics.fmean(ordered) * 1e6,
+    }
+
+
+async def measure(options: argparse.Namespace) -> dict[str, dict[str, float]]:
+    import httpx
+    from sqlmodel import Session
+
+    import db
+    from bench import data
+    from model import User
+    from schema import init_schema
+    from server import BASE, app
+
+    init_schema(db.write_engine)
+    seeded = data.seed(db.write_engine, SCALES[options.scale], options.seed)
+    with Session(db.write_engine) as session:
+        user = User(username='bench')
+        user.set_password('bench')
+        session.add(user)
+        session.commit()
+    vocabulary = data.Vocabulary(options.seed)
+    rng = random.Random(options.seed)
+    transport = httpx.ASGITransport(app=app)  # type: ignore
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as http:
+        response = await http.post('/auth/token', data={'username': 'bench', 'password': 'bench'})
+        auth = {'Authorization': f'Bearer {response.json()["access_token"]}'}
+        product_builds = {}
+
+        async def build_of(product_id: int) -> int:
+            if product_id not in product_builds:
+                listing = await http.get(f'{BASE}/api/products/{product_id}/builds', params={'limit': 1})
+                product_builds[product_id] = listing.json()[0]['id'] if listing.json() else 0
+            return product_builds[product_id]
+
+        def product() -> int:
+            return rng.randrange(1, seeded['products'] + 1)
+
+        async def call(route: str, product_id: int, build_id: int) -> httpx.Response:
+            if route == 'get_products':
+                return await http.get(f'{BASE}/api/products/')
+            if route == 'product_by_id':
+                return await http.get(f'{BASE}/api/products/{product_id}')
+            if route == 'get_product_builds':
+                return await http.get(f'{BASE}/api/products/{product_id}/builds')
+            if route == 'get_product_build_by_id':
+                return await http.get(f'{BASE}/api/products/{product_id}/builds/{build_id}')
+            if route == 'add_build':
+                return await http.post(f'{BASE}/api/products/{product_id}/builds', json={'version': 'b'}, headers=auth)
+            if route == 'login':
+                return await http.post('/auth/token', data={'username': 'bench', 'password': 'bench'})
+            return await http.get(f'{BASE}/api/search/', params={'q': rng.choice(vocabulary.words)})
+
+        results = {}
+        for route in ROUTES:
+            count = LOGINS if route == 'login' else options.requests
+            samples = []
+            for n in range(count + count // 10):  # The first tenth warms up pools and caches
+                product_id = product()
+                build_id = await build_of(product_id) if route == 'get_product_build_by_id' else 0  # Not timed
+                started = time.perf_counter()
+                response = await call(route, product_id, build_id)
+                elapsed = time.perf_counter() - started
+                if response.status_code not in (200, 404):
+                    raise RuntimeError(f'{route} answered {response.status_code}: {response.text[:200]}')
+                if n >= count // 10:
+                    samples.append(elapsed)
+            results[route] = summary(samples)
+    return results
+
+
+def run(options: argparse.Namespace, argv: list[str]) -> int:
+    if options.scale:
+        print(json.dumps(asyncio.run(measure(options))))
+        return 0
+    report = {
+        'meta': {
+            'date': dti.datetime.now(dti.timezone.utc).isoformat(timespec='seconds'),
+            'commit': subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'machine': platform.machine(),
+            'requests': options.requests,
+            'seed': options.seed,
+        },
+        'results': {},
+    }
+    for scale in options.scales:
+        with tempfile.TemporaryDirectory() as folder:
+            env = {**os.environ, 'BOS_DB_URL': f'sqlite:///{folder}/bench.db', 'BOS_DB_PROFILE': 'prod'}
+            done = subprocess.run(
+                [sys.executable, '-m', 'bench.api', 'run', '--scale', scale, *argv[1:]],
+                env=env,
+                stdout=subprocess.PIPE,
+                text=True,
+                check=True,
+            )
+            report['results'][scale] = json.loads(done.stdout.strip().splitlines()[-1])
+        print(f'{scale}: ' + ', '.join(f'{r} {m["median_us"]:.0f} µs' for r, m in report['results'][scale].items()))
+    with open(options.output, 'wt', encoding='utf-8') as handle:
+        json.dump(report, handle, indent=2)
+    return 0
+
+
+def compare(options: argparse.Namespace) -> int:
+    with open(options.baseline, encoding='utf-8') as handle:
+        baseline = json.load(handle)['results']
+    with open(options.candidate, encoding='utf-8') as handle:
+        candidate = json.load(handle)['results']
+    regressions = 0
+    print('| scale | route | baseline median µs | candidate median µs | change |')
+    print('|:------|:------|-------------------:|--------------------:|-------:|')
+    for scale in [scale for scale in SCALES if scale in baseline and scale in candidate]:
+        for route in [route for route in ROUTES if route in baseline[scale] and route in candidate[scale]]:
+            before, after = baseline[scale][route]['median_us'], candidate[scale][route]['median_us']
+            change = after / before - 1
+            flag = ''
+            if change > options.tolerance:
+                regressions += 1
+                flag = ' **regression**'
+            print(f'| {scale} | {route} | {before:.0f} | {after:.0f} | {change:+.0%}{flag} |')
+    return 1 if regressions else 0
+
+
+def main(argv: list[str]) -> int:
+    options = parse_args(argv)
+    return run(options, argv) if options.command == 'run' else compare(options)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,96 @@
+"""Time spent authenticating one request, the old username lookup against the signed token.
+
+Usage (from the repository root):
+
+    python -m bench.auth_overhead [--requests 2000]
+
+Both variants run the dependency the write routes depend on, in-process and against a scratch database of the prod
+profile, so the numbers are the cost of authentication alone, without HTTP and the route itself.
+Each BOS_DB_MODE runs in a fresh interpreter, since the engines are configured at import.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ('async', 'sync')
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--mode', choices=MODES, help='run one BOS_DB_MODE in this process and print JSON')
+    return parser.parse_args(argv)
+
+
+async def measure(options: argparse.Namespace) -> dict[str, float]:
+    from sqlmodel import Session, select
+
+    import db
+    from model import User, UserOutput
+    from router.auth import create_access_token, get_claims, get_current_user
+    from schema import init_schema
+
+    init_schema(db.write_engine)
+    with Session(db.write_engine) as session:
+        user = User(username='bench', password_hash='')
+        session.add(user)
+        session.commit()
+        token = create_access_token(UserOutput.model_validate(user))
+
+    async def lookup(token: str) -> UserOutput:
+        """get_current_user before signed tokens, the bearer token was the username"""
+        async with db.async_session() as session:
+            return UserOutput.model_validate((await session.exec(select(User).where(User.username == token))).one())
+
+    async def verify(token: str) -> UserOutput:
+        return await get_current_user(await get_claims(token))
+
+    timings = {}
+    for name, check, credential in (('username lookup', lookup, 'bench'), ('signed token', verify, token)):
+        await check(credential)  # Warm up pools and caches
+        started = time.perf_counter()
+        for _ in range(options.requests):
+            await check(credential)
+        timings[name] = (time.perf_counter() - started) / options.requests * 1e6
+    return timings
+
+
+def main(argv: list[str]) -> int:
+    options = parse_args(argv)
+    if options.mode:
+        print(json.dumps(asyncio.run(measure(options))))
+        return 0
+
+    results = {}
+    for mode in MODES:
+        with tempfile.TemporaryDirectory() as folder:
+            env = {
+                **os.environ,
+                'BOS_DB_URL': f'sqlite:///{folder}/bench.db',
+                'BOS_DB_PROFILE': 'prod',
+                'BOS_DB_MODE': mode,
+            }
+            done = subprocess.run(
+                [sys.executable, '-m', 'bench.auth_overhead', '--mode', mode, *argv],
+                env=env,
+                stdout=subprocess.PIPE,
+                text=True,
+                check=True,
+            )
+            results[mode] = json.loads(done.stdout.strip().splitlines()[-1])
+
+    print('| authentication | async µs/request | sync µs/request |')
+    print('|:---------------|-----------------:|----------------:|')
+    for name in results['async']:
+        print(f'| {name} | {results["async"][name]:.0f} | {results["sync"][name]:.0f} |')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
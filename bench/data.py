@@ -0,0 +1,66 @@
+"""Seeded synthetic catalogs for the benchmarks.
+
+Faker supplies a vocabulary once, the rows are then drawn from it with a seeded random generator, so a million builds
+take seconds rather than the minutes Faker would need per row, and the same seed always gives the same catalog.
+"""
+
+import datetime as dti
+import random
+from typing import Iterator
+
+from faker import Faker
+from sqlalchemy import Engine
+
+from model import epoch_micros
+
+BATCH_SIZE = 10000
+BUILDS_PER_PRODUCT = 100
+TARGETS = ('x86_64', 'aarch64', 'riscv64', 'armv7', 's390x')
+
+
+class Vocabulary:
+    def __init__(self, seed: int) -> None:
+        fake = Faker()
+        fake.seed_instance(seed)
+        self.words = sorted({word.lower() for word in fake.words(nb=3000)})
+        self.sentences = [fake.sentence(nb_words=8) for _ in range(2000)]
+        self.families = sorted({fake.word() for _ in range(50)})
+        self.sources = [fake.uri() for _ in range(200)]
+
+
+def products(rng: random.Random, vocabulary: Vocabulary, count: int) -> Iterator[tuple]:
+    for n in range(count):
+        yield rng.choice(vocabulary.families), f'{rng.choice(vocabulary.words)}-{n}', rng.choice(vocabulary.sentences)
+
+
+def builds(rng: random.Random, vocabulary: Vocabulary, count: int, product_count: int) -> Iterator[tuple]:
+    for n in range(count):
+        yield (
+            rng.randrange(1, product_count + 1),
+            f'{2020 + n % 5}.{n // 1000 % 12 + 1}.{n % 1000}',
+            rng.choice(vocabulary.sentences),
+            rng.choice(vocabulary.sources),
+            rng.choice(TARGETS),
+            epoch_micros(dti.datetime(2020 + n % 5, n // 1000 % 12 + 1, n % 28 + 1, 12, n // 60 % 60, n % 60)),
+            f'{rng.getrandbits(512):0128x}',
+        )
+
+
+def seed(engine: Engine, build_count: int, seed: int = 42) -> dict[str, int]:
+    """Insert build_count builds spread over build_count / BUILDS_PER_PRODUCT products into an empty catalog."""
+    rng = random.Random(seed)
+    vocabulary = Vocabulary(seed)
+    product_count = max(1, build_count // BUILDS_PER_PRODUCT)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            'INSERT INTO product (family, name, description) VALUES (?, ?, ?)',
+            list(products(rng, vocabulary, product_count)),
+        )
+        rows = builds(rng, vocabulary, build_count, product_count)
+        while batch := [row for _, row in zip(range(BATCH_SIZE), rows)]:
+            connection.exec_driver_sql(
+                'INSERT INTO build (product_id, version, description, source, target, timestamp, sha512)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                batch,
+            )
+    return {'products': product_count, 'builds': build_count}
@@ -0,0 +1,125 @@
+"""Throughput of the dev and prod database profiles under the same mixed read/write load, for both drivers.
+
+Usage (from the repository root):
+
+    python -m bench.engine_profiles [--seconds 10] [--clients 32] [--write-share 0.2]
+
+Every combination of profile and BOS_DB_MODE runs in a fresh interpreter against a fresh database file,
+since the engines are configured at import.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+PROFILES = ('dev', 'prod')
+MODES = ('async', 'sync')
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--write-share', type=float, default=0.2)
+    parser.add_argument('--products', type=int, default=20)
+    parser.add_argument('--builds', type=int, default=50, help='builds seeded per product')
+    parser.add_argument('--profile', choices=PROFILES, help='run one profile in this process and print JSON')
+    return parser.parse_args(argv)
+
+
+async def load(options: argparse.Namespace) -> dict:
+    import httpx
+    from sqlmodel import Session
+
+    import db
+    from model import Build, Product, User, UserOutput
+    from router.auth import create_access_token
+    from schema import init_schema
+    from server import BASE, app
+
+    init_schema(db.write_engine)
+    with Session(db.write_engine) as session:
+        user = User(username='bench', password_hash='')
+        session.add(user)
+        products = [Product(family='bench', name=f'p{n}', description='') for n in range(options.products)]
+        session.add_all(products)
+        session.commit()
+        product_ids = [product.id for product in products]
+        token = create_access_token(UserOutput.model_validate(user))
+        for product_id in product_ids:
+            session.add_all(Build(product_id=product_id, version=f'{n}') for n in range(options.builds))
+        session.commit()
+
+    headers = {'Authorization': f'Bearer {token}'}
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    deadline = time.perf_counter() + options.seconds
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)  # type: ignore
+
+    async def client(seed: int) -> None:
+        rng = random.Random(seed)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as http:
+            while time.perf_counter() < deadline:
+                product_id = rng.choice(product_ids)
+                if rng.random() < options.write_share:
+                    kind = 'writes'
+                    response = await http.post(
+                        f'{BASE}/api/products/{product_id}/builds', json={'version': 'x'}, headers=headers
+                    )
+                else:
+                    kind = 'reads'
+                    response = await http.get(f'{BASE}/api/products/{product_id}/builds', params={'limit': 20})
+                counts[kind if response.status_code == 200 else 'errors'] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(seed) for seed in range(options.clients)))
+    elapsed = time.perf_counter() - started
+    return {**counts, 'seconds': elapsed, 'rps': (counts['reads'] + counts['writes']) / elapsed}
+
+
+def main(argv: list[str]) -> int:
+    options = parse_args(argv)
+    if options.profile:
+        result = asyncio.run(load(options))
+        sys.stdout.flush()
+        print(json.dumps(result), file=sys.stderr)
+        return 0
+
+    results = {}
+    for profile in PROFILES:
+        for mode in MODES:
+            with tempfile.TemporaryDirectory() as folder:
+                env = {
+                    **os.environ,
+                    'BOS_DB_URL': f'sqlite:///{folder}/bench.db',
+                    'BOS_DB_PROFILE': profile,
+                    'BOS_DB_MODE': mode,
+                }
+                done = subprocess.run(
+                    [sys.executable, '-m', 'bench.engine_profiles', '--profile', profile, *argv],
+                    env=env,
+                    stdout=subprocess.DEVNULL,  # The echo of the dev profile goes here, it is part of its cost
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    check=True,
+                )
+                results[profile, mode] = json.loads(done.stderr.strip().splitlines()[-1])
+
+    print('| profile | async requests/s | sync requests/s | async errors | sync errors |')
+    print('|:--------|-----------------:|----------------:|-------------:|------------:|')
+    for profile in PROFILES:
+        run = {mode: results[profile, mode] for mode in MODES}
+        print(
+            f'| {profile} | {run["async"]["rps"]:.0f} | {run["sync"]["rps"]:.0f}'
+            f' | {run["async"]["errors"]} | {run["sync"]["errors"]} |'
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,105 @@
+"""Latency of the full-text search on a large catalog.
+
+Usage (from the repository root):
+
+    python -m bench.search [--builds 1000000] [--products 1000] [--repeat 20]
+
+Seeds a scratch database of the prod profile through the insert triggers of the index, then times one page of
+the search API for words of different selectivity, calling the route in-process.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+WORDS = [f'w{n}' for n in range(5000)]
+TARGETS = ['x86_64', 'aarch64', 'riscv64', 'armv7', 's390x']
+QUERIES = {
+    'rare word': 'w4999',  # Zipf tail, a few hundred builds
+    'common word': 'w1',  # Zipf head, half of all builds
+    'target': 'riscv64',  # A fifth of all builds
+    'two words': 'w1 aarch64',
+    'product name': 'product-7',
+}
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--builds', type=int, default=1_000_000)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    return parser.parse_args(argv)
+
+
+def seed(options: argparse.Namespace) -> None:
+    import db
+    from schema import init_schema
+
+    init_schema(db.write_engine)
+    rng = random.Random(42)
+    weights = [1 / (rank + 1) for rank in range(len(WORDS))]
+    with db.write_engine.begin() as connection:
+        connection.exec_driver_sql(
+            'INSERT INTO product (family, name, description) VALUES (?, ?, ?)',
+            [('bench', f'product-{n}', ' '.join(rng.choices(WORDS, weights, k=8))) for n in range(options.products)],
+        )
+        for start in range(0, options.builds, 10000):
+            connection.exec_driver_sql(
+                'INSERT INTO build (product_id, version, description, source, target, timestamp)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                [
+                    (
+                        rng.randrange(1, options.products + 1),
+                        f'{n // 1000}.{n % 1000}',
+                        ' '.join(rng.choices(WORDS, weights, k=12)),
+                        'git',
+                        rng.choice(TARGETS),
+                        1704067200_000000,  # 2024-01-01 in microseconds, see model.EpochMicros
+                    )
+                    for n in range(start, min(start + 10000, options.builds))
+                ],
+            )
+
+
+async def measure(options: argparse.Namespace) -> dict[str, float]:
+    from starlette.requests import Request
+    from starlette.responses import Response
+
+    import db
+    from router.search import search
+
+    request = Request({'type': 'http', 'method': 'GET', 'path': '/', 'query_string': b'', 'headers': []})
+    timings = {}
+    for name, q in QUERIES.items():
+        samples = []
+        for _ in range(options.repeat):
+            async with db.async_session() as session:
+                started = time.perf_counter()
+                await search(q=q, request=request, response=Response(), after=None, limit=100, session=session)
+                samples.append(time.perf_counter() - started)
+        timings[name] = statistics.median(samples) * 1e3
+    return timings
+
+
+def main(argv: list[str]) -> int:
+    options = parse_args(argv)
+    with tempfile.TemporaryDirectory() as folder:
+        os.environ.update(BOS_DB_URL=f'sqlite:///{folder}/bench.db', BOS_DB_PROFILE='prod')
+        started = time.perf_counter()
+        seed(options)
+        print(f'Seeded {options.builds} builds in {time.perf_counter() - started:.0f} s', file=sys.stderr)
+        timings = asyncio.run(measure(options))
+    print('| query | median ms for the first 100 hits |')
+    print('|:------|---------------------------------:|')
+    for name, milliseconds in timings.items():
+        print(f'| {name} (`{QUERIES[name]}`) | {milliseconds:.1f} |')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
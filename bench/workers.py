@@ -0,0 +1,145 @@
+"""Throughput of launcher.py over HTTP for different numbers of workers under a mixed read/write load.
+
+Usage (from the repository root):
+
+    python -m bench.workers [--workers 1 2 4] [--seconds 10] [--clients 32] [--write-share 0.2]
+
+Every worker count serves a fresh database of the prod profile seeded with the same catalog, and the load comes
+from --client-processes processes so the clients do not become the bottleneck. Throughput only scales with the
+workers up to the number of CPUs left over by the clients.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+SECRET_KEY = 'bench-workers'
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--clients', type=int, default=32, help='concurrent clients in all')
+    parser.add_argument('--client-processes', type=int, default=2)
+    parser.add_argument('--write-share', type=float, default=0.2)
+    parser.add_argument('--products', type=int, default=20)
+    parser.add_argument('--builds', type=int, default=50, help='builds seeded per product')
+    return parser.parse_args(argv)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed(path: str, products: int, builds: int) -> None:
+    with sqlite3.connect(path) as connection:
+        connection.execute("INSERT INTO user (id, username, password_hash) VALUES (1, 'bench', '')")
+        connection.executemany(
+            'INSERT INTO product (id, family, name, description) VALUES (?, ?, ?, ?)',
+            [(n, 'bench', f'p{n}', '') for n in range(1, products + 1)],
+        )
+        connection.executemany(
+            'INSERT INTO build (product_id, version, timestamp) VALUES (?, ?, ?)',
+            [(n, f'{b}', (1662319200 + b % 60) * 1_000_000) for n in range(1, products + 1) for b in range(builds)],
+        )
+
+
+def drive(url: str, token: str, options: argparse.Namespace, clients: int, seed: int) -> dict[str, int]:
+    import httpx
+
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    headers = {'Authorization': f'Bearer {token}'}
+    deadline = time.perf_counter() + options.seconds
+
+    async def client(http: httpx.AsyncClient, rng: random.Random) -> None:
+        while time.perf_counter() < deadline:
+            product_id = rng.randrange(1, options.products + 1)
+            try:
+                if rng.random() < options.write_share:
+                    kind = 'writes'
+                    response = await http.post(
+                        f'/x/api/products/{product_id}/builds', json={'version': 'x'}, headers=headers
+                    )
+                else:
+                    kind = 'reads'
+                    response = await http.get(f'/x/api/products/{product_id}/builds', params={'limit': 20})
+                counts[kind if response.status_code == 200 else 'errors'] += 1
+            except httpx.HTTPError:
+                counts['errors'] += 1
+
+    async def run() -> None:
+        limits = httpx.Limits(max_connections=clients)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as http:
+            await asyncio.gather(*(client(http, random.Random(seed * 1000 + n)) for n in range(clients)))
+
+    asyncio.run(run())
+    return counts
+
+
+def measure(workers: int, token: str, options: argparse.Namespace) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'bench.db')
+        port = free_port()
+        env = {**os.environ, 'BOS_DB_URL': f'sqlite:///{path}', 'BOS_DB_PROFILE': 'prod', 'BOS_SECRET_KEY': SECRET_KEY}
+        launcher = subprocess.Popen(
+            [sys.executable, 'launcher.py', '--workers', str(workers), '--port', str(port)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            url = f'http://127.0.0.1:{port}'
+            while True:
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                    break
+                except OSError:
+                    if launcher.poll() is not None:
+                        raise RuntimeError(f'launcher.py exited with {launcher.returncode}')
+                    time.sleep(0.2)
+            seed(path, options.products, options.builds)
+            shares = [options.clients // options.client_processes] * options.client_processes
+            shares[0] += options.clients % options.client_processes
+            with multiprocessing.Pool(options.client_processes) as pool:
+                started = time.perf_counter()
+                results = pool.starmap(drive, [(url, token, options, share, n) for n, share in enumerate(shares)])
+                elapsed = time.perf_counter() - started
+        finally:
+            launcher.send_signal(signal.SIGTERM)
+            launcher.wait()
+    counts = {key: sum(result[key] for result in results) for key in ('reads', 'writes', 'errors')}
+    return {**counts, 'rps': (counts['reads'] + counts['writes']) / elapsed}
+
+
+def main(argv: list[str]) -> int:
+    options = parse_args(argv)
+    os.environ['BOS_SECRET_KEY'] = SECRET_KEY  # Before router.auth reads it
+    from model import UserOutput
+    from router.auth import create_access_token
+
+    token = create_access_token(UserOutput(id=1, username='bench'))
+    print('| workers | requests/s | reads | writes | errors |')
+    print('|--------:|-----------:|------:|-------:|-------:|')
+    for workers in options.workers:
+        result = measure(workers, token, options)
+        print(
+            f'| {workers} | {result["rps"]:.0f} | {result["reads"]} | {result["writes"]} | {result["errors"]} |',
+            flush=True,
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,77 @@
+"""
+cache.py
+--------
+A bounded in-process cache of serialized responses with LRU and TTL eviction.
+
+Entries belong to a group, the product they were rendered from, and the write routes drop a whole group after they
+commit. A reader only stores what it rendered if the product did not change meanwhile, see router/products.py.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+CACHE_BYTES = int(os.getenv('BOS_CACHE_BYTES', str(64 << 20)))
+CACHE_SECONDS = float(os.getenv('BOS_CACHE_SECONDS', '300'))
+ENTRY_OVERHEAD = 200  # Rough bytes of bookkeeping per entry beyond the payload
+
+
+class Cache:
+    def __init__(self, max_bytes: int, ttl: float) -> None:
+        self.max_bytes, self.ttl = max_bytes, ttl
+        self.entries: OrderedDict[Hashable, tuple[float, Hashable, bytes]] = OrderedDict()  # Oldest use first
+        self.groups: dict[Hashable, set[Hashable]] = {}
+        self.size = 0
+        self.counts = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def get(self, key: Hashable) -> bytes | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.counts['misses'] += 1
+            return None
+        if entry[0] <= time.monotonic():
+            self._drop(key)
+            self.counts['expirations'] += 1
+            self.counts['misses'] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.counts['hits'] += 1
+        return entry[2]
+
+    def put(self, key: Hashable, group: Hashable, value: bytes) -> None:
+        if key in self.entries:
+            self._drop(key)
+        if len(value) + ENTRY_OVERHEAD > self.max_bytes:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, group, value)
+        self.groups.setdefault(group, set()).add(key)
+        self.size += len(value) + ENTRY_OVERHEAD
+        while self.size > self.max_bytes:
+            self._drop(next(iter(self.entries)))
+            self.counts['evictions'] += 1
+
+    def invalidate(self, group: Hashable) -> None:
+        """Drop every entry of group."""
+        for key in self.groups.get(group, set()).copy():
+            self._drop(key)
+            self.counts['invalidations'] += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.groups.clear()
+        self.size = 0
+
+    def stats(self) -> dict[str, Any]:
+        return {**self.counts, 'entries': len(self.entries), 'bytes': self.size, 'max_bytes': self.max_bytes}
+
+    def _drop(self, key: Hashable) -> None:
+        _, group, value = self.entries.pop(key)
+        self.size -= len(value) + ENTRY_OVERHEAD
+        keys = self.groups[group]
+        keys.discard(key)
+        if not keys:
+            del self.groups[group]
+
+
+responses = Cache(CACHE_BYTES, CACHE_SECONDS)
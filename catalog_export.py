@@ -0,0 +1,161 @@
+"""
+catalog_export.py
+-----------------
+Stream all products with their builds as NDJSON (one product per line, builds nested) or CSV (one row per build).
+
+The rows come from a single ordered outer join read through a server-side cursor in partitions of YIELD_PER,
+and the writers below turn each row into output text at once, so memory stays flat for any catalog size.
+
+Usage: python catalog_export.py [--format ndjson|csv] [--output FILE]
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+from typing import Any, AsyncIterator, Iterator
+
+from sqlalchemy import Select, select
+from starlette.concurrency import run_in_threadpool
+
+import db
+from model import Build, Product, format_timestamp
+
+FORMATS = ('ndjson', 'csv')
+MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+YIELD_PER = 1000
+PRODUCT_COLUMNS = ('id', 'family', 'name', 'description')
+BUILD_COLUMNS = ('id', 'description', 'source', 'version', 'timestamp', 'target', 'taxonomy', 'sha512')
+
+
+def catalog_query() -> Select:
+    """Products in id order each followed by its builds in id order, walking ix_build_product_id_id."""
+    columns = [getattr(Product, name) for name in PRODUCT_COLUMNS]
+    columns += [getattr(Build, name).label(f'build_{name}') for name in BUILD_COLUMNS]
+    return (
+        select(*columns)
+        .select_from(Product)
+        .outerjoin(Build, Build.product_id == Product.id)  # type: ignore
+        .order_by(Product.id, Build.id)
+    )
+
+
+class NDJSONWriter:
+    """One JSON object per product whose builds array is written build by build."""
+
+    def __init__(self) -> None:
+        self.product_id: int | None = None
+        self.first = True
+
+    def header(self) -> str:
+        return ''
+
+    def row(self, row: Any) -> str:
+        text = ''
+        if row.id != self.product_id:
+            text = self.close()
+            product = {name: getattr(row, name) for name in PRODUCT_COLUMNS}
+            text += json.dumps(product, separators=(',', ':'))[:-1] + ',"builds":['
+            self.product_id, self.first = row.id, True
+        if row.build_id is not None:
+            build = {name: getattr(row, f'build_{name}') for name in BUILD_COLUMNS}
+            build['timestamp'] = format_timestamp(build['timestamp'])
+            text += ('' if self.first else ',') + json.dumps(build, separators=(',', ':'))
+            self.first = False
+        return text
+
+    def close(self) -> str:
+        return ']}\n' if self.product_id is not None else ''
+
+
+class CSVWriter:
+    """One row per build with the product columns repeated, products without builds get one row of their own."""
+
+    def __init__(self) -> None:
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, lineterminator='\n')
+
+    def _flush(self) -> str:
+        text = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return text
+
+    def header(self) -> str:
+        self.writer.writerow([f'product_{name}' for name in PRODUCT_COLUMNS] + [f'build_{n}' for n in BUILD_COLUMNS])
+        return self._flush()
+
+    def row(self, row: Any) -> str:
+        values = row._asdict()
+        if values['build_timestamp'] is not None:
+            values['build_timestamp'] = format_timestamp(values['build_timestamp'])
+        self.writer.writerow(['' if value is None else value for value in values.values()])
+        return self._flush()
+
+    def close(self) -> str:
+        return ''
+
+
+def writer_for(format: str) -> NDJSONWriter | CSVWriter:
+    return NDJSONWriter() if format == 'ndjson' else CSVWriter()
+
+
+def export_lines(rows: Iterator[Any], format: str) -> Iterator[str]:
+    writer = writer_for(format)
+    yield writer.header()
+    for row in rows:
+        yield writer.row(row)
+    yield writer.close()
+
+
+async def stream_rows() -> AsyncIterator[Any]:
+    """Rows of catalog_query() from the driver selected by BOS_DB_MODE, fetched YIELD_PER at a time."""
+    statement = catalog_query().execution_options(yield_per=YIELD_PER)
+    if db.DB_MODE == 'sync':
+        with db.engine.connect() as connection:
+            partitions = connection.execute(statement).partitions()
+            while partition := await run_in_threadpool(next, partitions, None):
+                for row in partition:
+                    yield row
+    else:
+        async with db.async_engine.connect() as connection:
+            result = await connection.stream(statement)
+            async for partition in result.partitions():
+                for row in partition:
+                    yield row
+
+
+async def export_chunks(format: str, chunk_size: int = 1 << 16) -> AsyncIterator[str]:
+    """The export as text chunks of about chunk_size characters for a streamed response."""
+    writer = writer_for(format)
+    parts, size = [writer.header()], 0
+    async for row in stream_rows():
+        text = writer.row(row)
+        parts.append(text)
+        size += len(text)
+        if size >= chunk_size:
+            yield ''.join(parts)
+            parts, size = [], 0
+    parts.append(writer.close())
+    yield ''.join(parts)
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description='Export all products and builds.')
+    parser.add_argument('--format', choices=FORMATS, default='ndjson')
+    parser.add_argument('--output', help='file to write, default standard output')
+    options = parser.parse_args(argv)
+    db.engine.echo = False  # The dev profile would log SQL into the export on standard output
+    with db.engine.connect() as connection:
+        rows = connection.execute(catalog_query().execution_options(yield_per=YIELD_PER))
+        if options.output:
+            with open(options.output, 'wt', encoding='utf-8', newline='') as handle:
+                handle.writelines(export_lines(rows, options.format))
+        else:
+            sys.stdout.writelines(export_lines(rows, options.format))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -6,20 +6,16 @@ A convenience script to create a user.
 
 from getpass import getpass
 
-from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel import Session
 
+from db import write_engine as engine
 from model import User
-
-engine = create_engine(
-    'sqlite:///belte-og-seler.db',
-    connect_args={'check_same_thread': False},  # Needed for SQLite
-    echo=True,  # Log generated SQL
-)
+from schema import init_schema
 
 
 if __name__ == '__main__':
     print('Creating tables (if necessary)')
-    SQLModel.metadata.create_all(engine)
+    init_schema(engine)
 
     print('--------')
 
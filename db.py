@@ -1,12 +1,164 @@
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncContextManager, AsyncIterator
+
+from sqlalchemy import Engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+DB_URL = os.getenv('BOS_DB_URL', 'sqlite:///belte-og-seler.db')
+DB_MODE = os.getenv('BOS_DB_MODE', 'async')  # async: aiosqlite on the event loop, sync: blocking driver in threadpool
+DB_MODES = ('async', 'sync')
+if DB_MODE not in DB_MODES:
+    raise ValueError(f'BOS_DB_MODE must be one of {DB_MODES} but is {DB_MODE!r}')
+DB_PROFILE = os.getenv('BOS_DB_PROFILE', 'dev')  # dev: echo SQL and share one pool, prod: see PRAGMAS below
+DB_PROFILES = ('dev', 'prod')
+if DB_PROFILE not in DB_PROFILES:
+    raise ValueError(f'BOS_DB_PROFILE must be one of {DB_PROFILES} but is {DB_PROFILE!r}')
+DB_READERS = int(os.getenv('BOS_DB_READERS', '8'))  # Size of the read pool in the prod profile
+
+PRAGMAS = {
+    'journal_mode': 'WAL',  # Readers no longer block the writer and vice versa
+    'synchronous': 'NORMAL',  # Durable at checkpoints, safe against corruption in WAL mode
+    'busy_timeout': 5000,  # Wait for a lock held by another process instead of failing at once
+    'cache_size': -65536,  # 64 MiB of page cache per connection
+    'mmap_size': 268435456,  # Read up to 256 MiB of the file through the page cache of the OS
+    'temp_store': 'MEMORY',
+}
+
+
+def _use_profile(engine: Engine, profile: str, writer: bool) -> Engine:
+    """Apply the connection pragmas of the prod profile, writers also take the write lock when they begin."""
+    if profile == 'prod':
+
+        @event.listens_for(engine, 'connect')
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in PRAGMAS.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+            cursor.close()
+            if writer:
+                dbapi_connection.isolation_level = None  # Let the begin event below emit BEGIN
+
+        if writer:
+
+            @event.listens_for(engine, 'begin')
+            def begin_immediate(connection):
+                connection.exec_driver_sql('BEGIN IMMEDIATE')  # No deadlock upgrading a read lock to a write lock
+
+    return engine
+
+
+def _engine_options(profile: str, writer: bool) -> dict[str, Any]:
+    if profile == 'dev':
+        return {'echo': True}  # Log generated SQL
+    return {'echo': False, 'pool_size': 1 if writer else DB_READERS, 'max_overflow': 0}
 
-engine = create_engine(
-    'sqlite:///belte-og-seler.db',
-    connect_args={'check_same_thread': False},  # Needed for SQLite
-    echo=True,  # Log generated SQL
-)
+
+def make_engine(url: str, profile: str, writer: bool = False) -> Engine:
+    engine = create_engine(
+        url,
+        connect_args={'check_same_thread': False},  # Needed for SQLite
+        **_engine_options(profile, writer),
+    )
+    return _use_profile(engine, profile, writer)
+
+
+def make_async_engine(url: str, profile: str, writer: bool = False) -> AsyncEngine:
+    engine = create_async_engine(url.replace('sqlite://', 'sqlite+aiosqlite://', 1), **_engine_options(profile, writer))
+    _use_profile(engine.sync_engine, profile, writer)
+    return engine
+
+
+engine = make_engine(DB_URL, DB_PROFILE)
+async_engine = make_async_engine(DB_URL, DB_PROFILE)
+if DB_PROFILE == 'prod':
+    # A pool of one connection is the queue all writes of this process line up in
+    write_engine = make_engine(DB_URL, DB_PROFILE, writer=True)
+    async_write_engine = make_async_engine(DB_URL, DB_PROFILE, writer=True)
+else:
+    write_engine, async_write_engine = engine, async_engine
 
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+
+class ThreadedSession:
+    """The blocking Session behind the AsyncSession interface the routers use.
+
+    Every call that may touch the database runs in the threadpool like a sync route would, so the same routes
+    can be measured against both drivers by flipping BOS_DB_MODE.
+    """
+
+    _EXECUTE_OPTIONS = {'prebuffer_rows': True}  # Fetch in the worker thread as AsyncSession does
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, instance: Any) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances: Any) -> None:
+        self.sync_session.add_all(instances)
+
+    async def exec(self, statement: Any, **kwargs: Any) -> Any:
+        options = {**self._EXECUTE_OPTIONS, **kwargs.pop('execution_options', {})}
+        return await run_in_threadpool(self.sync_session.exec, statement, execution_options=options, **kwargs)
+
+    async def get(self, entity: Any, ident: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance: Any) -> None:
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self) -> None:
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance: Any, **kwargs: Any) -> None:
+        await run_in_threadpool(self.sync_session.refresh, instance, **kwargs)
+
+
+@asynccontextmanager
+async def _session(sync_engine: Engine, async_engine: AsyncEngine) -> AsyncIterator[AsyncSession]:
+    if DB_MODE == 'sync':
+        with Session(sync_engine, expire_on_commit=False) as session:
+            yield ThreadedSession(session)  # type: ignore
+    else:
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """Yield a session for the driver selected by BOS_DB_MODE.
+
+    Objects stay loaded after commit (expire_on_commit=False) since refreshing them implicitly would be I/O
+    outside of an await, which the async driver refuses.
+    """
+    async with _session(engine, async_engine) as session:
+        yield session
+
+
+def async_session() -> AsyncContextManager[AsyncSession]:
+    """The session of get_async_session for code that is not a route, like dependencies that rarely need one."""
+    return _session(engine, async_engine)
+
+
+def async_write_session() -> AsyncContextManager[AsyncSession]:
+    """The session of get_async_write_session for code that is not a route."""
+    return _session(write_engine, async_write_engine)
+
+
+async def get_async_write_session() -> AsyncIterator[AsyncSession]:
+    """Like get_async_session but on the single writer connection of the prod profile."""
+    async with _session(write_engine, async_write_engine) as session:
+        yield session
@@ -0,0 +1,71 @@
+"""Strong ETags for the product reads, derived from version counters the write routes bump after they commit.
+
+Every write advances the catalog generation and stamps the products it touched with it, so a product read is tagged
+with the generation of the last write to that product and a listing with the generation of the last write anywhere.
+Answering If-None-Match then needs neither a query nor serialization.
+
+The counters live in this process and start from a random epoch, so tags from before a restart never match.
+Forked workers draw an epoch of their own, their counters advance independently from the moment of the fork.
+"""
+
+import hashlib
+import os
+import secrets
+
+from fastapi import HTTPException, Request, Response
+
+EPOCH = secrets.token_hex(4)
+
+_generation = 0
+_products: dict[int, int] = {}
+_floor = 0  # Generation of the last write to products unknown, every product version is at least this
+
+
+def _new_epoch() -> None:
+    global EPOCH
+    EPOCH = secrets.token_hex(4)
+
+
+os.register_at_fork(after_in_child=_new_epoch)
+
+
+def bump(*product_ids: int) -> None:
+    """Record a committed write to the products given."""
+    global _generation
+    _generation += 1
+    for product_id in product_ids:
+        _products[product_id] = _generation
+
+
+def bump_all() -> None:
+    """Record a committed write to products unknown, as another process may have made, see peers.py."""
+    global _generation, _floor
+    _generation += 1
+    _floor = _generation
+
+
+def catalog() -> int:
+    return _generation
+
+
+def product(product_id: int) -> int:
+    return max(_products.get(product_id, 0), _floor)
+
+
+def _matches(if_none_match: str, tag: str) -> bool:
+    candidates = [candidate.strip().removeprefix('W/') for candidate in if_none_match.split(',')]
+    return '*' in candidates or tag in candidates  # If-None-Match compares weakly, RFC 9110 13.1.2
+
+
+def conditional(request: Request, response: Response, version: int) -> str:
+    """Tag the response with version and the URL, or answer 304 right away if the client has that tag.
+
+    Call this before the first query. The version is read before the data, so a write racing the read leaves the
+    older tag on the newer data and the client merely fetches it once more.
+    """
+    url = hashlib.blake2b(f'{request.url.path}?{request.url.query}'.encode('utf-8'), digest_size=6).hexdigest()
+    tag = f'"{EPOCH}-{version}-{url}"'
+    if _matches(request.headers.get('if-none-match', ''), tag):
+        raise HTTPException(status_code=304, headers={'ETag': tag})
+    response.headers['ETag'] = tag
+    return tag
@@ -0,0 +1,167 @@
+"""
+events.py
+---------
+The change feed behind GET /api/events/: writes to products and builds as server-sent events.
+
+Triggers of step 7 in schema.py append every write to the outbox table change_event, in the transaction of the
+write, whichever process or code path made it. Each process runs one poller while it has subscribers. The poller
+reads the outbox after the last id it saw, keeps the newest RING_SIZE events rendered in a ring buffer and hands
+each one to the queue of every subscriber. The write routes wake the poller of their own process right after they
+commit, the pollers of other workers notice within POLL_SECONDS.
+
+The outbox id is the event id in every process, so a client reconnecting with Last-Event-ID to any worker continues
+where it stopped as long as the ring still holds the next event. Otherwise it gets a reset event and should read
+the catalog afresh. A subscriber whose queue of QUEUE_SIZE events is full gets the events in it and is then cut
+off, so a slow client neither grows the memory of the server nor holds up the others, and resumes from the ring.
+"""
+
+import asyncio
+import collections
+import json
+from typing import AsyncIterator
+
+from sqlmodel import select
+
+import db
+from model import ChangeEvent, format_timestamp
+
+RING_SIZE = 1000  # Events kept for resuming clients, per process
+QUEUE_SIZE = 256  # Events a subscriber may fall behind before it is cut off
+POLL_BATCH = 500
+POLL_SECONDS = 0.5  # Latency of events written by other processes
+KEEPALIVE_SECONDS = 15.0  # Comment lines keep proxies from closing idle streams
+STREAM_SECONDS = 600.0  # Streams end after this, clients reconnect and spread over the workers again
+RETRY_MILLISECONDS = 1000
+RESET = 'event: reset\ndata: {}\n\n'
+
+
+def render(event: ChangeEvent) -> str:
+    data = {
+        'kind': event.kind,
+        'action': event.action,
+        'product_id': event.product_id,
+        'build_id': event.build_id,
+        'at': format_timestamp(event.at),
+    }
+    return f'id: {event.id}\nevent: {event.kind}.{event.action}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+class Subscriber:
+    def __init__(self) -> None:
+        self.queue: asyncio.Queue[str] = asyncio.Queue(QUEUE_SIZE)
+        self.cut_off = False
+
+
+class Feed:
+    """The ring buffer, the subscribers and the poller of this process."""
+
+    def __init__(self) -> None:
+        self.ring: collections.deque[tuple[int, str]] = collections.deque(maxlen=RING_SIZE)
+        self.last_id: int | None = None  # Of the outbox as last read, None before the first read
+        self.subscribers: set[Subscriber] = set()
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.wake: asyncio.Event | None = None
+        self.ready: asyncio.Event | None = None  # Set once the ring holds the tail of the outbox
+        self.task: asyncio.Task | None = None
+
+    async def subscribe(self, last_event_id: int | None) -> tuple[Subscriber, list[str]]:
+        """A new subscriber and the events it missed after last_event_id, or a reset if the ring lacks some."""
+        if self.task is None or self.loop is not asyncio.get_running_loop():
+            self.start()
+        assert self.ready is not None
+        await self.ready.wait()
+        subscriber = Subscriber()
+        self.subscribers.add(subscriber)
+        if last_event_id is None or self.last_id is None:
+            return subscriber, []
+        oldest = self.ring[0][0] if self.ring else self.last_id + 1
+        if last_event_id > self.last_id or last_event_id < oldest - 1:
+            return subscriber, [RESET]
+        return subscriber, [text for id, text in self.ring if id > last_event_id]
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+
+    def start(self) -> None:
+        """Run the poller on the running loop, it reads the tail of the outbox into the ring first."""
+        self.loop = asyncio.get_running_loop()
+        self.wake, self.ready = asyncio.Event(), asyncio.Event()
+        self.task = self.loop.create_task(self.run())
+
+    async def load(self) -> None:
+        async with db.async_session() as session:
+            query = select(ChangeEvent).order_by(ChangeEvent.id.desc()).limit(RING_SIZE)  # type: ignore
+            rows = (await session.exec(query)).all()
+        self.ring.clear()
+        self.ring.extend((row.id, render(row)) for row in reversed(rows))
+        self.last_id = rows[0].id if rows else 0
+
+    async def run(self) -> None:
+        assert self.wake is not None and self.ready is not None
+        try:
+            await self.load()
+        finally:
+            self.ready.set()  # Also after a failed load, subscribers then get no replay rather than waiting forever
+        while True:
+            try:
+                await asyncio.wait_for(self.wake.wait(), POLL_SECONDS)
+            except TimeoutError:
+                pass
+            self.wake.clear()
+            if not self.subscribers:
+                self.task = None  # Events go unread from here on, the next subscriber starts over with the ring
+                return
+            await self.poll()
+
+    async def poll(self) -> None:
+        while self.last_id is not None:
+            query = select(ChangeEvent).where(ChangeEvent.id > self.last_id)
+            async with db.async_session() as session:
+                rows = (await session.exec(query.order_by(ChangeEvent.id).limit(POLL_BATCH))).all()
+            for row in rows:
+                self.publish(row.id, render(row))
+            if len(rows) < POLL_BATCH:
+                return
+
+    def publish(self, id: int, text: str) -> None:
+        self.ring.append((id, text))
+        self.last_id = id
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(text)
+            except asyncio.QueueFull:
+                subscriber.cut_off = True
+                self.subscribers.discard(subscriber)
+
+    def poke(self) -> None:
+        """Have the poller read the outbox now, the write routes call this after their commit."""
+        if self.loop is not None and self.wake is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.wake.set)
+
+    def clear(self) -> None:
+        """Forget everything, as if the process had just started, for a database that was replaced."""
+        self.ring.clear()
+        self.last_id, self.loop, self.wake, self.ready, self.task = None, None, None, None, None
+        self.subscribers.clear()
+
+
+feed = Feed()
+
+
+async def stream(last_event_id: int | None) -> AsyncIterator[str]:
+    """The text of an event stream, replayed events first, for STREAM_SECONDS at most."""
+    subscriber, replay = await feed.subscribe(last_event_id)
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        for text in replay:
+            yield text
+        deadline = asyncio.get_running_loop().time() + STREAM_SECONDS
+        while (left := deadline - asyncio.get_running_loop().time()) > 0:
+            if subscriber.cut_off and subscriber.queue.empty():
+                return
+            try:
+                yield await asyncio.wait_for(subscriber.queue.get(), min(left, KEEPALIVE_SECONDS))
+            except TimeoutError:
+                yield ': keepalive\n\n'
+    finally:
+        feed.unsubscribe(subscriber)
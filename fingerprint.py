@@ -0,0 +1,249 @@
+"""
+fingerprint.py
+--------------
+Fingerprints of an artifact for the tag annotations in one read of the file, replacing gen_fingerprints.sh.
+
+The file is read once in CHUNK_SIZE pieces and every piece goes to all digests on a pool of threads, one digest per
+thread, while the next piece is read. hashlib and zlib release the GIL on large buffers, so the digests run in
+parallel and the slowest one sets the pace instead of the sum of all.
+blake3, ssdeep and tlsh need their Python packages, entropy uses numpy when installed (pure Python is much slower),
+and the file and mime fields ask file(1) which only reads the headers it needs.
+Unavailable fingerprints stay empty as they did when the shell script missed a tool.
+
+Usage: python fingerprint.py PATH
+"""
+
+import asyncio
+import hashlib
+import math
+import shutil
+import subprocess
+import sys
+import zlib
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import IO, AsyncIterator, Iterator, Protocol
+
+try:
+    import blake3  # type: ignore
+except ImportError:  # pragma: no cover
+    blake3 = None
+try:
+    import numpy  # type: ignore
+except ImportError:  # pragma: no cover
+    numpy = None
+try:
+    import ssdeep  # type: ignore
+except ImportError:  # pragma: no cover
+    ssdeep = None
+try:
+    import tlsh  # type: ignore
+except ImportError:  # pragma: no cover
+    tlsh = None
+
+CHUNK_SIZE = 4 << 20
+HEAD_SIZE = 1 << 20  # Bytes given to file(1) when there is no path to hand it, as for uploads
+HASHLIB_NAMES = {
+    'blake2': 'blake2b',
+    'md5': 'md5',
+    'sha': 'sha1',
+    'sha256': 'sha256',
+    'sha384': 'sha384',
+    'sha512': 'sha512',
+}
+
+
+class Sink(Protocol):
+    def update(self, chunk: bytes) -> None: ...
+
+    def value(self) -> str: ...
+
+
+class Digest:
+    def __init__(self, hasher) -> None:
+        self.hasher = hasher
+
+    def update(self, chunk: bytes) -> None:
+        self.hasher.update(chunk)
+
+    def value(self) -> str:
+        return self.hasher.hexdigest()
+
+
+class CRC32:
+    def __init__(self) -> None:
+        self.crc = 0
+
+    def update(self, chunk: bytes) -> None:
+        self.crc = zlib.crc32(chunk, self.crc)
+
+    def value(self) -> str:
+        return f'{self.crc:08x}'
+
+
+class Entropy:
+    """Shannon entropy in bits per byte, printed as ent -t does."""
+
+    def __init__(self) -> None:
+        self.counts = numpy.zeros(256, dtype=numpy.int64) if numpy else Counter()
+
+    def update(self, chunk: bytes) -> None:
+        if numpy:
+            self.counts += numpy.bincount(numpy.frombuffer(chunk, dtype=numpy.uint8), minlength=256)
+        else:
+            self.counts.update(chunk)
+
+    def value(self) -> str:
+        counts = [int(count) for count in (self.counts if numpy else self.counts.values()) if count]
+        total = sum(counts)
+        return f'{-sum(count / total * math.log2(count / total) for count in counts) + 0.0:f}'
+
+
+class TLSH:
+    def __init__(self) -> None:
+        self.hasher = tlsh.Tlsh()
+
+    def update(self, chunk: bytes) -> None:
+        self.hasher.update(chunk)
+
+    def value(self) -> str:
+        self.hasher.final()
+        return self.hasher.hexdigest() if self.hasher.is_valid() else 'TNULL'
+
+
+def sinks() -> dict[str, Sink]:
+    """The fingerprints computed from the content, by annotation key."""
+    found: dict[str, Sink] = {key: Digest(hashlib.new(name)) for key, name in HASHLIB_NAMES.items()}
+    found['crc32'] = CRC32()
+    found['entropy'] = Entropy()
+    if blake3:
+        found['blake3'] = Digest(blake3.blake3(max_threads=1))
+    if ssdeep:
+        found['ssdeep'] = ssdeep.Hash()
+    if tlsh:
+        found['tlsh'] = TLSH()
+    return found
+
+
+def _file(target: str, *options: str, head: bytes = b'') -> str:
+    if not shutil.which('file'):
+        return ''
+    done = subprocess.run(['file', '-b', *options, target], input=head, capture_output=True, check=False)
+    return done.stdout.decode('utf-8', 'replace').strip()
+
+
+def file_types(path: str | None = None, head: bytes = b'') -> dict[str, str]:
+    """The file, mime-encoding and mime-type fields from file(1) for path, or for head on standard input."""
+    target = path or '-'
+    return {
+        'file': _file(target, head=head),
+        'mime-encoding': _file(target, '--mime-encoding', head=head),
+        'mime-type': _file(target, '--mime-type', head=head),
+    }
+
+
+class Pipeline:
+    """Feed chunks to all sinks on their own threads, one chunk in flight per sink while the next one is read."""
+
+    def __init__(self) -> None:
+        self.sinks = sinks()
+        self.size = 0
+        self.head = b''
+        self.pool = ThreadPoolExecutor(max_workers=len(self.sinks), thread_name_prefix='fingerprint')
+        self.pending: list[Future] = []
+
+    def feed(self, chunk: bytes) -> None:
+        """Wait until all sinks took the previous chunk and start them on this one."""
+        for future in self.pending:
+            future.result()
+        if len(self.head) < HEAD_SIZE:
+            self.head += chunk[: HEAD_SIZE - len(self.head)]
+        self.size += len(chunk)
+        self.pending = [self.pool.submit(sink.update, chunk) for sink in self.sinks.values()]
+
+    def close(self) -> None:
+        self.pool.shutdown(cancel_futures=True)
+
+    def finish(self, path: str | None = None) -> dict[str, str]:
+        """Wait for the last chunk and collect all fingerprints, path or else the head of the data go to file(1)."""
+        try:
+            for future in self.pending:
+                future.result()
+        finally:
+            self.close()
+        found = {key: sink.value() for key, sink in self.sinks.items()}
+        found['bytes'] = str(self.size)
+        found['hex32'] = self.head[:32].hex()
+        return {**found, **file_types(path, self.head if path is None else b'')}
+
+
+def chunks(handle: IO[bytes], size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    while chunk := handle.read(size):
+        yield chunk
+
+
+def fingerprint_file(path: str) -> dict[str, str]:
+    with open(path, 'rb', buffering=0) as handle:
+        pipeline = Pipeline()
+        try:
+            for chunk in chunks(handle, CHUNK_SIZE):
+                pipeline.feed(chunk)
+        except BaseException:
+            pipeline.close()
+            raise
+    return pipeline.finish(path)
+
+
+async def fingerprint_stream(stream: AsyncIterator[bytes]) -> dict[str, str]:
+    """Fingerprint a body as it arrives, gathered to CHUNK_SIZE pieces and without blocking the event loop."""
+    pipeline = Pipeline()
+    buffer = bytearray()
+    try:
+        async for data in stream:
+            buffer += data
+            if len(buffer) >= CHUNK_SIZE:
+                await _wait(pipeline.pending)  # So that feed does not block the event loop
+                pipeline.feed(bytes(buffer))
+                buffer.clear()
+        await _wait(pipeline.pending)
+        if buffer:
+            pipeline.feed(bytes(buffer))
+        await _wait(pipeline.pending)
+    except BaseException:
+        pipeline.close()
+        raise
+    return await asyncio.get_running_loop().run_in_executor(None, pipeline.finish)
+
+
+async def _wait(futures: list[Future]) -> None:
+    await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+
+
+ORDER = (
+    'blake2 blake3 bytes crc32 entropy file hex32 md5 mime-encoding mime-type sha sha256 sha384 sha512 ssdeep tlsh'
+).split()
+PARENTHESIZED = ('file', 'mime-encoding', 'mime-type')
+
+
+def annotation(path: str, found: dict[str, str]) -> str:
+    """The text gen_fingerprints.sh printed for path."""
+    lines = [f'- artifact:{path}:', '']
+    for key in ORDER:
+        value = found.get(key, '')
+        lines.append(f'  + {key}:({value})' if key in PARENTHESIZED else f'  + {key}:{value}')
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv: list[str]) -> int:
+    if len(argv) != 1 or not argv[0]:
+        return 2
+    try:
+        found = fingerprint_file(argv[0])
+    except (FileNotFoundError, IsADirectoryError):
+        return 1
+    sys.stdout.write(annotation(argv[0], found))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,38 @@
+"""
+hashing.py
+----------
+Run the password hashing of model.pwd_context on a small pool of threads instead of the event loop.
+
+bcrypt spends about a quarter of a second of CPU per password at the default cost and releases the GIL meanwhile,
+so a few threads keep the loop free for other requests. Calls beyond HASH_WORKERS running and HASH_QUEUE waiting
+are refused with Busy rather than queued without bound.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+HASH_WORKERS = int(os.getenv('BOS_HASH_WORKERS', '2'))
+HASH_QUEUE = int(os.getenv('BOS_HASH_QUEUE', '8'))
+
+T = TypeVar('T')
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='hashing')
+_pending = 0
+
+
+class Busy(Exception):
+    """All hashing threads are taken and the queue is full."""
+
+
+async def run(function: Callable[..., T], *args: Any) -> T:
+    """Call function(*args) on the hashing pool, raise Busy at once if HASH_WORKERS + HASH_QUEUE calls are pending."""
+    global _pending
+    if _pending >= HASH_WORKERS + HASH_QUEUE:
+        raise Busy(f'{_pending} password hashes pending')
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, function, *args)
+    finally:
+        _pending -= 1
@@ -0,0 +1,107 @@
+"""Incremental decoding of a JSON array or of newline delimited JSON (NDJSON) that arrives in chunks.
+
+Only the record being decoded is held in memory, so a body of any size is processed in constant space.
+"""
+
+import codecs
+import json
+from typing import Any, Iterator
+
+MAX_RECORD_SIZE = 1 << 20  # Characters a single record may span before the stream is considered broken
+WHITESPACE = ' \t\n\r'
+
+
+class MalformedRecord:
+    """Stands in for an NDJSON line that is not JSON, the stream continues with the next line."""
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+class Decoder:
+    """Feed bytes in, get decoded records out.
+
+    The format is detected from the first character: [ starts a JSON array, anything else is read as NDJSON.
+    Errors that make it impossible to find the next record (broken array syntax, an oversized record)
+    raise ValueError, a broken NDJSON line only yields a MalformedRecord.
+    """
+
+    def __init__(self, max_record_size: int = MAX_RECORD_SIZE):
+        self.max_record_size = max_record_size
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._mode: str | None = None
+        self._expect_value = True
+        self._after_comma = False
+        self._closed = False
+
+    def feed(self, chunk: bytes, final: bool = False) -> Iterator[Any]:
+        self._buffer += self._text.decode(chunk, final=final)
+        if self._mode is None:
+            stripped = self._buffer.lstrip(WHITESPACE)
+            if not stripped:
+                self._buffer = ''
+                return
+            if stripped[0] == '[':
+                self._mode, self._buffer = 'array', stripped[1:]
+            else:
+                self._mode = 'ndjson'
+        if self._mode == 'array':
+            yield from self._array(final)
+        else:
+            yield from self._lines(final)
+
+    def _lines(self, final: bool) -> Iterator[Any]:
+        *lines, self._buffer = self._buffer.split('\n')
+        if final:
+            lines.append(self._buffer)
+            self._buffer = ''
+        elif len(self._buffer) > self.max_record_size:
+            raise ValueError(f'NDJSON line longer than {self.max_record_size} characters')
+        for line in lines:
+            if line.strip(WHITESPACE):
+                try:
+                    yield json.loads(line)
+                except ValueError as err:
+                    yield MalformedRecord(str(err))
+
+    def _array(self, final: bool) -> Iterator[Any]:
+        buffer, pos, size = self._buffer, 0, len(self._buffer)
+        try:
+            while True:
+                while pos < size and buffer[pos] in WHITESPACE:
+                    pos += 1
+                if pos == size:
+                    break
+                if self._closed:
+                    raise ValueError(f'Unexpected data after the closing bracket: {buffer[pos:pos + 20]!r}')
+                if not self._expect_value:
+                    if buffer[pos] == ',':
+                        self._expect_value = self._after_comma = True
+                        pos += 1
+                        continue
+                    if buffer[pos] == ']':
+                        self._closed, pos = True, pos + 1
+                        continue
+                    raise ValueError(f'Expected , or ] between records but found {buffer[pos:pos + 20]!r}')
+                if buffer[pos] == ']':
+                    if self._after_comma:
+                        raise ValueError('Expected a record after , but found ]')
+                    self._closed, pos = True, pos + 1
+                    continue
+                try:
+                    record, end = self._json.raw_decode(buffer, pos)
+                except ValueError:
+                    if final or size - pos > self.max_record_size:
+                        raise
+                    break  # The record continues in the next chunk
+                if end == size and not final:
+                    break  # A number at the very end of the buffer may still be missing digits
+                self._expect_value = self._after_comma = False
+                pos = end
+                yield record
+        finally:
+            self._buffer = buffer[pos:]
+        if final and not self._closed:
+            raise ValueError('JSON array is not terminated')
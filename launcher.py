@@ -0,0 +1,112 @@
+"""
+launcher.py
+-----------
+Serve the application with several worker processes for production.
+
+The application is imported and the schema brought up to date once in this process, then WORKERS processes are
+forked that inherit both and accept connections on the one listening socket. SIGTERM or SIGINT make every worker
+stop accepting, finish the requests in flight for up to --graceful-seconds and exit. A worker that dies otherwise
+is replaced.
+
+The workers write through the prod profile, whose writer connection takes SQLite's write lock with BEGIN IMMEDIATE
+and waits for it up to the busy timeout, so the writes of all workers queue on that lock instead of failing, and
+every worker watches the file for the writes of the others to keep its caches right, see peers.py.
+Set BOS_SECRET_KEY, otherwise tokens only work until a restart (the key is drawn once here and shared by the workers).
+
+Usage: python launcher.py [--workers N] [--host HOST] [--port PORT] [--graceful-seconds S]
+"""
+
+import argparse
+import os
+import signal
+import socket
+import sys
+
+WORKERS = int(os.getenv('BOS_WORKERS', str(os.cpu_count() or 1)))
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Serve the application with several worker processes.')
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8003)
+    parser.add_argument('--graceful-seconds', type=int, default=30, help='time to finish requests in flight')
+    parser.add_argument('--access-log', action='store_true', help='log every request')
+    return parser.parse_args(argv)
+
+
+def listen(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def main(argv: list[str]) -> int:
+    options = parse_args(argv)
+    os.environ.setdefault('BOS_DB_PROFILE', 'prod')  # Before the engines are made at the import of db
+
+    import uvicorn  # type: ignore
+    from sqlalchemy import make_url
+
+    import db
+    import peers
+    import server
+    from schema import init_schema
+
+    init_schema(db.write_engine)
+    server.SCHEMA_READY = True
+    for engine in {db.engine, db.write_engine}:
+        engine.dispose()  # No pooled connection may cross the fork
+    database = make_url(db.DB_URL).database
+    sock = listen(options.host, options.port)
+    config = uvicorn.Config(
+        server.app,
+        headers=[('server', 'htsrv/2.1')],
+        access_log=options.access_log,
+        timeout_graceful_shutdown=options.graceful_seconds,
+    )
+    workers: set[int] = set()
+    stopping = False
+
+    def start_worker() -> None:
+        pid = os.fork()
+        if pid:
+            workers.add(pid)
+            return
+        os.setpgid(0, 0)  # Ctrl-C reaches the launcher only, which passes a single SIGTERM on
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, signal.SIG_DFL)
+        if options.workers > 1 and database:
+            peers.watch(database)
+        uvicorn.Server(config).run(sockets=[sock])
+        os._exit(0)
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    url = f'http://{options.host}:{options.port}{server.BASE}/'
+    print(f'Starting notary service with {options.workers} workers at {url}', flush=True)
+    for _ in range(options.workers):
+        start_worker()
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if not stopping:
+            print(f'Worker {pid} exited with status {status}, starting another', file=sys.stderr)
+            start_worker()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,187 @@
+"""
+metrics.py
+----------
+Per request timing of the database and of the serialization, reported in a Server-Timing header and accumulated
+per route for GET /metrics in the Prometheus text format.
+
+The middleware keeps a Timing in a context variable for the request it serves. Cursor events of the engines add the
+time and count of every statement to it, which reaches the worker threads of the sync driver as well as the greenlets
+of the async one, since both run in a copy of the context of the request and the Timing is shared, not copied.
+Everything stays in this process and costs a few clock reads per statement, so it can stay on in production.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator, MutableMapping
+
+from sqlalchemy import Engine, event
+from starlette.responses import JSONResponse
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+CONTENT_TYPE = 'text/plain; version=0.0.4'
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds
+UNMATCHED = 'unmatched'  # Route label of requests no route took, so stray paths cannot grow the label set
+
+
+class Timing:
+    """What one request spent, in seconds."""
+
+    def __init__(self) -> None:
+        self.db = 0.0
+        self.queries = 0
+        self.serialize = 0.0
+
+
+class Route:
+    """Accumulated measurements of one route, method and status."""
+
+    def __init__(self) -> None:
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.db = 0.0
+        self.queries = 0
+        self.serialize = 0.0
+
+    def observe(self, seconds: float, timing: Timing) -> None:
+        for n, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[n] += 1
+                break
+        self.count += 1
+        self.seconds += seconds
+        self.db += timing.db
+        self.queries += timing.queries
+        self.serialize += timing.serialize
+
+
+_current: ContextVar[Timing | None] = ContextVar('timing', default=None)
+_routes: dict[tuple[str, str, int], Route] = {}
+
+
+def instrument(*engines: Engine) -> None:
+    """Count statements and their time on the engines given, each engine once however often it is passed."""
+    for engine in set(engines):
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info['metrics_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    timing = _current.get()
+    if timing is not None:
+        timing.db += time.perf_counter() - conn.info.pop('metrics_started', time.perf_counter())
+        timing.queries += 1
+
+
+@contextmanager
+def serializing() -> Iterator[None]:
+    """Add the time of the block to the serialization time of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing = _current.get()
+        if timing is not None:
+            timing.serialize += time.perf_counter() - started
+
+
+class TimedJSONResponse(JSONResponse):
+    """The default response class, rendering JSON inside serializing."""
+
+    def render(self, content: Any) -> bytes:
+        with serializing():
+            return super().render(content)
+
+
+def server_timing(total: float, timing: Timing) -> str:
+    return (
+        f'db;dur={timing.db * 1e3:.2f};desc="{timing.queries} queries", '
+        f'serialize;dur={timing.serialize * 1e3:.2f}, total;dur={total * 1e3:.2f}'
+    )
+
+
+class Middleware:
+    """Time every HTTP request, add the Server-Timing header and record the request under its route template."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.templates: dict[Any, str] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        timing = Timing()
+        token = _current.set(timing)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_timed(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                header = server_timing(time.perf_counter() - started, timing).encode('latin-1')
+                message['headers'] = [*message.get('headers', []), (b'server-timing', header)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            _current.reset(token)
+            key = (scope['method'], self.template(scope), status)
+            _routes.setdefault(key, Route()).observe(time.perf_counter() - started, timing)
+
+    def template(self, scope: Scope) -> str:
+        """The path of the route that took the request, like /x/api/products/{product_id}."""
+        endpoint = scope.get('endpoint')
+        if endpoint is None:
+            return UNMATCHED
+        if endpoint not in self.templates:
+            routes = [route for route in scope['app'].routes if getattr(route, 'endpoint', None) is endpoint]
+            self.templates[endpoint] = getattr(routes[0], 'path', UNMATCHED) if routes else UNMATCHED
+        return self.templates[endpoint]
+
+
+def _labels(method: str, route: str, status: int) -> str:
+    route = route.replace('\\', '\\\\').replace('"', '\\"')
+    return f'method="{method}",route="{route}",status="{status}"'
+
+
+def exposition() -> Iterator[str]:
+    """The lines of the Prometheus text format for all routes seen so far."""
+    routes = sorted(_routes.items())
+    yield '# HELP bos_request_seconds Time from receiving a request to the end of its response.'
+    yield '# TYPE bos_request_seconds histogram'
+    for key, route in routes:
+        labels = _labels(*key)
+        cumulative = 0
+        for bound, count in zip(BUCKETS, route.buckets):
+            cumulative += count
+            yield f'bos_request_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'bos_request_seconds_bucket{{{labels},le="+Inf"}} {route.count}'
+        yield f'bos_request_seconds_sum{{{labels}}} {route.seconds}'
+        yield f'bos_request_seconds_count{{{labels}}} {route.count}'
+    for name, attribute, text in (
+        ('bos_db_seconds_total', 'db', 'Time spent executing SQL statements.'),
+        ('bos_db_queries_total', 'queries', 'SQL statements executed.'),
+        ('bos_serialize_seconds_total', 'serialize', 'Time spent rendering response bodies.'),
+    ):
+        yield f'# HELP {name} {text}'
+        yield f'# TYPE {name} counter'
+        for key, route in routes:
+            yield f'{name}{{{_labels(*key)}}} {getattr(route, attribute)}'
+
+
+def clear() -> None:
+    _routes.clear()
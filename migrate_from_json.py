@@ -0,0 +1,159 @@
+"""
+migrate_from_json.py
+--------------------
+Import the legacy JSON export, an array of build records, into the products and builds of the catalog.
+
+The file is decoded incrementally with jsonstream, so only one read buffer and one batch of records are in memory
+whatever the size of the export. Products are the topics of the records and are created on first sight, their ids
+stay in a dict for the rest of the run. Builds are inserted BATCH_SIZE per transaction, and after every commit the
+number of records done goes to a checkpoint file, so an interrupted import started again skips what it already wrote.
+A crash between a commit and the checkpoint update repeats that one batch.
+Import while the service is stopped, its ETags and response cache would not learn of the new builds otherwise.
+
+Usage: python migrate_from_json.py [--batch-size N] [--checkpoint FILE] datafile.json
+"""
+
+import argparse
+import datetime as dti
+import functools
+import json
+import os
+import re
+import sys
+from typing import Any, Iterator
+
+from sqlalchemy import Connection, insert, select
+
+import db
+import jsonstream
+from model import EMPTY_SHA512, Build, Product, epoch_micros
+from schema import init_schema
+
+BATCH_SIZE = 5000
+READ_SIZE = 1 << 20
+FAMILY = 'ABCD'
+DESCRIPTION = 'Explain me later.'
+# The two formats of time_ref, 20220904T192021Z and 2022-09-04T19:20:21Z, matched much faster than strptime would
+LEGACY_TIMESTAMPS = (
+    re.compile(r'(\d{4})(\d\d)(\d\d)T(\d\d)(\d\d)(\d\d)Z'),
+    re.compile(r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)Z'),
+)
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def timestamp(time_ref: str) -> int:
+    """The build timestamp in microseconds (see model.EpochMicros) of a legacy time_ref, builds often share one."""
+    for pattern in LEGACY_TIMESTAMPS:
+        if match := pattern.fullmatch(time_ref):
+            return epoch_micros(dti.datetime(*map(int, match.groups())))  # Rejects dates like 2022-02-30
+    raise ValueError(f'time_ref {time_ref!r} is in neither legacy format')
+
+
+def records(path: str) -> Iterator[Any]:
+    decoder = jsonstream.Decoder()
+    with open(path, 'rb') as handle:
+        while chunk := handle.read(READ_SIZE):
+            yield from decoder.feed(chunk)
+    yield from decoder.feed(b'', final=True)
+
+
+def build_row(entry: dict) -> dict:
+    return {
+        'description': entry['summary'],
+        'source': entry['source_url'],
+        'version': entry['tag'],
+        'timestamp': timestamp(entry['time_ref']),
+        'target': entry['target_url'],
+        'taxonomy': '',
+        'sha512': EMPTY_SHA512,
+    }
+
+
+class Checkpoint:
+    """Records of one input file already imported, kept next to it in a small JSON file replaced atomically."""
+
+    def __init__(self, path: str, source: str) -> None:
+        self.path = path
+        self.source = {'source': os.path.abspath(source), 'bytes': os.path.getsize(source)}
+        self.done = 0
+        if os.path.exists(path):
+            with open(path, 'rt', encoding='utf-8') as handle:
+                saved = json.load(handle)
+            if {key: saved.get(key) for key in self.source} != self.source:
+                raise ValueError(f'checkpoint {path} belongs to {saved.get("source")} of {saved.get("bytes")} bytes')
+            self.done = saved['records']
+
+    def save(self, done: int) -> None:
+        self.done = done
+        with open(f'{self.path}.tmp', 'wt', encoding='utf-8') as handle:
+            json.dump({**self.source, 'records': done}, handle)
+        os.replace(f'{self.path}.tmp', self.path)
+
+
+class Importer:
+    def __init__(self, connection: Connection) -> None:
+        self.connection = connection
+        self.products: dict[str, int] = {}
+        query = select(Product.name, Product.id).where(Product.family == FAMILY).order_by(Product.id.desc())
+        for name, id in connection.execute(query):
+            self.products[name] = id  # The oldest product of a name wins, as a resumed import found it first
+        self.created = 0
+
+    def product_id(self, name: str) -> int:
+        if name not in self.products:
+            values = {'family': FAMILY, 'name': name, 'description': DESCRIPTION}
+            self.products[name] = self.connection.execute(insert(Product).values(values)).inserted_primary_key[0]
+            self.created += 1
+        return self.products[name]
+
+    def write(self, batch: list[dict]) -> None:
+        """Insert the builds of one batch of legacy records and commit."""
+        rows = [{**build_row(entry), 'product_id': self.product_id(entry['topic'])} for entry in batch]
+        self.connection.execute(insert(Build), rows)
+        self.connection.commit()
+
+
+def migrate(path: str, checkpoint: Checkpoint, batch_size: int = BATCH_SIZE) -> dict[str, int]:
+    """Import the records of path after those the checkpoint counts as done."""
+    done, seen, batch = checkpoint.done, 0, []
+    with db.write_engine.connect() as connection:
+        importer = Importer(connection)
+        connection.commit()
+        for entry in records(path):
+            seen += 1
+            if seen <= done:
+                continue
+            batch.append(entry)
+            if len(batch) == batch_size:
+                importer.write(batch)
+                checkpoint.save(seen)
+                batch = []
+        if batch:
+            importer.write(batch)
+        checkpoint.save(max(seen, done))
+    return {'builds': max(0, seen - done), 'products': importer.created, 'skipped': min(seen, done)}
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description='Import the legacy JSON export into the catalog.')
+    parser.add_argument('datafile')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='builds per transaction')
+    parser.add_argument('--checkpoint', help='progress file, default datafile.checkpoint')
+    options = parser.parse_args(argv)
+    db.write_engine.echo = False  # The dev profile would log every batch
+    init_schema(db.write_engine)
+    try:
+        checkpoint = Checkpoint(options.checkpoint or f'{options.datafile}.checkpoint', options.datafile)
+    except (OSError, ValueError) as err:
+        print(f'migrate-from-json: {err}', file=sys.stderr)
+        return 2
+    counts = migrate(options.datafile, checkpoint, options.batch_size)
+    print(
+        f'{counts["builds"]} builds and {counts["products"]} products imported,'
+        f' {counts["skipped"]} records skipped as done before'
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,13 +1,74 @@
 import datetime as dti
+import os
+from typing import Annotated, Any
 
 from passlib.context import CryptContext  # type: ignore
+from pydantic import BeforeValidator, PlainSerializer, StringConstraints, field_serializer, field_validator
+from sqlalchemy import BigInteger, TypeDecorator
 from sqlmodel import VARCHAR, Column, Field, Relationship, SQLModel
 
 EMPTY_SHA512 = (
     'cf83e1357eefb8bdf1542850d66d8007d620e4050b5715dc83f4a921d36ce9ce'
     '47d0d13c5d85f2b0ff8318d2877eec2f63b931bd47417a81a538327af927da3e'
 )
-pwd_context = CryptContext(schemes=['bcrypt'])
+MAX_DIGESTS = 50000  # Per verification request
+MAX_BATCH = 1000  # Ids per batch get
+SHA512 = Annotated[str, StringConstraints(strip_whitespace=True, to_lower=True, pattern='^[0-9a-fA-F]{128}$')]
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f +00:00'  # Of the API, always UTC
+UNIX_EPOCH = dti.datetime(1970, 1, 1, tzinfo=dti.timezone.utc)
+BCRYPT_ROUNDS = int(os.getenv('BOS_BCRYPT_ROUNDS', '12'))
+# Hashes of other cost count as deprecated, so they are replaced at the next successful login
+pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+def parse_timestamp(value: Any) -> Any:
+    """An aware UTC datetime from TIMESTAMP_FORMAT or ISO 8601 text, text without offset counts as UTC."""
+    if isinstance(value, str):
+        text = value.strip().rstrip('.')  # The example of BuildInput used to end in a dot
+        try:
+            value = dti.datetime.strptime(text, '%Y-%m-%d %H:%M:%S.%f %z')
+        except ValueError:
+            value = dti.datetime.fromisoformat(text.replace('Z', '+00:00'))
+    if isinstance(value, dti.datetime):
+        return value.replace(tzinfo=dti.timezone.utc) if value.tzinfo is None else value.astimezone(dti.timezone.utc)
+    return value
+
+
+def format_timestamp(value: dti.datetime | str) -> str:
+    return parse_timestamp(value).strftime(TIMESTAMP_FORMAT)
+
+
+def epoch_micros(value: dti.datetime | str) -> int:
+    """Microseconds since 1970 of a timestamp, as EpochMicros stores it."""
+    return (parse_timestamp(value) - UNIX_EPOCH) // dti.timedelta(microseconds=1)
+
+
+def utc_now() -> dti.datetime:
+    return dti.datetime.now(dti.timezone.utc)
+
+
+# Accepted as TIMESTAMP_FORMAT or ISO 8601 and always answered in TIMESTAMP_FORMAT
+Timestamp = Annotated[
+    dti.datetime, BeforeValidator(parse_timestamp), PlainSerializer(format_timestamp, return_type=str)
+]
+
+
+class EpochMicros(TypeDecorator):
+    """A UTC datetime stored as integer microseconds since 1970, which SQLite indexes and compares as numbers.
+
+    Bound values may also be TIMESTAMP_FORMAT text, as in cursors, or microseconds already.
+    """
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect: Any) -> int | None:
+        if value is None or isinstance(value, int):
+            return value
+        return epoch_micros(value)
+
+    def process_result_value(self, value: int | None, dialect: Any) -> dti.datetime | None:
+        return None if value is None else UNIX_EPOCH + dti.timedelta(microseconds=value)
 
 
 class UserOutput(SQLModel):
@@ -28,12 +89,23 @@ class User(SQLModel, table=True):
         """Verify given password by hashing and comparing to password_hash."""
         return pwd_context.verify(password, self.password_hash)
 
+    def verify_and_update(self, password) -> tuple[bool, str | None]:
+        """Verify like verify_password and also return a new hash if password_hash does not use BCRYPT_ROUNDS."""
+        return pwd_context.verify_and_update(password, self.password_hash)
+
+
+class RevokedToken(SQLModel, table=True):
+    """A logged out access token, kept until it expires anyway."""
+
+    jti: str = Field(primary_key=True)
+    expires: int  # Unix time of the exp claim
+
 
 class BuildInput(SQLModel):
     description: str | None = ''
     source: str | None = ''
     version: str | None = ''
-    timestamp: str = Field(default=dti.datetime.now(dti.timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f +00:00'))
+    timestamp: dti.datetime = Field(default_factory=utc_now, sa_type=EpochMicros, nullable=False)
     target: str | None = Field(default='')
     taxonomy: str | None = Field(default='')
     sha512: str | None = Field(default=EMPTY_SHA512)
@@ -44,18 +116,31 @@ class BuildInput(SQLModel):
                 'description': 'the precious build',
                 'source': 'https://example.com/vcs/branch/xyz/',
                 'version': '2022.9.4',
-                'timestamp': '2022-09-04 19:20:21.123456 +00:00.',
+                'timestamp': '2022-09-04 19:20:21.123456 +00:00',
                 'target': 'https://example.com/brm/family/product/version/',
                 'taxonomy': '{}',
                 'sha512': EMPTY_SHA512,
             }
         }
 
+    @field_validator('timestamp', mode='before')
+    @classmethod
+    def accept_timestamp(cls, value: Any) -> Any:
+        return parse_timestamp(value)
+
+    @field_serializer('timestamp', when_used='json')
+    def answer_timestamp(self, value: dti.datetime | str) -> str:
+        return format_timestamp(value)
+
 
 class BuildOutput(BuildInput):
     id: int
 
 
+class BulkBuildInput(BuildInput):
+    product_id: int
+
+
 class Build(BuildInput, table=True):
     id: int | None = Field(default=None, primary_key=True)
     product_id: int = Field(foreign_key='product.id')
@@ -79,3 +164,94 @@ class Product(ProductInput, table=True):
 class ProductOutput(ProductInput):
     id: int
     builds: list[BuildOutput] = []
+
+
+class ProductStats(SQLModel, table=True):
+    """Build summary of one product, written only by the triggers of step 6 in schema.py."""
+
+    __tablename__ = 'product_stats'
+
+    product_id: int = Field(primary_key=True, foreign_key='product.id')
+    builds: int = 0
+    first_seen: dti.datetime | None = Field(default=None, sa_type=EpochMicros)  # Timestamp of the earliest build
+    latest_timestamp: dti.datetime | None = Field(default=None, sa_type=EpochMicros)
+    latest_version: str | None = None
+    latest_build_id: int | None = None  # The latest build is the last in (timestamp, id) order
+
+
+class ChangeEvent(SQLModel, table=True):
+    """A write to a product or build, appended by the triggers of step 7 in schema.py for the change feed."""
+
+    __tablename__ = 'change_event'
+
+    id: int | None = Field(default=None, primary_key=True)
+    kind: str  # product or build
+    action: str  # create, update or delete
+    product_id: int
+    build_id: int | None = None
+    at: dti.datetime = Field(sa_type=EpochMicros)  # Time of the write, to the millisecond
+
+
+class ProductStatsOutput(SQLModel):
+    product_id: int
+    family: str
+    name: str
+    builds: int
+    first_seen: Timestamp | None
+    latest_timestamp: Timestamp | None
+    latest_version: str | None
+    latest_build_id: int | None
+
+
+class FamilyStatsOutput(SQLModel):
+    family: str
+    products: int = 0
+    builds: int = 0
+    first_seen: Timestamp | None = None
+    latest_timestamp: Timestamp | None = None
+    latest_version: str | None = None
+    latest_build_id: int | None = None
+    latest_product_id: int | None = None
+
+
+class StatsOutput(SQLModel):
+    families: list[FamilyStatsOutput]  # In family order
+    products: list[ProductStatsOutput]  # In family, name and id order
+
+
+class SearchHit(SQLModel):
+    kind: str  # product or build
+    id: int
+    product_id: int
+    name: str  # Of the product
+    version: str | None = None
+    description: str | None = None
+    rank: float | None  # bm25 of the match, lower is better, None for queries too broad to rank
+
+
+class DigestsInput(SQLModel):
+    sha512: list[SHA512] = Field(max_length=MAX_DIGESTS)
+
+
+class DigestMatch(SQLModel):
+    product_id: int
+    build_id: int
+
+
+class DigestsOutput(SQLModel):
+    matches: dict[str, list[DigestMatch]]  # By digest, in the order of the builds
+    unknown: list[str]  # In the order given
+
+
+class BatchGetInput(SQLModel):
+    ids: list[int] = Field(max_length=MAX_BATCH)
+
+
+class ProductsBatchOutput(SQLModel):
+    found: dict[int, ProductOutput]  # By id, in the order asked
+    not_found: list[int]  # In the order asked
+
+
+class BuildsBatchOutput(SQLModel):
+    found: dict[int, Build]  # By id, in the order asked
+    not_found: list[int]  # In the order asked
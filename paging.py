@@ -0,0 +1,53 @@
+"""Keyset (cursor) pagination shared by the listing routes.
+
+A cursor is the sort key of the last row on a page, JSON encoded and base64url wrapped so clients treat it as opaque.
+The next page is then a range scan starting right after that key, which costs the same on page 1 and page 10_000.
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, Callable, Sequence, TypeVar
+from urllib.parse import parse_qs, urlsplit
+
+from fastapi import HTTPException, Request, Response
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+T = TypeVar('T')
+
+
+def encode_cursor(key: dict[str, Any]) -> str:
+    raw = json.dumps(key, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, *fields: str) -> tuple:
+    """Return the values of fields from the cursor in the order given or answer 400 if the cursor is unusable."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return tuple(key[field] for field in fields)
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail=f'Malformed cursor after={cursor}.')
+
+
+def clamp(limit: int) -> int:
+    """Cap the page size server-side whatever the client asked for."""
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def page(rows: Sequence[T], limit: int, request: Request, response: Response, key: Callable[[T], dict]) -> list[T]:
+    """Trim the probe row fetched beyond limit and announce the next page in a Link header if there is one."""
+    if len(rows) <= limit:
+        return list(rows)
+    rows = rows[:limit]
+    url = request.url.include_query_params(after=encode_cursor(key(rows[-1])))
+    response.headers['Link'] = f'<{url}>; rel="next"'
+    return list(rows)
+
+
+def next_cursor(response: Response) -> str | None:
+    """The after parameter of the next page page() announced on response, for pages that render links themselves."""
+    link = response.headers.get('link')
+    return parse_qs(urlsplit(link.split('>', 1)[0].lstrip('<')).query)['after'][0] if link else None
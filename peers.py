@@ -0,0 +1,63 @@
+"""
+peers.py
+--------
+Notice commits of other processes to the database file and forget what this process derived from the older state.
+
+Each worker of launcher.py keeps ETag versions, cached responses and fragments, the name index of the catalog pages
+and the revocation checks of tokens in memory, and only learns about its own writes through the routes. SQLite's
+PRAGMA data_version changes whenever another connection committed to the file, so one spare connection asks it
+before every request, which costs microseconds and no I/O in WAL mode. When it changed, the callbacks given to
+on_change run and everything counts as written.
+
+The engines of this process are other connections as well, so its own writes trigger this too. That is why only
+the launcher switches it on, when several workers share the file.
+"""
+
+import sqlite3
+from typing import Any, Awaitable, Callable, MutableMapping
+
+Scope = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[MutableMapping[str, Any]]]
+Send = Callable[[MutableMapping[str, Any]], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+_connection: sqlite3.Connection | None = None
+_version = 0
+_callbacks: list[Callable[[], Any]] = []
+
+
+def on_change(*callbacks: Callable[[], Any]) -> None:
+    _callbacks.extend(callbacks)
+
+
+def watch(path: str) -> None:
+    """Start watching the database file at path, call this in the worker process after the fork."""
+    global _connection, _version
+    _connection = sqlite3.connect(path, check_same_thread=False)
+    _version = _connection.execute('PRAGMA data_version').fetchone()[0]
+
+
+def check() -> bool:
+    """Run the callbacks if another connection committed since the last check and return whether one did."""
+    global _version
+    if _connection is None:
+        return False
+    version = _connection.execute('PRAGMA data_version').fetchone()[0]
+    if version == _version:
+        return False
+    _version = version
+    for callback in _callbacks:
+        callback()
+    return True
+
+
+class Middleware:
+    """Check for writes of other processes before every HTTP request."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'http':
+            check()
+        await self.app(scope, receive, send)
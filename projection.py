@@ -0,0 +1,106 @@
+"""
+projection.py
+-------------
+The ?fields= and ?embed= parameters of the read routes.
+
+fields=name,version lists the fields of the records to answer with and embed=builds nests the builds of products,
+whose fields are chosen as builds.version and so on (naming one embeds them too). Only those columns, plus the ones
+a page cursor needs, go into the SELECT, embedded builds come in one more query for all products of an answer and
+the records are rendered from the rows without model instances. Without either parameter the routes answer as they
+always did, so they keep their full models and cached responses.
+"""
+
+import json
+from typing import Any, Iterable
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Row, Select
+from sqlalchemy import select as select_rows
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import metrics
+from model import Build, format_timestamp
+
+# In the order of the full models, so projected records list their fields as unprojected ones do
+PRODUCT_FIELDS = ('family', 'name', 'description', 'id')
+BUILD_FIELDS = ('description', 'source', 'version', 'timestamp', 'target', 'taxonomy', 'sha512', 'id', 'product_id')
+JSON = 'application/json'
+
+
+class Projection:
+    """Fields of the records and of their embedded builds, builds is None unless they are embedded."""
+
+    def __init__(self, fields: tuple[str, ...], builds: tuple[str, ...] | None) -> None:
+        self.fields = fields
+        self.builds = builds
+
+    @property
+    def key(self) -> tuple:
+        """Part of the keys of cached responses."""
+        return (self.fields, self.builds)
+
+
+def parse(fields: str | None, embed: str | None, names: tuple[str, ...]) -> Projection | None:
+    """The projection of the parameters on records with the fields names, None without either, or answer 400.
+
+    Only products (names is PRODUCT_FIELDS) embed builds.
+    """
+    if fields is None and embed is None:
+        return None
+    embeds = names == PRODUCT_FIELDS
+    embedded = {name.strip() for name in (embed or '').split(',') if name.strip()}
+    own, nested = set(), set()
+    for field in (field.strip() for field in (fields or '').split(',')):
+        if embeds and field.startswith('builds.'):
+            nested.add(field.removeprefix('builds.'))
+            embedded.add('builds')
+        elif embeds and field == 'builds':
+            embedded.add('builds')
+        elif field:
+            own.add(field)
+    if embedded - ({'builds'} if embeds else set()):
+        raise HTTPException(status_code=400, detail=f'Cannot embed {",".join(sorted(embedded))} here.')
+    unknown = sorted(own - set(names)) + [f'builds.{field}' for field in sorted(nested - set(BUILD_FIELDS))]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f'Unknown fields {",".join(unknown)}.')
+    builds = tuple(name for name in BUILD_FIELDS if name in nested or not nested) if embedded else None
+    return Projection(tuple(name for name in names if name in own or not own), builds)
+
+
+def query(model: Any, fields: Iterable[str], *keys: str) -> Select:
+    """Select the columns of model for fields, with those a cursor or the embedding needs, always into rows.
+
+    sqlmodel's select would make a single column, like fields=id, come back as bare values.
+    """
+    return select_rows(*(getattr(model, name) for name in dict.fromkeys((*fields, *keys))))
+
+
+def record(row: Row, fields: Iterable[str]) -> dict[str, Any]:
+    values = row._mapping
+    return {
+        name: format_timestamp(values[name]) if name == 'timestamp' else values[name]
+        for name in fields  # Timestamps are never None, the column is NOT NULL
+    }
+
+
+async def products(rows: list[Row], view: Projection, session: AsyncSession) -> list[dict[str, Any]]:
+    """Records of product rows selected with query(Product, view.fields, 'id'), their builds embedded if asked."""
+    records = [record(row, view.fields) for row in rows]
+    if view.builds is not None and rows:
+        builds: dict[int, list[dict[str, Any]]] = {row.id: [] for row in rows}
+        rows_query = query(Build, view.builds, 'product_id').where(Build.product_id.in_(builds))  # type: ignore
+        for build in (await session.exec(rows_query.order_by(Build.product_id, Build.id))).all():
+            builds[build.product_id].append(record(build, view.builds))
+        for product, row in zip(records, rows):
+            product['builds'] = builds[row.id]
+    return records
+
+
+def render(payload: Any) -> bytes:
+    with metrics.serializing():
+        return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def respond(payload: Any, response: Response) -> Response:
+    """payload as JSON with the headers the route set on its response parameter, like ETag and Link."""
+    return Response(render(payload), media_type=JSON, headers=dict(response.headers))
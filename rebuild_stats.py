@@ -0,0 +1,37 @@
+"""
+rebuild_stats.py
+----------------
+Recompute the build summaries of /api/stats from the builds, in one transaction.
+
+The triggers of step 6 in schema.py keep product_stats current through every write, so this is only needed after
+writes that bypassed them, like a restored table or triggers dropped by hand. It reads every build once.
+
+Usage: python rebuild_stats.py
+"""
+
+import sys
+
+from sqlalchemy import Engine, func, select
+
+import db
+from model import ProductStats
+from schema import PRODUCT_STATS_REBUILD, init_schema
+
+
+def rebuild(engine: Engine) -> int:
+    """Recompute all summaries and return the number of products."""
+    with engine.begin() as connection:
+        for statement in PRODUCT_STATS_REBUILD:
+            connection.exec_driver_sql(statement)
+        return connection.execute(select(func.count()).select_from(ProductStats)).scalar_one()
+
+
+def main() -> int:
+    db.write_engine.echo = False  # The dev profile would log the statements
+    init_schema(db.write_engine)
+    print(f'Summaries of {rebuild(db.write_engine)} products rebuilt')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,34 +1,114 @@
+import os
+import secrets
+import time
+import uuid
+
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlmodel import Session, select
+from jose import JWTError, jwt
+from sqlmodel import delete, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette import status
 
-from db import get_session
-from model import User, UserOutput
+import db
+import hashing
+from db import get_async_session, get_async_write_session
+from model import RevokedToken, User, UserOutput
 
 URL_PREFIX = '/auth'
 router = APIRouter(prefix=URL_PREFIX)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f'{URL_PREFIX}/token')
 
+# Without BOS_SECRET_KEY every start invalidates the tokens issued before, set it to share tokens between processes
+SECRET_KEY = os.getenv('BOS_SECRET_KEY') or secrets.token_hex(32)
+ALGORITHM = 'HS256'
+TOKEN_SECONDS = int(os.getenv('BOS_TOKEN_SECONDS', '1800'))
+REVOCATION_CHECK_SECONDS = 60  # How long a token found not revoked is trusted without asking the database again
+REVOCATION_CACHE_SIZE = 10000
+
+_revocations: dict[str, tuple[bool, float]] = {}  # jti: (revoked, monotonic time until the answer is trusted)
+
+
+def create_access_token(user: UserOutput) -> str:
+    """A signed token naming the user that expires after TOKEN_SECONDS."""
+    now = int(time.time())
+    claims = {'sub': user.username, 'uid': user.id, 'jti': uuid.uuid4().hex, 'iat': now, 'exp': now + TOKEN_SECONDS}
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def _remember(jti: str, revoked: bool, seconds: float) -> None:
+    if len(_revocations) >= REVOCATION_CACHE_SIZE:
+        now = time.monotonic()
+        for key in [key for key, (_, until) in _revocations.items() if until <= now]:
+            del _revocations[key]
+        if len(_revocations) >= REVOCATION_CACHE_SIZE:
+            _revocations.clear()
+    _revocations[jti] = (revoked, time.monotonic() + seconds)
+
+
+def forget_revocations() -> None:
+    """Check every token against the database again at its next use."""
+    _revocations.clear()
 
-def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> UserOutput:
-    query = select(User).where(User.username == token)
-    user = session.exec(query).first()
-    if user:
-        return UserOutput.from_orm(user)
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail='Username or password incorrect',
-            headers={'WWW-Authenticate': 'Bearer'},
-        )
+
+async def is_revoked(jti: str) -> bool:
+    """Whether the token was logged out, asking the database at most every REVOCATION_CHECK_SECONDS per token."""
+    revoked, until = _revocations.get(jti, (False, 0.0))
+    if until > time.monotonic():
+        return revoked
+    async with db.async_session() as session:
+        revoked = await session.get(RevokedToken, jti) is not None
+    _remember(jti, revoked, REVOCATION_CHECK_SECONDS)
+    return revoked
+
+
+async def get_claims(token: str = Depends(oauth2_scheme)) -> dict:
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        if not await is_revoked(claims['jti']):
+            return claims
+    except (JWTError, KeyError):
+        pass
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail='Could not validate credentials',
+        headers={'WWW-Authenticate': 'Bearer'},
+    )
+
+
+async def get_current_user(claims: dict = Depends(get_claims)) -> UserOutput:
+    """The user the bearer token was issued to, verified by its signature alone."""
+    return UserOutput(id=claims['uid'], username=claims['sub'])
 
 
 @router.post('/token')
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_async_session)):
     query = select(User).where(User.username == form_data.username)
-    user = session.exec(query).first()
-    if user and user.verify_password(form_data.password):
-        return {'access_token': user.username, 'token_type': 'bearer'}
-    else:
+    user = (await session.exec(query)).first()
+    await session.commit()  # Do not hold the read transaction while hashing
+    try:
+        verified, new_hash = await hashing.run(user.verify_and_update, form_data.password) if user else (False, None)
+    except hashing.Busy:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail='Too many logins at once, try again shortly',
+            headers={'Retry-After': '1'},
+        )
+    if not user or not verified:
         raise HTTPException(status_code=400, detail='Incorrect username or password')
+    if new_hash:
+        async with db.async_write_session() as write_session:
+            statement = update(User).where(User.id == user.id, User.password_hash == user.password_hash)
+            await write_session.exec(statement.values(password_hash=new_hash))  # type: ignore
+            await write_session.commit()
+    token = create_access_token(UserOutput.model_validate(user))
+    return {'access_token': token, 'token_type': 'bearer', 'expires_in': TOKEN_SECONDS}
+
+
+@router.post('/logout', status_code=status.HTTP_204_NO_CONTENT)
+async def logout(claims: dict = Depends(get_claims), session: AsyncSession = Depends(get_async_write_session)) -> None:
+    """Revoke the bearer token, other processes notice within REVOCATION_CHECK_SECONDS."""
+    await session.exec(delete(RevokedToken).where(RevokedToken.expires < time.time()))  # type: ignore
+    session.add(RevokedToken(jti=claims['jti'], expires=claims['exp']))
+    await session.commit()
+    _remember(claims['jti'], True, max(claims['exp'] - time.time(), 0))
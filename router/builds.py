@@ -0,0 +1,213 @@
+import json
+import tempfile
+from typing import IO, Annotated, Any, AsyncIterator, Iterator
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import ValidationError
+from sqlalchemy import func, insert, literal, tuple_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.responses import StreamingResponse
+
+import etags
+import jsonstream
+import paging
+import projection
+from db import get_async_session, get_async_write_session
+from model import (SHA512, BatchGetInput, Build, BuildsBatchOutput, BulkBuildInput, DigestMatch, DigestsInput,
+                   DigestsOutput, EpochMicros, Product, Timestamp, User)
+from router.auth import get_current_user
+from router.products import batch_ids, build_key, changed, timestamp_cursor
+
+router = APIRouter(prefix='/api/builds')
+
+BULK_BATCH_SIZE = 500
+RESULTS_SPOOL_SIZE = 1 << 20  # Bytes of results kept in memory before they go to a temporary file
+RESULTS_CHUNK_SIZE = 1 << 16
+
+
+def _ndjson(result: dict[str, Any]) -> bytes:
+    return json.dumps(result, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def _problem(err: ValidationError) -> str:
+    return '; '.join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in err.errors())
+
+
+async def _records(request: Request) -> AsyncIterator[Any]:
+    decoder = jsonstream.Decoder()
+    async for chunk in request.stream():
+        for record in decoder.feed(chunk):
+            yield record
+    for record in decoder.feed(b'', final=True):
+        yield record
+
+
+async def _insert_batch(
+    session: AsyncSession, batch: list[tuple[int, BulkBuildInput | str]], known: dict[int, bool]
+) -> list[dict[str, Any]]:
+    """Insert the valid builds of existing products in one executemany transaction and report per record."""
+    unknown = {item.product_id for _, item in batch if not isinstance(item, str)} - known.keys()
+    if unknown:
+        found = set((await session.exec(select(Product.id).where(Product.id.in_(unknown)))).all())
+        known.update((product_id, product_id in found) for product_id in unknown)
+    results, rows, slots = [], [], []
+    for index, item in batch:
+        if isinstance(item, str):
+            results.append({'index': index, 'error': item})
+        elif known[item.product_id]:
+            rows.append(item.model_dump())
+            slots.append(index)
+        else:
+            results.append({'index': index, 'error': f'No product with id={item.product_id}.'})
+    if rows:
+        statement = insert(Build).returning(Build.id, sort_by_parameter_order=True)
+        ids = (await session.exec(statement, params=rows)).scalars().all()  # type: ignore
+        results.extend({'index': index, 'id': id} for index, id in zip(slots, ids))
+    await session.commit()  # Also ends the read transaction so the writer connection is free between batches
+    if rows:
+        changed(*{row['product_id'] for row in rows})
+    return sorted(results, key=lambda result: result['index'])
+
+
+def _replay(spool: IO[bytes]) -> Iterator[bytes]:
+    try:
+        yield from iter(lambda: spool.read(RESULTS_CHUNK_SIZE), b'')
+    finally:
+        spool.close()
+
+
+async def builds_batch(ids: list[int], session: AsyncSession) -> BuildsBatchOutput:
+    """The builds of ids in one IN query on the primary key."""
+    wanted = list(dict.fromkeys(ids))
+    builds = {build.id: build for build in (await session.exec(select(Build).where(Build.id.in_(wanted)))).all()}
+    return BuildsBatchOutput(
+        found={id: builds[id] for id in wanted if id in builds},
+        not_found=[id for id in wanted if id not in builds],
+    )
+
+
+async def projected_builds_batch(ids: list[int], view: projection.Projection, session: AsyncSession) -> dict:
+    """builds_batch reading only the columns of view."""
+    query = projection.query(Build, view.fields, 'id').where(Build.id.in_(ids))  # type: ignore
+    records = {row.id: projection.record(row, view.fields) for row in (await session.exec(query)).all()}
+    return {
+        'found': {id: records[id] for id in ids if id in records},
+        'not_found': [id for id in ids if id not in records],
+    }
+
+
+@router.get('/', response_model=list[Build] | BuildsBatchOutput)
+async def get_builds(
+    request: Request,
+    response: Response,
+    since: Timestamp | None = None,
+    until: Timestamp | None = None,
+    ids: Annotated[list[str], Query()] = [],
+    fields: str | None = None,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1)] = paging.DEFAULT_LIMIT,
+    session: AsyncSession = Depends(get_async_session),
+) -> list[Build] | BuildsBatchOutput | Response:
+    """The builds of all products with since <= timestamp < until, newest first, or with ids=1,2,3 those builds.
+
+    Both bounds are optional, as TIMESTAMP_FORMAT or ISO 8601 text, and the page walks ix_build_timestamp_id
+    backwards, so a range costs the builds of the page whatever the size of the catalog. fields shapes the records,
+    see projection.py.
+    """
+    etags.conditional(request, response, etags.catalog())
+    view = projection.parse(fields, None, projection.BUILD_FIELDS)
+    if ids:
+        if view is None:
+            return await builds_batch(batch_ids(ids), session)
+        return projection.respond(await projected_builds_batch(batch_ids(ids), view, session), response)
+    limit = paging.clamp(limit)
+    query = select(Build) if view is None else projection.query(Build, view.fields, 'timestamp', 'id')
+    query = query.order_by(Build.timestamp.desc(), Build.id.desc()).limit(limit + 1)  # type: ignore
+    if since is not None:
+        query = query.where(Build.timestamp >= literal(since, EpochMicros))
+    if until is not None:
+        query = query.where(Build.timestamp < literal(until, EpochMicros))
+    if after:
+        timestamp, id = timestamp_cursor(after)
+        query = query.where(tuple_(Build.timestamp, Build.id) < tuple_(literal(timestamp, EpochMicros), id))
+    builds = paging.page((await session.exec(query)).all(), limit, request, response, key=build_key)
+    if view is None:
+        return builds
+    return projection.respond([projection.record(build, view.fields) for build in builds], response)
+
+
+@router.post(':batchGet', response_model=BuildsBatchOutput)
+async def batch_get_builds(
+    batch: BatchGetInput, session: AsyncSession = Depends(get_async_session)
+) -> BuildsBatchOutput:
+    """Like GET /?ids= for lists of ids too long for a URL."""
+    return await builds_batch(batch.ids, session)
+
+
+@router.post('/bulk')
+async def add_builds(
+    request: Request,
+    session: AsyncSession = Depends(get_async_write_session),
+    user: User = Depends(get_current_user),
+) -> StreamingResponse:
+    """Register builds of any products from a JSON array or an NDJSON body of BulkBuildInput records.
+
+    The body is validated and inserted while it streams in, in transactions of BULK_BATCH_SIZE records.
+    The answer is NDJSON with one line per record in input order, either {"index": i, "id": id} or
+    {"index": i, "error": "..."}. It is spooled (to disk beyond RESULTS_SPOOL_SIZE) until the body is consumed,
+    since the response may only start once the request body has been read completely.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=RESULTS_SPOOL_SIZE)
+    batch: list[tuple[int, BulkBuildInput | str]] = []
+    known: dict[int, bool] = {}
+    index = 0
+    records = _records(request)
+    while True:
+        try:
+            record = await anext(records)
+        except StopAsyncIteration:
+            break
+        except ValueError as err:
+            batch.append((index, f'Unreadable body, stopped: {err}'))
+            break
+        if isinstance(record, jsonstream.MalformedRecord):
+            batch.append((index, record.message))
+        else:
+            try:
+                batch.append((index, BulkBuildInput.model_validate(record)))
+            except ValidationError as err:
+                batch.append((index, _problem(err)))
+        index += 1
+        if len(batch) == BULK_BATCH_SIZE:
+            pending, batch = batch, []
+            spool.writelines(_ndjson(result) for result in await _insert_batch(session, pending, known))
+    if batch:
+        spool.writelines(_ndjson(result) for result in await _insert_batch(session, batch, known))
+    spool.seek(0)
+    return StreamingResponse(_replay(spool), media_type='application/x-ndjson')
+
+
+@router.get('/sha512/{digest}', response_model=list[Build])
+async def builds_by_digest(digest: SHA512, session: AsyncSession = Depends(get_async_session)) -> list[Build]:
+    """The builds whose artifact has this SHA-512 digest (hex), found through ix_build_sha512."""
+    builds = (await session.exec(select(Build).where(Build.sha512 == digest).order_by(Build.id))).all()
+    if not builds:
+        raise HTTPException(status_code=404, detail=f'No build with sha512={digest}.')
+    return list(builds)
+
+
+@router.post('/verify', response_model=DigestsOutput)
+async def verify_digests(digests: DigestsInput, session: AsyncSession = Depends(get_async_session)) -> DigestsOutput:
+    """Which of up to MAX_DIGESTS artifact digests belong to registered builds, and to which.
+
+    The digests travel as one JSON array parameter that SQLite unpacks with json_each, so a single query probes
+    ix_build_sha512 once per distinct digest whatever the size of the list.
+    """
+    wanted = func.json_each(json.dumps(sorted(set(digests.sha512)))).table_valued('value')
+    query = select(Build.sha512, Build.product_id, Build.id)
+    query = query.where(Build.sha512.in_(select(wanted.c.value)))  # type: ignore
+    matches: dict[str, list[DigestMatch]] = {}
+    for digest, product_id, build_id in (await session.exec(query.order_by(Build.id))).all():
+        matches.setdefault(digest, []).append(DigestMatch(product_id=product_id, build_id=build_id))
+    return DigestsOutput(matches=matches, unknown=[digest for digest in digests.sha512 if digest not in matches])
@@ -0,0 +1,25 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Header
+from starlette.responses import StreamingResponse
+
+import events
+
+router = APIRouter(prefix='/api/events')
+
+
+@router.get('/')
+async def get_events(
+    last_event_id: Annotated[int | None, Header()] = None, after: int | None = None
+) -> StreamingResponse:
+    """Writes to products and builds as server-sent events, see events.py.
+
+    Each event is named kind.action, like build.create, with the ids in its JSON data. Clients resume after the
+    event id in the Last-Event-ID header, which EventSource sends by itself when it reconnects, or in after for a
+    first connection. A reset event means events were missed and the catalog should be read afresh.
+    """
+    return StreamingResponse(
+        events.stream(last_event_id if last_event_id is not None else after),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
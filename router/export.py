@@ -0,0 +1,18 @@
+from typing import Literal
+
+from fastapi import APIRouter
+from starlette.responses import StreamingResponse
+
+import catalog_export
+
+router = APIRouter(prefix='/api/export')
+
+
+@router.get('/')
+async def export_catalog(format: Literal['ndjson', 'csv'] = 'ndjson') -> StreamingResponse:
+    """All products with their builds, streamed from a server-side cursor as NDJSON or CSV."""
+    return StreamingResponse(
+        catalog_export.export_chunks(format),
+        media_type=catalog_export.MEDIA_TYPES[format],
+        headers={'Content-Disposition': f'attachment; filename="catalog.{format}"'},
+    )
@@ -1,99 +1,354 @@
-from typing import List
+from typing import Annotated, List
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import Row, Select, literal, tuple_
+from sqlalchemy.orm import raiseload, selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from db import get_session
-from model import Build, BuildInput, Product, ProductInput, ProductOutput, User
+import cache
+import db
+import etags
+import events
+import fingerprint
+import metrics
+import paging
+import projection
+from db import get_async_session, get_async_write_session
+from model import (MAX_BATCH, BatchGetInput, Build, BuildInput, EpochMicros, Product, ProductInput, ProductOutput,
+                   ProductsBatchOutput, ProductStats, User, format_timestamp, parse_timestamp)
 from router.auth import get_current_user
 
 router = APIRouter(prefix='/api/products')
+JSON = 'application/json'
+LATEST_BATCH = paging.MAX_LIMIT  # Products per request of GET /builds/latest
 
 
-@router.get('/')
-def get_products(name: str | None = None, session: Session = Depends(get_session)) -> list:
-    query = select(Product)
+def changed(*product_ids: int) -> None:
+    """Invalidate the ETags and cached responses of products right after a write to them committed."""
+    etags.bump(*product_ids)
+    for product_id in product_ids:
+        cache.responses.invalidate(product_id)
+    events.feed.poke()
+
+
+async def product_build(
+    product_id: int, id: int, session: AsyncSession, view: projection.Projection | None = None
+) -> Build | Row:
+    """Single indexed lookup on (product_id, id) that only falls back to a product query to word the 404.
+
+    With a view only its columns are read, into a row.
+    """
+    query = select(Build) if view is None else projection.query(Build, view.fields)
+    build = (await session.exec(query.where(Build.product_id == product_id, Build.id == id))).first()
+    if build:
+        return build
+    if await session.get(Product, product_id, options=[raiseload(Product.builds)]):
+        raise HTTPException(status_code=404, detail=f'No product/build with ids={product_id}/{id}.')
+    else:
+        raise HTTPException(status_code=404, detail=f'No product with id={product_id}.')
+
+
+def builds_page_query(
+    product_id: int, after: str | None, limit: int, view: projection.Projection | None = None
+) -> Select:
+    """A page of the builds of a product in (timestamp, id) order plus one probe row, see paging.page.
+
+    With a view only its columns and those of the cursor are selected, into rows.
+    """
+    query = select(Build) if view is None else projection.query(Build, view.fields, 'timestamp', 'id')
+    query = query.where(Build.product_id == product_id).order_by(Build.timestamp, Build.id).limit(limit + 1)
+    if after:
+        timestamp, id = timestamp_cursor(after)
+        query = query.where(tuple_(Build.timestamp, Build.id) > tuple_(literal(timestamp, EpochMicros), id))
+    return query
+
+
+def timestamp_cursor(after: str) -> tuple:
+    """The (timestamp, id) a cursor of build_key holds, or answer 400."""
+    timestamp, id = paging.decode_cursor(after, 'timestamp', 'id')
+    try:
+        if isinstance(timestamp, str) and isinstance(id, int):
+            return parse_timestamp(timestamp), id
+    except ValueError:
+        pass
+    raise HTTPException(status_code=400, detail=f'Malformed cursor after={after}.')
+
+
+def build_key(build: Build | Row) -> dict:
+    return {'timestamp': format_timestamp(build.timestamp), 'id': build.id}
+
+
+def batch_ids(ids: list[str]) -> list[int]:
+    """The distinct ids of ids=1,2&ids=3 in the order given, or answer 400."""
+    try:
+        wanted = list(dict.fromkeys(int(id) for value in ids for id in value.split(',') if id.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f'Malformed ids={",".join(ids)}.')
+    if len(wanted) > MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f'At most {MAX_BATCH} ids per request.')
+    return wanted
+
+
+async def products_batch(ids: list[int], session: AsyncSession) -> ProductsBatchOutput:
+    """The products of ids with their builds in two queries, one IN on product and one selectinload on build."""
+    wanted = list(dict.fromkeys(ids))
+    query = select(Product).options(selectinload(Product.builds)).where(Product.id.in_(wanted))  # type: ignore
+    products = {product.id: product for product in (await session.exec(query)).all()}
+    return ProductsBatchOutput(
+        found={id: ProductOutput.model_validate(products[id]) for id in wanted if id in products},
+        not_found=[id for id in wanted if id not in products],
+    )
+
+
+async def projected_products_batch(ids: list[int], view: projection.Projection, session: AsyncSession) -> dict:
+    """products_batch reading only the columns of view, and the builds only if it embeds them."""
+    query = projection.query(Product, view.fields, 'id').where(Product.id.in_(ids))  # type: ignore
+    rows = (await session.exec(query)).all()
+    records = dict(zip((row.id for row in rows), await projection.products(rows, view, session)))
+    return {
+        'found': {id: records[id] for id in ids if id in records},
+        'not_found': [id for id in ids if id not in records],
+    }
+
+
+@router.get('/', response_model=list | ProductsBatchOutput)
+async def get_products(
+    request: Request,
+    response: Response,
+    name: str | None = None,
+    ids: Annotated[list[str], Query()] = [],
+    fields: str | None = None,
+    embed: str | None = None,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1)] = paging.DEFAULT_LIMIT,
+    session: AsyncSession = Depends(get_async_session),
+) -> list | ProductsBatchOutput | Response:
+    """Products in id order, paged, or with ids=1,2,3 those products with their builds keyed by id.
+
+    fields and embed=builds shape the records, see projection.py.
+    """
+    etags.conditional(request, response, etags.catalog())
+    view = projection.parse(fields, embed, projection.PRODUCT_FIELDS)
+    if ids:
+        if view is None:
+            return await products_batch(batch_ids(ids), session)
+        return projection.respond(await projected_products_batch(batch_ids(ids), view, session), response)
+    limit = paging.clamp(limit)
+    if view is None:
+        query = select(Product).options(raiseload(Product.builds))
+    else:
+        query = projection.query(Product, view.fields, 'id')
+    query = query.order_by(Product.id).limit(limit + 1)
     if name:
         query = query.where(Product.name == name)
-    return session.exec(query).all()
+    if after:
+        (after_id,) = paging.decode_cursor(after, 'id')
+        query = query.where(Product.id > after_id)
+    products = paging.page(
+        (await session.exec(query)).all(), limit, request, response, key=lambda product: {'id': product.id}
+    )
+    if view is None:
+        return products
+    return projection.respond(await projection.products(products, view, session), response)
+
+
+def latest_builds_query(*product_ids: int) -> Select:
+    """(product_id, latest build or None) of the products given that exist, through the pointer in product_stats."""
+    query = select(ProductStats.product_id, Build).outerjoin(Build, Build.id == ProductStats.latest_build_id)
+    return query.where(ProductStats.product_id.in_(product_ids))  # type: ignore
+
+
+@router.post(':batchGet', response_model=ProductsBatchOutput)
+async def batch_get_products(
+    batch: BatchGetInput, session: AsyncSession = Depends(get_async_session)
+) -> ProductsBatchOutput:
+    """Like GET /?ids= for lists of ids too long for a URL."""
+    return await products_batch(batch.ids, session)
+
+
+@router.get('/builds/latest', response_model=list[Build])
+async def get_latest_builds(
+    request: Request,
+    response: Response,
+    product_id: Annotated[list[int], Query(max_length=LATEST_BATCH)] = [],
+    session: AsyncSession = Depends(get_async_session),
+) -> list[Build]:
+    """The newest build of each product_id given, in the order given, leaving out products without builds."""
+    etags.conditional(request, response, etags.catalog())
+    latest = {id: build for id, build in (await session.exec(latest_builds_query(*product_id))).all() if build}
+    return [latest[id] for id in dict.fromkeys(product_id) if id in latest]
 
 
 @router.get('/{id}', response_model=ProductOutput)
-def product_by_id(id: int, session: Session = Depends(get_session)) -> Product:
-    product = session.get(Product, id)
-    if product:
-        return product
-    else:
-        raise HTTPException(status_code=404, detail=f'No product with id={id}.')
+async def product_by_id(
+    id: int,
+    request: Request,
+    response: Response,
+    fields: str | None = None,
+    embed: str | None = None,
+    session: AsyncSession = Depends(get_async_session),
+) -> Response:
+    """The product with all its builds, or with fields and embed=builds only what they ask for."""
+    version = etags.product(id)
+    tag = etags.conditional(request, response, version)
+    view = projection.parse(fields, embed, projection.PRODUCT_FIELDS)
+    key = ('product', id) if view is None else ('product', id, view.key)
+    payload = cache.responses.get(key)
+    if payload is None:
+        if view is None:
+            product = await session.get(Product, id, options=[selectinload(Product.builds)])
+        else:
+            query = projection.query(Product, view.fields, 'id').where(Product.id == id)
+            product = (await session.exec(query)).first()
+        if not product:
+            raise HTTPException(status_code=404, detail=f'No product with id={id}.')
+        if view is None:
+            with metrics.serializing():
+                payload = ProductOutput.model_validate(product).model_dump_json().encode('utf-8')
+        else:
+            payload = projection.render((await projection.products([product], view, session))[0])
+        if etags.product(id) == version:  # Else a write committed while we read and we may hold the older state
+            cache.responses.put(key, id, payload)
+    return Response(payload, media_type=JSON, headers={'ETag': tag})
 
 
 @router.get('/{product_id}/builds', response_model=List)
-def get_product_builds(product_id: int, session: Session = Depends(get_session)) -> List:
-    product = session.get(Product, product_id)
+async def get_product_builds(
+    product_id: int,
+    request: Request,
+    response: Response,
+    fields: str | None = None,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1)] = paging.DEFAULT_LIMIT,
+    session: AsyncSession = Depends(get_async_session),
+) -> List | Response:
+    etags.conditional(request, response, etags.product(product_id))
+    view = projection.parse(fields, None, projection.BUILD_FIELDS)
+    product = await session.get(Product, product_id, options=[raiseload(Product.builds)])
     if product:
-        return product.builds
+        limit = paging.clamp(limit)
+        builds = (await session.exec(builds_page_query(product_id, after, limit, view))).all()
+        builds = paging.page(builds, limit, request, response, key=build_key)
+        if view is None:
+            return builds
+        return projection.respond([projection.record(build, view.fields) for build in builds], response)
     else:
-        raise HTTPException(status_code=404, detail=f'No product with id={id}.')
+        raise HTTPException(status_code=404, detail=f'No product with id={product_id}.')
+
+
+@router.get('/{product_id}/builds/latest', response_model=Build)
+async def get_latest_build(
+    product_id: int,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session),
+) -> Response:
+    """The newest build of a product in (timestamp, id) order, two primary key lookups however long its history."""
+    version = etags.product(product_id)
+    tag = etags.conditional(request, response, version)
+    payload = cache.responses.get(('latest', product_id))
+    if payload is None:
+        row = (await session.exec(latest_builds_query(product_id))).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail=f'No product with id={product_id}.')
+        if row[1] is None:
+            raise HTTPException(status_code=404, detail=f'No builds of product with id={product_id}.')
+        with metrics.serializing():
+            payload = row[1].model_dump_json().encode('utf-8')
+        if etags.product(product_id) == version:
+            cache.responses.put(('latest', product_id), product_id, payload)
+    return Response(payload, media_type=JSON, headers={'ETag': tag})
 
 
 @router.get('/{product_id}/builds/{id}', response_model=Build)
-def get_product_build_by_id(product_id: int, id: int, session: Session = Depends(get_session)) -> Build:
-    product = session.get(Product, product_id)
-    if product:
-        for build in product.builds:
-            if build.id == id:
-                return build
-        raise HTTPException(status_code=404, detail=f'No product/build with ids={product_id}/{id}.')
-    else:
-        raise HTTPException(status_code=404, detail=f'No product with id={product_id}.')
+async def get_product_build_by_id(
+    product_id: int,
+    id: int,
+    request: Request,
+    response: Response,
+    fields: str | None = None,
+    session: AsyncSession = Depends(get_async_session),
+) -> Response:
+    version = etags.product(product_id)
+    tag = etags.conditional(request, response, version)
+    view = projection.parse(fields, None, projection.BUILD_FIELDS)
+    key = ('build', product_id, id) if view is None else ('build', product_id, id, view.key)
+    payload = cache.responses.get(key)
+    if payload is None:
+        build = await product_build(product_id, id, session, view)
+        if view is None:
+            with metrics.serializing():
+                payload = build.model_dump_json().encode('utf-8')
+        else:
+            payload = projection.render(projection.record(build, view.fields))
+        if etags.product(product_id) == version:
+            cache.responses.put(key, product_id, payload)
+    return Response(payload, media_type=JSON, headers={'ETag': tag})
+
+
+@router.get('/cache/stats')
+async def cache_stats() -> dict:
+    """Counters of the response cache of the routes above, to size BOS_CACHE_BYTES and BOS_CACHE_SECONDS."""
+    return cache.responses.stats()
 
 
 @router.post('/', response_model=Product)
-def add_product(
-    product_input: ProductInput, session: Session = Depends(get_session), user: User = Depends(get_current_user)
+async def add_product(
+    product_input: ProductInput,
+    session: AsyncSession = Depends(get_async_write_session),
+    user: User = Depends(get_current_user),
 ) -> Product:
     new_product = Product.from_orm(product_input)
     session.add(new_product)
-    session.commit()
-    session.refresh(new_product)
+    await session.commit()
+    await session.refresh(new_product)
+    changed(new_product.id)
     return new_product
 
 
 @router.delete('/{id}', status_code=204)
-def remove_product(id: int, session: Session = Depends(get_session), user: User = Depends(get_current_user)) -> None:
-    product = session.get(Product, id)
+async def remove_product(
+    id: int, session: AsyncSession = Depends(get_async_write_session), user: User = Depends(get_current_user)
+) -> None:
+    product = await session.get(Product, id)
     if product:
-        session.delete(product)
-        session.commit()
+        await session.delete(product)
+        await session.commit()
+        changed(id)
     else:
         raise HTTPException(status_code=404, detail=f'No product with id={id}.')
 
 
 @router.put('/{id}', response_model=Product)
-def change_product(
-    id: int, new_data: ProductInput, session: Session = Depends(get_session), user: User = Depends(get_current_user)
+async def change_product(
+    id: int,
+    new_data: ProductInput,
+    session: AsyncSession = Depends(get_async_write_session),
+    user: User = Depends(get_current_user),
 ) -> Product:
-    product = session.get(Product, id)
+    product = await session.get(Product, id)
     if product:
         product.family = new_data.family
         product.name = new_data.name
         product.description = new_data.description
-        session.commit()
+        await session.commit()
+        changed(id)
         return product
     else:
         raise HTTPException(status_code=404, detail=f'No product with id={id}.')
 
 
 @router.patch('/{id}', response_model=Product)
-def patch_product(
+async def patch_product(
     id: int,
     family: str | None = None,
     name: str | None = None,
     description: str | None = None,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_write_session),
     user: User = Depends(get_current_user),
 ) -> Product:
-    product = session.get(Product, id)
+    product = await session.get(Product, id)
     if product:
         if family:
             product.family = family
@@ -101,7 +356,8 @@ def patch_product(
             product.name = name
         if description:
             product.description = description
-        session.commit()
+        await session.commit()
+        changed(id)
         return product
     else:
         raise HTTPException(status_code=404, detail=f'No product with id={id}.')
@@ -112,27 +368,28 @@ class BadBuildException(Exception):
 
 
 @router.post('/{product_id}/builds', response_model=Build)
-def add_build(
+async def add_build(
     product_id: int,
     build_input: BuildInput,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_write_session),
     user: User = Depends(get_current_user),
 ) -> Build:
-    product = session.get(Product, product_id)
+    product = await session.get(Product, product_id, options=[raiseload(Product.builds)])
     if product:
-        new_product = Build.from_orm(build_input, update={'product_id': product_id})
+        new_product = Build(**build_input.model_dump(), product_id=product_id)
         # if new_product.end < new_product.start:
         #    raise BadBuildException("Build end before start")
-        product.builds.append(new_product)
-        session.commit()
-        session.refresh(new_product)
+        session.add(new_product)  # Appending to product.builds would first load the whole collection
+        await session.commit()
+        await session.refresh(new_product)
+        changed(product_id)
         return new_product
     else:
-        raise HTTPException(status_code=404, detail=f'No product with id={id}.')
+        raise HTTPException(status_code=404, detail=f'No product with id={product_id}.')
 
 
 @router.patch('/{product_id}/builds/{id}', response_model=Build)
-def patch_product_build(
+async def patch_product_build(
     product_id: int,
     id: int,
     description: str | None = None,
@@ -140,26 +397,37 @@ def patch_product_build(
     target: str | None = None,
     taxonomy: str | None = None,
     sha512: str | None = None,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_write_session),
     user: User = Depends(get_current_user),
 ) -> Build:
-    product = session.get(Product, product_id)
-    if product:
-        for slot, build in enumerate(product.builds):
-            if build.id == id:
-                if description:
-                    build.description = description
-                if version:
-                    build.version = version
-                if target:
-                    build.target = target
-                if taxonomy:
-                    build.taxonomy = taxonomy
-                if sha512:
-                    build.sha512 = sha512
-                product.builds[slot] = build
-                session.commit()
-                return build
-        raise HTTPException(status_code=404, detail=f'No product/build with ids={product_id}/{id}.')
-    else:
-        raise HTTPException(status_code=404, detail=f'No product with id={product_id}.')
+    build = await product_build(product_id, id, session)
+    if description:
+        build.description = description
+    if version:
+        build.version = version
+    if target:
+        build.target = target
+    if taxonomy:
+        build.taxonomy = taxonomy
+    if sha512:
+        build.sha512 = sha512
+    await session.commit()
+    changed(product_id)
+    return build
+
+
+@router.put('/{product_id}/builds/{id}/artifact')
+async def upload_artifact(product_id: int, id: int, request: Request, user: User = Depends(get_current_user)) -> dict:
+    """Fingerprint the artifact of a build sent as the raw body, in one pass as it arrives, and store its sha512.
+
+    No transaction stays open during the upload, the build is looked up before and updated after it.
+    """
+    async with db.async_session() as session:
+        await product_build(product_id, id, session)
+    found = await fingerprint.fingerprint_stream(request.stream())
+    async with db.async_write_session() as session:
+        build = await product_build(product_id, id, session)
+        build.sha512 = found['sha512']
+        await session.commit()
+    changed(product_id)
+    return {'product_id': product_id, 'id': id, 'fingerprints': found}
@@ -0,0 +1,87 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import paging
+from db import get_async_session
+from model import SearchHit
+
+router = APIRouter(prefix='/api/search')
+
+RANKED_MATCHES = 5000  # Broader queries come in index order, bm25 costs a few microseconds per match
+
+# Products are indexed under their negated id, builds under their own, see step 3 in schema.py
+SEARCH = '''
+WITH hit AS ({hits})
+SELECT hit.doc, hit.rank, p.id AS product_id, p.name AS name, b.version AS version,
+       coalesce(b.description, p.description) AS description
+FROM hit
+LEFT JOIN build AS b ON hit.doc > 0 AND b.id = hit.doc
+JOIN product AS p ON p.id = coalesce(b.product_id, -hit.doc)
+ORDER BY hit.rank, hit.doc
+'''
+MATCHING = 'FROM catalog_fts WHERE catalog_fts MATCH :match'
+RANKED = 'SELECT rowid AS doc, rank ' + MATCHING + ' {after} ORDER BY rank, rowid LIMIT :limit'
+RANKED_AFTER = 'AND (rank, rowid) > (:rank, :doc)'
+UNRANKED = 'SELECT rowid AS doc, NULL AS rank ' + MATCHING + ' {after} ORDER BY rowid LIMIT :limit'
+UNRANKED_AFTER = 'AND rowid > :doc'
+MATCHES = 'SELECT count(*) FROM (SELECT rowid ' + MATCHING + ' LIMIT :limit)'
+
+
+def match_expression(q: str) -> str:
+    """Every word of q as a quoted phrase, so any input is valid FTS5 syntax, words ending in * match as prefix."""
+    terms = []
+    for word in q.split():
+        term = word.rstrip('*')
+        if term:
+            terms.append('"' + term.replace('"', '""') + '"' + ('*' if term != word else ''))
+    if not terms:
+        raise HTTPException(status_code=400, detail='Nothing to search for.')
+    return ' '.join(terms)
+
+
+async def search_catalog(q: str, after: str | None, limit: int, session: AsyncSession) -> list[dict]:
+    """Rows of SEARCH for one page of the matches of q, one more than limit if there is a next page.
+
+    Up to RANKED_MATCHES matches are ordered by rank, more by index order, which is products newest first and then
+    builds oldest first. The cursor keeps the order the first page chose.
+    """
+    params = {'match': match_expression(q), 'limit': limit + 1}
+    if after:
+        params['rank'], params['doc'] = paging.decode_cursor(after, 'rank', 'doc')
+        ranked = params['rank'] is not None
+    else:
+        matches = await session.exec(text(MATCHES), params={**params, 'limit': RANKED_MATCHES + 1})  # type: ignore
+        ranked = matches.scalar_one() <= RANKED_MATCHES
+    hits, hits_after = (RANKED, RANKED_AFTER) if ranked else (UNRANKED, UNRANKED_AFTER)
+    statement = text(SEARCH.format(hits=hits.format(after=hits_after if after else '')))
+    return [row._asdict() for row in (await session.exec(statement, params=params)).all()]  # type: ignore
+
+
+def hit(row: dict) -> SearchHit:
+    kind, id = ('build', row['doc']) if row['doc'] > 0 else ('product', -row['doc'])
+    return SearchHit(kind=kind, id=id, **{name: value for name, value in row.items() if name != 'doc'})
+
+
+@router.get('/', response_model=list[SearchHit])
+async def search(
+    q: str,
+    request: Request,
+    response: Response,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1)] = paging.DEFAULT_LIMIT,
+    session: AsyncSession = Depends(get_async_session),
+) -> list[SearchHit]:
+    """Products and builds whose family, name, description, version, source or target contain all words of q.
+
+    Best matches come first, name and version count more than the other fields, unless there are more than
+    RANKED_MATCHES. Words ending in * also match longer words.
+    """
+    limit = paging.clamp(limit)
+    rows = await search_catalog(q, after, limit, session)
+    return [
+        hit(row)
+        for row in paging.page(rows, limit, request, response, key=lambda row: {'rank': row['rank'], 'doc': row['doc']})
+    ]
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, Request, Response
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import etags
+from db import get_async_session
+from model import FamilyStatsOutput, Product, ProductStats, ProductStatsOutput, StatsOutput
+
+router = APIRouter(prefix='/api/stats')
+
+
+def family_stats(products: list[ProductStatsOutput]) -> list[FamilyStatsOutput]:
+    """Fold the summaries of the products, which come in family order, into one per family."""
+    families: list[FamilyStatsOutput] = []
+    for product in products:
+        if not families or families[-1].family != product.family:
+            families.append(FamilyStatsOutput(family=product.family))
+        family = families[-1]
+        family.products += 1
+        family.builds += product.builds
+        if product.first_seen is not None and (family.first_seen is None or product.first_seen < family.first_seen):
+            family.first_seen = product.first_seen
+        if product.latest_build_id is not None and (
+            family.latest_build_id is None
+            or (product.latest_timestamp, product.latest_build_id) > (family.latest_timestamp, family.latest_build_id)
+        ):
+            family.latest_timestamp = product.latest_timestamp
+            family.latest_version = product.latest_version
+            family.latest_build_id = product.latest_build_id
+            family.latest_product_id = product.product_id
+    return families
+
+
+@router.get('/', response_model=StatsOutput)
+async def get_stats(
+    request: Request,
+    response: Response,
+    family: str | None = None,
+    session: AsyncSession = Depends(get_async_session),
+) -> StatsOutput:
+    """Build count, first and latest build per product and per family, optionally of one family only.
+
+    The summaries are kept in product_stats by triggers as builds and products are written, so this reads one row
+    per product however many builds there are.
+    """
+    etags.conditional(request, response, etags.catalog())
+    query = select(ProductStats, Product.family, Product.name).join(Product, Product.id == ProductStats.product_id)
+    if family is not None:
+        query = query.where(Product.family == family)
+    rows = (await session.exec(query.order_by(Product.family, Product.name, Product.id))).all()
+    products = [
+        ProductStatsOutput(family=product_family, name=name, **stats.model_dump())
+        for stats, product_family, name in rows
+    ]
+    return StatsOutput(families=family_stats(products), products=products)
@@ -1,23 +1,162 @@
-from fastapi import APIRouter, Cookie, Depends, Form, Request
+import bisect
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Cookie, Depends, Form, HTTPException, Query, Request
 from fastapi.templating import Jinja2Templates
-from sqlmodel import Session
-from starlette.responses import HTMLResponse
+from markupsafe import Markup
+from sqlalchemy.orm import raiseload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.responses import HTMLResponse, RedirectResponse, Response
 
-from db import get_session
-from router.products import get_products
+import cache
+import etags
+import paging
+from db import get_async_session
+from model import Product, format_timestamp
+from router import search as search_api
+from router.products import build_key, builds_page_query
 
 router = APIRouter()
 
 templates = Jinja2Templates(directory='template')
+templates.env.filters['timestamp'] = format_timestamp
+
+SEARCH_PAGE_SIZE = paging.DEFAULT_LIMIT
+CATALOG_PAGE_SIZE = paging.DEFAULT_LIMIT
+
+
+class NameIndex:
+    """(name, id) of all products in name order, read from ix_product_name once per catalog generation.
+
+    It fills the product picker and pages the catalog, which then needs no query for the ids on a page.
+    """
+
+    def __init__(self) -> None:
+        self.generation = -1
+        self.entries: list[tuple[str, int]] = []
+
+    async def get(self, session: AsyncSession) -> list[tuple[str, int]]:
+        generation = etags.catalog()  # Before the read, a write meanwhile makes the next request read again
+        if generation != self.generation:
+            rows = (await session.exec(select(Product.name, Product.id).order_by(Product.name, Product.id))).all()
+            self.entries = [(name, id) for name, id in rows]
+            self.generation = generation
+        return self.entries
+
+    def clear(self) -> None:
+        self.generation, self.entries = -1, []
+
+
+names = NameIndex()
+
+
+def cached_fragment(key: tuple) -> Markup | None:
+    """A fragment rendered before, its key ends in the product version so writes leave older ones unused."""
+    html = cache.responses.get(key)
+    return None if html is None else Markup(html.decode('utf-8'))
+
+
+def render_fragment(key: tuple, product_id: int, template: str, **context: Any) -> Markup:
+    html = templates.get_template(template).render(**context)
+    cache.responses.put(key, product_id, html.encode('utf-8'))
+    return Markup(html)
 
 
 @router.get('/', response_class=HTMLResponse)
-def home(request: Request, products_cookie: str | None = Cookie(None)):
+async def home(
+    request: Request,
+    products_cookie: str | None = Cookie(None),
+    session: AsyncSession = Depends(get_async_session),
+):
     print(products_cookie)
-    return templates.TemplateResponse('home.html', {'request': request})
+    return templates.TemplateResponse('home.html', {'request': request, 'names': await names.get(session)})
 
 
 @router.post('/search', response_class=HTMLResponse)
-def search(*, name: str = Form(...), request: Request, session: Session = Depends(get_session)):
-    products = get_products(name=name, session=session)
-    return templates.TemplateResponse('search_results.html', {'request': request, 'products': products})
+async def search(
+    *,
+    q: str = Form(...),
+    after: str | None = Form(None),
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
+):
+    page = Response()
+    hits = await search_api.search(
+        q=q, request=request, response=page, after=after, limit=SEARCH_PAGE_SIZE, session=session
+    )
+    return templates.TemplateResponse(
+        'search_results.html', {'request': request, 'hits': hits, 'q': q, 'after': paging.next_cursor(page)}
+    )
+
+
+@router.get('/catalog', response_class=HTMLResponse)
+async def catalog(
+    request: Request,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1)] = CATALOG_PAGE_SIZE,
+    session: AsyncSession = Depends(get_async_session),
+):
+    limit = paging.clamp(limit)
+    entries = await names.get(session)
+    start = 0
+    if after:
+        name, id = paging.decode_cursor(after, 'name', 'id')
+        if not isinstance(name, str) or not isinstance(id, int):
+            raise HTTPException(status_code=400, detail=f'Malformed cursor after={after}.')
+        start = bisect.bisect_right(entries, (name, id))
+    end = start + limit
+    next_after = None
+    if end < len(entries):
+        next_after = paging.encode_cursor({'name': entries[end - 1][0], 'id': entries[end - 1][1]})
+    entries = entries[start:end]
+
+    keys = {id: ('fragment', 'product-row', id, etags.product(id)) for _, id in entries}
+    rows = {id: cached_fragment(key) for id, key in keys.items()}
+    missing = [id for id, row in rows.items() if row is None]
+    if missing:
+        query = select(Product).options(raiseload(Product.builds)).where(Product.id.in_(missing))  # type: ignore
+        base = request.url_for('catalog').path
+        for product in (await session.exec(query)).all():
+            rows[product.id] = render_fragment(
+                keys[product.id], product.id, 'fragments/product_row.html', product=product, base=base
+            )
+    return templates.TemplateResponse(
+        'catalog.html',
+        {'request': request, 'rows': [row for row in rows.values() if row], 'after': next_after, 'limit': limit},
+    )
+
+
+@router.get('/catalog/pick')
+async def pick_product(request: Request, product_id: int) -> RedirectResponse:
+    """Target of the product picker on the home page."""
+    return RedirectResponse(request.url_for('catalog_product', product_id=product_id), status_code=303)
+
+
+@router.get('/catalog/{product_id}', response_class=HTMLResponse)
+async def catalog_product(
+    product_id: int,
+    request: Request,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1)] = CATALOG_PAGE_SIZE,
+    session: AsyncSession = Depends(get_async_session),
+):
+    limit = paging.clamp(limit)
+    version = etags.product(product_id)  # Read before the data, as for the ETags
+    key = ('fragment', 'product', product_id, version)
+    header = cached_fragment(key)
+    if header is None:
+        product = await session.get(Product, product_id, options=[raiseload(Product.builds)])
+        if not product:
+            raise HTTPException(status_code=404, detail=f'No product with id={product_id}.')
+        header = render_fragment(key, product_id, 'fragments/product.html', product=product)
+
+    key = ('fragment', 'builds', product_id, version, after, limit)
+    builds = cached_fragment(key)
+    if builds is None:
+        rows = (await session.exec(builds_page_query(product_id, after, limit))).all()
+        next_after = paging.encode_cursor(build_key(rows[limit - 1])) if len(rows) > limit else None
+        builds = render_fragment(
+            key, product_id, 'fragments/builds.html', builds=rows[:limit], after=next_after, limit=limit
+        )
+    return templates.TemplateResponse('product.html', {'request': request, 'header': header, 'builds': builds})
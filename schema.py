@@ -0,0 +1,207 @@
+"""Versioned schema steps applied on top of SQLModel.metadata.create_all.
+
+create_all only creates missing tables, it never adds an index to a table that exists already.
+Every step in MIGRATIONS runs exactly once per database file and the number of applied steps is kept in
+SQLite's PRAGMA user_version, so existing databases catch up on startup and new ones end up identical.
+init_schema holds a lock file next to the database meanwhile, so processes starting at once take turns.
+"""
+
+import fcntl
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import Connection, Engine
+from sqlmodel import SQLModel
+
+import model  # noqa: F401  Registers the tables with SQLModel.metadata before create_all runs
+
+BUILD_FTS_TRIGGERS = [
+    'CREATE TRIGGER IF NOT EXISTS build_fts_insert AFTER INSERT ON build BEGIN'
+    ' INSERT INTO catalog_fts (rowid, description, version, source, target)'
+    ' VALUES (new.id, new.description, new.version, new.source, new.target); END',
+    'CREATE TRIGGER IF NOT EXISTS build_fts_delete AFTER DELETE ON build BEGIN'
+    " INSERT INTO catalog_fts (catalog_fts, rowid, description, version, source, target)"
+    " VALUES ('delete', old.id, old.description, old.version, old.source, old.target); END",
+    'CREATE TRIGGER IF NOT EXISTS build_fts_update AFTER UPDATE OF description, version, source, target ON build'
+    " BEGIN INSERT INTO catalog_fts (catalog_fts, rowid, description, version, source, target)"
+    " VALUES ('delete', old.id, old.description, old.version, old.source, old.target);"
+    ' INSERT INTO catalog_fts (rowid, description, version, source, target)'
+    ' VALUES (new.id, new.description, new.version, new.source, new.target); END',
+]
+
+# Earliest and latest build of the product of a product_stats row, each an index seek on (product_id, timestamp, id)
+PRODUCT_STATS_LATEST = (
+    'SELECT {column} FROM build WHERE build.product_id = product_stats.product_id ORDER BY timestamp DESC, id DESC'
+    ' LIMIT 1'
+)
+PRODUCT_STATS_REFRESH = (
+    'first_seen = (SELECT min(timestamp) FROM build WHERE build.product_id = product_stats.product_id),'
+    f' latest_timestamp = ({PRODUCT_STATS_LATEST.format(column="timestamp")}),'
+    f' latest_version = ({PRODUCT_STATS_LATEST.format(column="version")}),'
+    f' latest_build_id = ({PRODUCT_STATS_LATEST.format(column="id")})'
+)
+# An inserted build only needs comparing with the latest one so far, which keeps the bulk paths at one row update
+PRODUCT_STATS_NEWER = 'latest_build_id IS NULL OR (new.timestamp, new.id) > (latest_timestamp, latest_build_id)'
+# Recompute all summaries, counting costs a walk of ix_build_product_id_id, see rebuild_stats.py
+PRODUCT_STATS_REBUILD = [
+    'DELETE FROM product_stats',
+    'INSERT INTO product_stats (product_id, builds)'
+    ' SELECT id, (SELECT count(*) FROM build WHERE build.product_id = product.id) FROM product',
+    f'UPDATE product_stats SET {PRODUCT_STATS_REFRESH}',
+]
+
+OUTBOX_SIZE = 10000  # Newest rows of change_event kept, see events.py
+CHANGE_EVENT = (
+    'INSERT INTO change_event (kind, action, product_id, build_id, at) VALUES (\'{kind}\', \'{action}\', {ids},'
+    " CAST(strftime('%s', 'now') AS INTEGER) * 1000000 + CAST(substr(strftime('%f', 'now'), 4) AS INTEGER) * 1000)"
+)
+
+
+def _change_event_trigger(table: str, action: str, ids: str) -> str:
+    event = 'INSERT' if action == 'create' else action.upper()
+    row = 'old' if action == 'delete' else 'new'
+    statement = CHANGE_EVENT.format(kind=table, action=action, ids=ids.format(row=row))
+    return f'CREATE TRIGGER IF NOT EXISTS change_event_{table}_{action} AFTER {event} ON {table} BEGIN {statement}; END'
+
+
+MIGRATIONS: list[list[str]] = [
+    # 1: point lookups of a build within its product and the hot filters of the listings,
+    #    every SQLite index ends in the rowid so (product_id, id) also serves plain product_id filters
+    [
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_build_product_id_id ON build (product_id, id)',
+        'CREATE INDEX IF NOT EXISTS ix_product_name ON product (name)',
+    ],
+    # 2: keyset pages of the builds of a product walk this index instead of sorting all builds of the product
+    [
+        'CREATE INDEX IF NOT EXISTS ix_build_product_id_timestamp_id ON build (product_id, timestamp, id)',
+    ],
+    # 3: full-text index of products and builds for search.py, contentless so the text is not stored twice,
+    #    products under their negated id and builds under their id, kept in sync by the triggers below
+    [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5('
+        "family, name, description, version, source, target, content='')",
+        "INSERT INTO catalog_fts (catalog_fts, rank) VALUES ('rank', 'bm25(1.0, 4.0, 1.0, 2.0, 1.0, 1.0)')",
+        'CREATE TRIGGER IF NOT EXISTS product_fts_insert AFTER INSERT ON product BEGIN'
+        ' INSERT INTO catalog_fts (rowid, family, name, description)'
+        ' VALUES (-new.id, new.family, new.name, new.description); END',
+        'CREATE TRIGGER IF NOT EXISTS product_fts_delete AFTER DELETE ON product BEGIN'
+        " INSERT INTO catalog_fts (catalog_fts, rowid, family, name, description)"
+        " VALUES ('delete', -old.id, old.family, old.name, old.description); END",
+        'CREATE TRIGGER IF NOT EXISTS product_fts_update AFTER UPDATE OF family, name, description ON product BEGIN'
+        " INSERT INTO catalog_fts (catalog_fts, rowid, family, name, description)"
+        " VALUES ('delete', -old.id, old.family, old.name, old.description);"
+        ' INSERT INTO catalog_fts (rowid, family, name, description)'
+        ' VALUES (-new.id, new.family, new.name, new.description); END',
+        *BUILD_FTS_TRIGGERS,
+        "INSERT INTO catalog_fts (catalog_fts) VALUES ('delete-all')",
+        'INSERT INTO catalog_fts (rowid, family, name, description) SELECT -id, family, name, description FROM product',
+        'INSERT INTO catalog_fts (rowid, description, version, source, target)'
+        ' SELECT id, description, version, source, target FROM build',
+    ],
+    # 4: artifact lookups by digest
+    [
+        'CREATE INDEX IF NOT EXISTS ix_build_sha512 ON build (sha512)',
+    ],
+    # 5: build timestamps as integer microseconds since 1970 UTC (model.EpochMicros) instead of text, so they sort
+    #    and compare as times and ranges across products walk ix_build_timestamp_id. SQLite cannot change the type
+    #    of a column, so the table is rebuilt with its indexes and triggers, from the INSERT on in one transaction
+    #    with either engine since pysqlite opens one there and no longer commits before DDL. Text with six
+    #    fractional digits keeps all of them, other text keeps milliseconds, text SQLite cannot read becomes 1970.
+    [
+        'DROP TABLE IF EXISTS build_new',
+        'CREATE TABLE build_new ('
+        'description VARCHAR, source VARCHAR, version VARCHAR, timestamp BIGINT NOT NULL, target VARCHAR,'
+        ' taxonomy VARCHAR, sha512 VARCHAR, id INTEGER NOT NULL, product_id INTEGER NOT NULL,'
+        ' PRIMARY KEY (id), FOREIGN KEY(product_id) REFERENCES product (id))',
+        'INSERT INTO build_new (description, source, version, timestamp, target, taxonomy, sha512, id, product_id)'
+        ' SELECT description, source, version, CASE typeof(timestamp) WHEN \'integer\' THEN timestamp ELSE coalesce('
+        "CAST(strftime('%s', rtrim(timestamp, '. ')) AS INTEGER) * 1000000 + CASE"
+        " WHEN substr(timestamp, 20, 7) GLOB '.[0-9][0-9][0-9][0-9][0-9][0-9]'"
+        ' THEN CAST(substr(timestamp, 21, 6) AS INTEGER)'
+        " ELSE CAST(round(strftime('%f', rtrim(timestamp, '. ')) * 1000) AS INTEGER) % 1000 * 1000 END, 0) END,"
+        ' target, taxonomy, sha512, id, product_id FROM build',
+        'DROP TABLE build',
+        'ALTER TABLE build_new RENAME TO build',
+        'CREATE UNIQUE INDEX ix_build_product_id_id ON build (product_id, id)',
+        'CREATE INDEX ix_build_product_id_timestamp_id ON build (product_id, timestamp, id)',
+        'CREATE INDEX ix_build_sha512 ON build (sha512)',
+        'CREATE INDEX ix_build_timestamp_id ON build (timestamp, id)',
+        *BUILD_FTS_TRIGGERS,
+    ],
+    # 6: build count, first and latest build per product in product_stats for /api/stats, kept by triggers in the
+    #    transaction of every write to product or build, so no write path can forget them
+    [
+        'CREATE TRIGGER IF NOT EXISTS product_stats_product_insert AFTER INSERT ON product BEGIN'
+        ' INSERT OR REPLACE INTO product_stats (product_id, builds) VALUES (new.id, 0); END',
+        'CREATE TRIGGER IF NOT EXISTS product_stats_product_delete AFTER DELETE ON product BEGIN'
+        ' DELETE FROM product_stats WHERE product_id = old.id; END',
+        'CREATE TRIGGER IF NOT EXISTS product_stats_build_insert AFTER INSERT ON build BEGIN'
+        ' UPDATE product_stats SET builds = builds + 1,'
+        ' first_seen = min(coalesce(first_seen, new.timestamp), new.timestamp),'
+        f' latest_timestamp = CASE WHEN {PRODUCT_STATS_NEWER} THEN new.timestamp ELSE latest_timestamp END,'
+        f' latest_version = CASE WHEN {PRODUCT_STATS_NEWER} THEN new.version ELSE latest_version END,'
+        f' latest_build_id = CASE WHEN {PRODUCT_STATS_NEWER} THEN new.id ELSE latest_build_id END'
+        ' WHERE product_id = new.product_id; END',
+        'CREATE TRIGGER IF NOT EXISTS product_stats_build_delete AFTER DELETE ON build BEGIN'
+        f' UPDATE product_stats SET builds = builds - 1, {PRODUCT_STATS_REFRESH}'
+        ' WHERE product_id = old.product_id; END',
+        'CREATE TRIGGER IF NOT EXISTS product_stats_build_update'
+        ' AFTER UPDATE OF product_id, timestamp, version ON build BEGIN UPDATE product_stats'
+        ' SET builds = builds + (product_id IS new.product_id) - (product_id IS old.product_id), '
+        f'{PRODUCT_STATS_REFRESH} WHERE product_id IN (old.product_id, new.product_id); END',
+        *PRODUCT_STATS_REBUILD,
+    ],
+    # 7: the outbox of the change feed, every write to product or build appends an event in its own transaction,
+    #    which the poller of events.py in each process reads, and the oldest events beyond OUTBOX_SIZE go
+    [
+        *(_change_event_trigger('product', action, '{row}.id, NULL') for action in ('create', 'update', 'delete')),
+        *(
+            _change_event_trigger('build', action, '{row}.product_id, {row}.id')
+            for action in ('create', 'update', 'delete')
+        ),
+        'CREATE TRIGGER IF NOT EXISTS change_event_prune AFTER INSERT ON change_event BEGIN'
+        f' DELETE FROM change_event WHERE id <= new.id - {OUTBOX_SIZE}; END',
+    ],
+]
+
+
+def version(connection: Connection) -> int:
+    return connection.exec_driver_sql('PRAGMA user_version').scalar_one()
+
+
+def migrate(engine: Engine) -> int:
+    """Apply the pending steps in order and return the resulting schema version.
+
+    Only the writer engine of the prod profile wraps a step in a transaction, pysqlite otherwise autocommits DDL.
+    Statements are therefore written to be rerun safely (IF NOT EXISTS, delete-all before a backfill) should a step
+    be interrupted midway.
+    """
+    with engine.connect() as connection:
+        current = version(connection)
+    for number, step in enumerate(MIGRATIONS[current:], start=current + 1):
+        with engine.begin() as connection:
+            for statement in step:
+                connection.exec_driver_sql(statement)
+            connection.exec_driver_sql(f'PRAGMA user_version = {number}')
+    return len(MIGRATIONS)
+
+
+@contextmanager
+def _file_lock(engine: Engine) -> Iterator[None]:
+    """Hold an exclusive lock on a file next to the database, so processes starting together migrate one by one."""
+    database = engine.url.database
+    if not database or database == ':memory:':
+        yield
+        return
+    with open(f'{database}.schema-lock', 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def init_schema(engine: Engine) -> int:
+    with _file_lock(engine):
+        SQLModel.metadata.create_all(engine)
+        return migrate(engine)
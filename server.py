@@ -1,13 +1,17 @@
 import uvicorn  # type: ignore
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import SQLModel
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, PlainTextResponse
 from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
 
-from db import engine
-from router import auth, products, web
+import cache
+import db
+import etags
+import metrics
+import peers
+from router import auth, builds, events, export, products, search, stats, web
 from router.products import BadBuildException
+from schema import init_schema
 
 HOST = '127.0.0.1'
 PORT = 8003
@@ -20,10 +24,16 @@ app = FastAPI(
     redoc_url=None,
     description='The blurb ...',
     version='2022.9.7',
+    default_response_class=metrics.TimedJSONResponse,
 )
 
 app.include_router(web.router, prefix=BASE)
 app.include_router(products.router, prefix=BASE)
+app.include_router(builds.router, prefix=BASE)
+app.include_router(events.router, prefix=BASE)
+app.include_router(export.router, prefix=BASE)
+app.include_router(search.router, prefix=BASE)
+app.include_router(stats.router, prefix=BASE)
 app.include_router(auth.router)  # , prefix=BASE)
 
 origins = [
@@ -38,11 +48,17 @@ app.add_middleware(
     allow_methods=['*'],
     allow_headers=['*'],
 )
+app.add_middleware(peers.Middleware)
+app.add_middleware(metrics.Middleware)  # Added last so it is outermost and times the other middleware too
+metrics.instrument(db.engine, db.write_engine, db.async_engine.sync_engine, db.async_write_engine.sync_engine)
+peers.on_change(etags.bump_all, cache.responses.clear, auth.forget_revocations)
+SCHEMA_READY = False  # Set by launcher.py, which brings the schema up to date before it forks the workers
 
 
 @app.on_event('startup')
 def on_startup():
-    SQLModel.metadata.create_all(engine)
+    if not SCHEMA_READY:
+        init_schema(db.write_engine)
 
 
 @app.exception_handler(BadBuildException)
@@ -53,6 +69,12 @@ async def unicorn_exception_handler(request: Request, exc: BadBuildException):
     )
 
 
+@app.get('/metrics', response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics() -> PlainTextResponse:
+    """Request, database and serialization times per route in the Prometheus text format."""
+    return PlainTextResponse('\n'.join(metrics.exposition()) + '\n', media_type=metrics.CONTENT_TYPE)
+
+
 # @app.middleware('http')
 # async def add_products_cookie(request: Request, call_next):
 #     response = await call_next(request)
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import tempfile
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix='belte-og-seler-'), 'test.db')
+os.environ['BOS_DB_URL'] = f'sqlite:///{DB_PATH}'
+
+import pytest  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+import cache  # noqa: E402
+import db  # noqa: E402
+import events  # noqa: E402
+from db import async_engine, engine  # noqa: E402
+from model import Build, Product, User, UserOutput, pwd_context  # noqa: E402
+from router import web  # noqa: E402
+from router.auth import create_access_token  # noqa: E402
+from schema import init_schema  # noqa: E402
+
+ROTOR_HASH = pwd_context.hash('rotor')
+
+
+@pytest.fixture(autouse=True)
+def database():
+    """Start every test from a fresh database file that only knows the user rotor, and an empty cache."""
+    for sync_engine in {db.engine, db.write_engine}:
+        sync_engine.dispose()
+    for an_async_engine in {db.async_engine, db.async_write_engine}:
+        asyncio.run(an_async_engine.dispose())
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    init_schema(engine)
+    cache.responses.clear()
+    web.names.clear()
+    events.feed.clear()
+    with Session(engine) as session:
+        session.add(User(username='rotor', password_hash=ROTOR_HASH))
+        session.commit()
+    yield engine
+
+
+@pytest.fixture
+def auth(database):
+    """Headers with a bearer token of rotor."""
+    with Session(engine) as session:
+        rotor = session.exec(select(User).where(User.username == 'rotor')).one()
+        return {'Authorization': f'Bearer {create_access_token(UserOutput.model_validate(rotor))}'}
+
+
+@pytest.fixture
+def catalog(database):
+    """Three products, the first one with five builds in timestamp order and the others with one build each."""
+    with Session(engine) as session:
+        products = [Product(family='things', name=f'thing-{n}', description=f'Thing {n}.') for n in range(3)]
+        session.add_all(products)
+        session.commit()
+        for n in range(5):
+            session.add(
+                Build(
+                    product_id=products[0].id,
+                    version=f'2022.9.{n}',
+                    timestamp=f'2022-09-0{n + 1} 19:20:21.123456 +00:00',
+                )
+            )
+        for product in products[1:]:
+            session.add(Build(product_id=product.id, version='2022.9.0', timestamp='2022-09-01 19:20:21.123456 +00:00'))
+        session.commit()
+        return [product.id for product in products]
+
+
+@pytest.fixture
+def sql_statements(database):
+    """Record every SQL statement sent to the database so tests can put a ceiling on queries per request."""
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for target in (engine, async_engine.sync_engine):
+        event.listen(target, 'before_cursor_execute', record)
+    yield statements
+    for target in (engine, async_engine.sync_engine):
+        event.remove(target, 'before_cursor_execute', record)
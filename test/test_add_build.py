@@ -0,0 +1,21 @@
+from fastapi.testclient import TestClient
+
+from server import BASE, app
+
+client = TestClient(app)
+
+
+def test_add_build(catalog, auth):
+    data = {'version': '2022.9.7', 'description': 'the precious build'}
+    response = client.post(f'{BASE}/api/products/{catalog[1]}/builds', json=data, headers=auth)
+    assert response.status_code == 200
+    build = response.json()
+    assert build['product_id'] == catalog[1]
+    assert build['version'] == data['version']
+    assert build['description'] == data['description']
+
+
+def test_add_build_unknown_product(catalog, auth):
+    response = client.post(f'{BASE}/api/products/{catalog[-1] + 1}/builds', json={}, headers=auth)
+    assert response.status_code == 404
+    assert response.json()['detail'] == f'No product with id={catalog[-1] + 1}.'
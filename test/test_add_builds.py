@@ -0,0 +1,60 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from router import builds
+from server import BASE, app
+
+client = TestClient(app)
+
+
+def post_bulk(auth, content, **kwargs):
+    response = client.post(f'{BASE}/api/builds/bulk', content=content, headers=auth, **kwargs)
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_add_builds_ndjson(catalog, auth):
+    records = [{'product_id': catalog[n % 2], 'version': f'bulk-{n}'} for n in range(4)]
+    results = post_bulk(auth, '\n'.join(json.dumps(record) for record in records))
+    assert [result['index'] for result in results] == [0, 1, 2, 3]
+    assert all('id' in result for result in results)
+    versions = [b['version'] for b in client.get(f'{BASE}/api/products/{catalog[1]}/builds').json()]
+    assert versions[-2:] == ['bulk-1', 'bulk-3']
+
+
+def test_add_builds_json_array_reports_per_record(catalog, auth):
+    records = [
+        {'product_id': catalog[0], 'version': 'ok'},
+        {'product_id': catalog[-1] + 1, 'version': 'orphan'},
+        {'version': 'no product'},
+        {'product_id': catalog[2], 'version': 'fine'},
+    ]
+    results = post_bulk(auth, json.dumps(records))
+    assert 'id' in results[0] and 'id' in results[3]
+    assert results[1]['error'] == f'No product with id={catalog[-1] + 1}.'
+    assert results[2]['error'].startswith('product_id')
+
+
+def test_add_builds_streams_in_batches(catalog, auth, monkeypatch):
+    monkeypatch.setattr(builds, 'BULK_BATCH_SIZE', 3)
+
+    def body():
+        for n in range(10):
+            yield json.dumps({'product_id': catalog[2], 'version': f'{n}'}).encode() + b'\n'
+
+    results = post_bulk(auth, body())
+    assert [result['index'] for result in results] == list(range(10))
+    assert all('id' in result for result in results)
+
+
+def test_add_builds_malformed_line(catalog, auth):
+    results = post_bulk(auth, b'{"product_id": %d}\n{nope\n' % catalog[0])
+    assert 'id' in results[0]
+    assert results[1]['index'] == 1 and 'error' in results[1]
+
+
+def test_add_builds_requires_auth(catalog):
+    response = client.post(f'{BASE}/api/builds/bulk', content='[]')
+    assert response.status_code == 401
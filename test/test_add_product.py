@@ -1,4 +1,5 @@
-from unittest.mock import Mock
+import asyncio
+from unittest.mock import AsyncMock, Mock
 
 from fastapi.testclient import TestClient
 
@@ -9,9 +10,9 @@ from server import BASE, app
 client = TestClient(app)
 
 
-def test_add_product():
+def test_add_product(auth):
     data = {'description': 'yes', 'name': 'oh', 'family': 'no'}
-    response = client.post(f'{BASE}/api/products/', json=data, headers={'Authorization': 'Bearer rotor'})
+    response = client.post(f'{BASE}/api/products/', json=data, headers=auth)
     assert response.status_code == 200
     product = response.json()
     assert product['description'] == data['description']
@@ -20,14 +21,14 @@ def test_add_product():
 
 
 def test_add_product_with_mock_session():
-    mock_session = Mock()
+    mock_session = AsyncMock(add=Mock())
     input = ProductInput(family='no', name='yes', description='lengthy')
     user = User(username='rotor')
-    result = add_product(product_input=input, session=mock_session, user=user)
+    result = asyncio.run(add_product(product_input=input, session=mock_session, user=user))
 
     mock_session.add.assert_called_once()
-    mock_session.commit.assert_called_once()
-    mock_session.refresh.assert_called_once()
+    mock_session.commit.assert_awaited_once()
+    mock_session.refresh.assert_awaited_once()
     assert isinstance(result, Product)
     assert result.family == 'no'
     assert result.name == 'yes'
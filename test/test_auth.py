@@ -0,0 +1,58 @@
+import time
+
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from router import auth as auth_module
+from server import BASE, app
+
+client = TestClient(app)
+
+
+def test_login_issues_signed_token(database):
+    response = client.post('/auth/token', data={'username': 'rotor', 'password': 'rotor'})
+    assert response.status_code == 200
+    token = response.json()['access_token']
+    claims = jwt.decode(token, auth_module.SECRET_KEY, algorithms=[auth_module.ALGORITHM])
+    assert claims['sub'] == 'rotor'
+    assert claims['exp'] - claims['iat'] == auth_module.TOKEN_SECONDS
+
+
+def test_login_wrong_password(database):
+    response = client.post('/auth/token', data={'username': 'rotor', 'password': 'stator'})
+    assert response.status_code == 400
+
+
+def test_username_is_no_token(catalog):
+    response = client.post(
+        f'{BASE}/api/products/{catalog[0]}/builds', json={}, headers={'Authorization': 'Bearer rotor'}
+    )
+    assert response.status_code == 401
+
+
+def test_expired_token(catalog, auth):
+    token = auth['Authorization'].split()[1]
+    claims = jwt.decode(token, auth_module.SECRET_KEY, algorithms=[auth_module.ALGORITHM])
+    claims['exp'] = int(time.time()) - 1
+    expired = jwt.encode(claims, auth_module.SECRET_KEY, algorithm=auth_module.ALGORITHM)
+    response = client.post(
+        f'{BASE}/api/products/{catalog[0]}/builds', json={}, headers={'Authorization': f'Bearer {expired}'}
+    )
+    assert response.status_code == 401
+
+
+def test_verified_without_user_lookup(catalog, auth, sql_statements):
+    client.post(f'{BASE}/api/products/{catalog[0]}/builds', json={}, headers=auth)
+    sql_statements.clear()
+    response = client.post(f'{BASE}/api/products/{catalog[0]}/builds', json={}, headers=auth)
+    assert response.status_code == 200
+    assert not [statement for statement in sql_statements if 'user' in statement or 'revokedtoken' in statement]
+
+
+def test_logout_revokes_token(catalog, auth, monkeypatch):
+    assert client.post('/auth/logout', headers=auth).status_code == 204
+    response = client.post(f'{BASE}/api/products/{catalog[0]}/builds', json={}, headers=auth)
+    assert response.status_code == 401
+    monkeypatch.setattr(auth_module, '_revocations', {})  # Another process that has not seen the logout
+    response = client.post(f'{BASE}/api/products/{catalog[0]}/builds', json={}, headers=auth)
+    assert response.status_code == 401
@@ -0,0 +1,55 @@
+from fastapi.testclient import TestClient
+
+from server import BASE, app
+
+client = TestClient(app)
+
+
+def test_get_products_by_ids(catalog, sql_statements):
+    missing = catalog[-1] + 1
+    sql_statements.clear()
+    response = client.get(f'{BASE}/api/products/', params={'ids': f'{catalog[1]},{missing},{catalog[0]}'})
+    assert response.status_code == 200
+    batch = response.json()
+    assert list(batch['found']) == [str(catalog[1]), str(catalog[0])]
+    assert batch['found'][str(catalog[0])]['name'] == 'thing-0'
+    assert len(batch['found'][str(catalog[0])]['builds']) == 5
+    assert batch['not_found'] == [missing]
+    assert len(sql_statements) == 2  # The products, then the builds of all of them
+
+
+def test_get_products_by_repeated_ids(catalog):
+    response = client.get(f'{BASE}/api/products/', params={'ids': [str(catalog[2]), f'{catalog[0]},{catalog[2]}']})
+    assert list(response.json()['found']) == [str(catalog[2]), str(catalog[0])]
+
+
+def test_get_products_by_malformed_ids(catalog):
+    assert client.get(f'{BASE}/api/products/', params={'ids': '1,x'}).status_code == 400
+    assert client.get(f'{BASE}/api/products/', params={'ids': ','.join(map(str, range(1002)))}).status_code == 400
+
+
+def test_batch_get_products(catalog):
+    response = client.post(f'{BASE}/api/products:batchGet', json={'ids': [catalog[2], 999]})
+    assert response.status_code == 200
+    assert list(response.json()['found']) == [str(catalog[2])]
+    assert response.json()['not_found'] == [999]
+    assert client.post(f'{BASE}/api/products:batchGet', json={'ids': list(range(1001))}).status_code == 422
+
+
+def test_get_builds_by_ids(catalog, sql_statements):
+    sql_statements.clear()
+    response = client.get(f'{BASE}/api/builds/', params={'ids': '7,1,99'})
+    assert response.status_code == 200
+    batch = response.json()
+    assert list(batch['found']) == ['7', '1']
+    assert batch['found']['7']['product_id'] == catalog[2]
+    assert batch['found']['1']['timestamp'] == '2022-09-01 19:20:21.123456 +00:00'
+    assert batch['not_found'] == [99]
+    assert len(sql_statements) == 1
+
+
+def test_batch_get_builds(catalog):
+    response = client.post(f'{BASE}/api/builds:batchGet', json={'ids': [2, 2, 100]})
+    assert response.status_code == 200
+    assert list(response.json()['found']) == ['2']
+    assert response.json()['not_found'] == [100]
@@ -0,0 +1,76 @@
+import time
+
+from fastapi.testclient import TestClient
+
+import cache
+from server import BASE, app
+
+client = TestClient(app)
+
+
+def test_cached_product_needs_no_query(catalog, sql_statements):
+    url = f'{BASE}/api/products/{catalog[0]}'
+    first = client.get(url)
+    sql_statements.clear()
+    second = client.get(url)
+    assert second.json() == first.json()
+    assert len(second.json()['builds']) == 5
+    assert sql_statements == []
+
+
+def test_cached_build_needs_no_query(catalog, sql_statements):
+    url = f'{BASE}/api/products/{catalog[1]}/builds'
+    build_id = client.get(url).json()[0]['id']
+    first = client.get(f'{url}/{build_id}')
+    sql_statements.clear()
+    assert client.get(f'{url}/{build_id}').json() == first.json()
+    assert sql_statements == []
+
+
+def test_writes_invalidate(catalog, auth):
+    url = f'{BASE}/api/products/{catalog[0]}'
+    client.get(url)
+    client.post(f'{url}/builds', json={'version': 'fresh'}, headers=auth)
+    assert client.get(url).json()['builds'][-1]['version'] == 'fresh'
+    client.put(url, json={'family': 'f', 'name': 'n', 'description': 'd'}, headers=auth)
+    assert client.get(url).json()['name'] == 'n'
+    product = client.post(
+        f'{BASE}/api/products/', json={'family': 'f', 'name': 'gone', 'description': ''}, headers=auth
+    )
+    url = f"{BASE}/api/products/{product.json()['id']}"
+    client.get(url)
+    client.delete(url, headers=auth)
+    assert client.get(url).status_code == 404
+
+
+def test_lru_eviction_and_expiry(monkeypatch):
+    responses = cache.Cache(max_bytes=2 * (cache.ENTRY_OVERHEAD + 10), ttl=60)
+    responses.put('a', 1, b'0123456789')
+    responses.put('b', 1, b'0123456789')
+    assert responses.get('a') is not None
+    responses.put('c', 2, b'0123456789')
+    assert responses.get('b') is None
+    assert responses.get('a') is not None and responses.get('c') is not None
+    responses.invalidate(1)
+    assert responses.get('a') is None and responses.get('c') is not None
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 61)
+    assert responses.get('c') is None
+    assert responses.stats() == {
+        'hits': 4,
+        'misses': 3,
+        'evictions': 1,
+        'expirations': 1,
+        'invalidations': 1,
+        'entries': 0,
+        'bytes': 0,
+        'max_bytes': responses.max_bytes,
+    }
+
+
+def test_stats_endpoint(catalog):
+    client.get(f'{BASE}/api/products/{catalog[0]}')
+    client.get(f'{BASE}/api/products/{catalog[0]}')
+    stats = client.get(f'{BASE}/api/products/cache/stats').json()
+    assert stats['entries'] == 1
+    assert stats['hits'] >= 1
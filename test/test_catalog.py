@@ -0,0 +1,68 @@
+import re
+
+from fastapi.testclient import TestClient
+
+from server import BASE, app
+
+client = TestClient(app)
+
+
+def next_link(response):
+    return re.search(r'href="(\?after=[^"]+)"', response.text).group(1).replace('&amp;', '&')
+
+
+def test_catalog_pages_in_name_order(catalog):
+    first = client.get(f'{BASE}/catalog', params={'limit': 2})
+    assert first.status_code == 200
+    assert re.findall(r'>(thing-\d)</a>', first.text) == ['thing-0', 'thing-1']
+    assert f'href="{BASE}/catalog/{catalog[0]}"' in first.text
+    second = client.get(f'{BASE}/catalog{next_link(first)}')
+    assert re.findall(r'>(thing-\d)</a>', second.text) == ['thing-2']
+    assert 'Next products' not in second.text
+
+
+def test_catalog_refuses_foreign_cursor(catalog):
+    response = client.get(f'{BASE}/catalog', params={'after': 'eyJpZCI6MX0'})  # {"id":1}
+    assert response.status_code == 400
+
+
+def test_product_page_pages_builds(catalog):
+    first = client.get(f'{BASE}/catalog/{catalog[0]}', params={'limit': 3})
+    assert first.status_code == 200
+    assert '<h1>thing-0</h1>' in first.text
+    assert re.findall(r'<td>(2022\.9\.\d)</td>', first.text) == ['2022.9.0', '2022.9.1', '2022.9.2']
+    second = client.get(f'{BASE}/catalog/{catalog[0]}{next_link(first)}')
+    assert re.findall(r'<td>(2022\.9\.\d)</td>', second.text) == ['2022.9.3', '2022.9.4']
+    assert client.get(f'{BASE}/catalog/{catalog[-1] + 1}').status_code == 404
+
+
+def test_cached_fragments_need_no_query(catalog, sql_statements):
+    url = f'{BASE}/catalog/{catalog[0]}'
+    first = client.get(url)
+    client.get(f'{BASE}/catalog')
+    sql_statements.clear()
+    assert client.get(url).text == first.text
+    client.get(f'{BASE}/catalog')
+    assert sql_statements == []
+
+
+def test_writes_show_at_once(catalog, auth):
+    url = f'{BASE}/catalog/{catalog[1]}'
+    client.get(url)
+    client.get(f'{BASE}/catalog')
+    client.post(f'{BASE}/api/products/{catalog[1]}/builds', json={'version': 'fresh'}, headers=auth)
+    assert '<td>fresh</td>' in client.get(url).text
+    product = {'family': 'things', 'name': 'thing-1 renamed', 'description': 'Renamed.'}
+    client.put(f'{BASE}/api/products/{catalog[1]}', json=product, headers=auth)
+    assert '<h1>thing-1 renamed</h1>' in client.get(url).text
+    assert '>thing-1 renamed</a>' in client.get(f'{BASE}/catalog').text
+
+
+def test_picker(catalog, auth):
+    product = {'family': 'things', 'name': 'a-new-thing', 'description': ''}
+    new_id = client.post(f'{BASE}/api/products/', json=product, headers=auth).json()['id']
+    home = client.get(f'{BASE}/')
+    assert re.findall(r'<option value="(\d+)">', home.text) == [str(new_id)] + [str(id) for id in catalog]
+    response = client.get(f'{BASE}/catalog/pick', params={'product_id': new_id}, follow_redirects=False)
+    assert response.status_code == 303
+    assert response.headers['location'].endswith(f'{BASE}/catalog/{new_id}')
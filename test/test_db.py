@@ -0,0 +1,37 @@
+import asyncio
+
+from sqlalchemy import text
+
+from db import make_async_engine, make_engine
+
+
+def test_prod_profile_sets_pragmas(tmp_path):
+    engine = make_engine(f'sqlite:///{tmp_path}/prod.db', 'prod')
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+        assert connection.exec_driver_sql('PRAGMA synchronous').scalar() == 1  # NORMAL
+        assert connection.exec_driver_sql('PRAGMA busy_timeout').scalar() == 5000
+    assert not engine.echo
+    engine.dispose()
+
+
+def test_prod_profile_writer_is_single_connection(tmp_path):
+    async def exercise():
+        engine = make_async_engine(f'sqlite:///{tmp_path}/prod.db', 'prod', writer=True)
+        async with engine.begin() as connection:
+            await connection.execute(text('CREATE TABLE t (x INTEGER)'))
+            await connection.execute(text('INSERT INTO t VALUES (1)'))
+        async with engine.connect() as connection:
+            assert (await connection.execute(text('SELECT count(*) FROM t'))).scalar() == 1
+        assert engine.pool.size() == 1
+        await engine.dispose()
+
+    asyncio.run(exercise())
+
+
+def test_dev_profile_echoes_sql(tmp_path):
+    engine = make_engine(f'sqlite:///{tmp_path}/dev.db', 'dev')
+    assert engine.echo
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'delete'
+    engine.dispose()
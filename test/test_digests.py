@@ -0,0 +1,53 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect
+
+from db import engine
+from model import EMPTY_SHA512
+from server import BASE, app
+
+client = TestClient(app)
+URL = f'{BASE}/api/builds'
+DIGESTS = [f'{n:0128x}' for n in range(3)]
+
+
+def register(catalog, auth):
+    """Builds with DIGESTS[0] on products 0 and 1 and DIGESTS[1] on product 2, returns their ids."""
+    ids = []
+    for product_id, digest in zip(catalog, [DIGESTS[0], DIGESTS[0], DIGESTS[1]]):
+        build = client.post(f'{BASE}/api/products/{product_id}/builds', json={'sha512': digest}, headers=auth).json()
+        ids.append(build['id'])
+    return ids
+
+
+def test_lookup_by_digest(catalog, auth):
+    ids = register(catalog, auth)
+    response = client.get(f'{URL}/sha512/{DIGESTS[0].upper()}')
+    assert response.status_code == 200
+    assert [(build['product_id'], build['id']) for build in response.json()] == list(zip(catalog, ids[:2]))
+    assert client.get(f'{URL}/sha512/{DIGESTS[2]}').status_code == 404
+    assert client.get(f'{URL}/sha512/not-hex').status_code == 422
+
+
+def test_verify_many_in_one_query(catalog, auth, sql_statements):
+    ids = register(catalog, auth)
+    unknown = [f'{n:0128x}' for n in range(1000, 21000)]
+    sql_statements.clear()
+    response = client.post(f'{URL}/verify', json={'sha512': [DIGESTS[1], DIGESTS[0], *unknown, DIGESTS[2]]})
+    assert response.status_code == 200
+    result = response.json()
+    assert result['matches'] == {
+        DIGESTS[0]: [{'product_id': catalog[0], 'build_id': ids[0]}, {'product_id': catalog[1], 'build_id': ids[1]}],
+        DIGESTS[1]: [{'product_id': catalog[2], 'build_id': ids[2]}],
+    }
+    assert result['unknown'] == [*unknown, DIGESTS[2]]
+    assert len(sql_statements) == 1
+
+
+def test_verify_rejects_bad_digests(database):
+    assert client.post(f'{URL}/verify', json={'sha512': ['xyz']}).status_code == 422
+    assert client.post(f'{URL}/verify', json={'sha512': [EMPTY_SHA512] * 50001}).status_code == 422
+
+
+def test_digest_index(database):
+    indexes = {index['name']: index['column_names'] for index in inspect(engine).get_indexes('build')}
+    assert indexes['ix_build_sha512'] == ['sha512']
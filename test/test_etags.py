@@ -0,0 +1,59 @@
+from fastapi.testclient import TestClient
+
+from server import BASE, app
+
+client = TestClient(app)
+
+
+def revalidate(url, response):
+    return client.get(url, headers={'If-None-Match': response.headers['etag']})
+
+
+def test_unchanged_product_is_not_modified(catalog, sql_statements):
+    url = f'{BASE}/api/products/{catalog[0]}'
+    first = client.get(url)
+    assert first.status_code == 200
+    sql_statements.clear()
+    again = revalidate(url, first)
+    assert again.status_code == 304
+    assert again.headers['etag'] == first.headers['etag']
+    assert again.content == b''
+    assert sql_statements == []
+
+
+def test_tag_depends_on_query(catalog):
+    url = f'{BASE}/api/products/{catalog[0]}/builds'
+    assert client.get(url).headers['etag'] != client.get(url, params={'limit': 2}).headers['etag']
+
+
+def test_add_build_changes_tags_of_its_product(catalog, auth):
+    builds, other = f'{BASE}/api/products/{catalog[0]}/builds', f'{BASE}/api/products/{catalog[1]}'
+    listing, untouched = client.get(builds), client.get(other)
+    assert client.post(builds, json={'version': 'new'}, headers=auth).status_code == 200
+    changed = revalidate(builds, listing)
+    assert changed.status_code == 200
+    assert changed.json()[-1]['version'] == 'new'
+    assert revalidate(other, untouched).status_code == 304
+
+
+def test_product_writes_change_listing_tag(catalog, auth):
+    url = f'{BASE}/api/products/'
+    listing = client.get(url)
+    assert revalidate(url, listing).status_code == 304
+    client.patch(f'{BASE}/api/products/{catalog[2]}', params={'name': 'renamed'}, headers=auth)
+    changed = revalidate(url, listing)
+    assert changed.status_code == 200
+    assert changed.json()[2]['name'] == 'renamed'
+
+
+def test_bulk_builds_change_tags(catalog, auth):
+    url = f'{BASE}/api/products/{catalog[1]}/builds'
+    listing = client.get(url)
+    client.post(f'{BASE}/api/builds/bulk', json=[{'product_id': catalog[1], 'version': 'bulk'}], headers=auth)
+    assert revalidate(url, listing).status_code == 200
+
+
+def test_weak_and_listed_tags_match(catalog):
+    url = f'{BASE}/api/products/{catalog[0]}'
+    tag = client.get(url).headers['etag']
+    assert client.get(url, headers={'If-None-Match': f'"other", W/{tag}'}).status_code == 304
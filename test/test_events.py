@@ -0,0 +1,82 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+import events
+from db import engine
+from model import Build
+from server import BASE, app
+
+client = TestClient(app)
+
+
+def event_ids(text: str) -> list[int]:
+    return [int(line[4:]) for line in text.splitlines() if line.startswith('id: ')]
+
+
+def add_builds(product_id: int, count: int) -> None:
+    with Session(engine) as session:
+        session.add_all(Build(product_id=product_id, version=f'2023.1.{n}') for n in range(count))
+        session.commit()
+
+
+def test_events_replay_after(catalog, monkeypatch):
+    monkeypatch.setattr(events, 'STREAM_SECONDS', 0.1)
+    response = client.get(f'{BASE}/api/events/', params={'after': 0})
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/event-stream')
+    assert event_ids(response.text) == list(range(1, 11))  # Three products, then seven builds
+    assert 'event: product.create\n' in response.text
+    assert f'"kind":"build","action":"create","product_id":{catalog[2]},"build_id":7,' in response.text
+
+
+def test_events_resume_from_last_event_id(catalog, monkeypatch):
+    monkeypatch.setattr(events, 'STREAM_SECONDS', 0.1)
+    response = client.get(f'{BASE}/api/events/', headers={'Last-Event-ID': '8'})
+    assert event_ids(response.text) == [9, 10]
+    response = client.get(f'{BASE}/api/events/')
+    assert event_ids(response.text) == []
+    assert response.text.startswith('retry: ')
+
+
+def test_events_reset_when_missed(catalog, monkeypatch):
+    monkeypatch.setattr(events, 'STREAM_SECONDS', 0.1)
+    with engine.begin() as connection:
+        connection.exec_driver_sql('DELETE FROM change_event WHERE id <= 5')  # As pruning would
+    assert 'event: reset' in client.get(f'{BASE}/api/events/', headers={'Last-Event-ID': '2'}).text
+    assert 'event: reset' not in client.get(f'{BASE}/api/events/', headers={'Last-Event-ID': '5'}).text
+    assert 'event: reset' in client.get(f'{BASE}/api/events/', headers={'Last-Event-ID': '99'}).text
+
+
+def test_feed_delivers_new_writes(catalog):
+    async def scenario() -> list[str]:
+        subscriber, replay = await events.feed.subscribe(None)
+        assert replay == []
+        add_builds(catalog[1], 2)
+        events.feed.poke()
+        return [await asyncio.wait_for(subscriber.queue.get(), 5) for _ in range(2)]
+
+    texts = asyncio.run(scenario())
+    assert [event_ids(text) for text in texts] == [[11], [12]]
+    assert all('event: build.create' in text for text in texts)
+
+
+def test_feed_cuts_off_slow_subscribers(catalog, monkeypatch):
+    monkeypatch.setattr(events, 'QUEUE_SIZE', 2)
+
+    async def scenario() -> tuple[events.Subscriber, events.Subscriber]:
+        slow, _ = await events.feed.subscribe(None)
+        monkeypatch.setattr(events, 'QUEUE_SIZE', 100)
+        fast, _ = await events.feed.subscribe(None)
+        add_builds(catalog[0], 5)
+        events.feed.poke()
+        while fast.queue.qsize() < 5:
+            await asyncio.sleep(0.01)
+        return slow, fast
+
+    slow, fast = asyncio.run(scenario())
+    assert slow.cut_off and slow.queue.qsize() == 2
+    assert slow not in events.feed.subscribers
+    assert not fast.cut_off
+    assert [id for id, _ in events.feed.ring][-5:] == list(range(11, 16))
@@ -0,0 +1,49 @@
+import csv
+import io
+import json
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+import catalog_export
+from db import engine
+from model import Product
+from server import BASE, app
+
+client = TestClient(app)
+
+
+def test_export_ndjson_nests_builds(catalog):
+    with Session(engine) as session:
+        session.add(Product(family='things', name='lonely', description='No builds.'))
+        session.commit()
+    response = client.get(f'{BASE}/api/export/')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    products = [json.loads(line) for line in response.text.splitlines()]
+    assert [p['id'] for p in products[:3]] == catalog
+    assert [b['version'] for b in products[0]['builds']] == [f'2022.9.{n}' for n in range(5)]
+    assert products[0]['builds'][0]['timestamp'] == '2022-09-01 19:20:21.123456 +00:00'
+    assert products[3]['name'] == 'lonely' and products[3]['builds'] == []
+
+
+def test_export_csv_one_row_per_build(catalog):
+    response = client.get(f'{BASE}/api/export/', params={'format': 'csv'})
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 7
+    assert rows[0]['product_id'] == str(catalog[0]) and rows[0]['build_version'] == '2022.9.0'
+    assert rows[0]['build_timestamp'] == '2022-09-01 19:20:21.123456 +00:00'
+
+
+def test_export_streams_in_chunks(catalog, monkeypatch):
+    monkeypatch.setattr(catalog_export, 'YIELD_PER', 2)
+    with client.stream('GET', f'{BASE}/api/export/') as response:
+        text = ''.join(response.iter_text())
+    assert len(text.splitlines()) == 3
+
+
+def test_export_cli(catalog, tmp_path):
+    target = tmp_path / 'catalog.ndjson'
+    assert catalog_export.main(['--output', str(target)]) == 0
+    assert [json.loads(line)['id'] for line in target.read_text().splitlines()] == catalog
@@ -0,0 +1,66 @@
+import hashlib
+import zlib
+
+from fastapi.testclient import TestClient
+
+import fingerprint
+from server import BASE, app
+
+client = TestClient(app)
+DATA = bytes(range(256)) * 1000 + b'tail'
+
+
+def test_fingerprints_match_hashlib(tmp_path, monkeypatch):
+    monkeypatch.setattr(fingerprint, 'CHUNK_SIZE', 4096)  # Many chunks through the pipeline
+    path = tmp_path / 'artifact.bin'
+    path.write_bytes(DATA)
+    found = fingerprint.fingerprint_file(str(path))
+    assert found['blake2'] == hashlib.blake2b(DATA).hexdigest()
+    assert found['sha'] == hashlib.sha1(DATA).hexdigest()
+    assert found['sha512'] == hashlib.sha512(DATA).hexdigest()
+    assert found['md5'] == hashlib.md5(DATA).hexdigest()
+    assert found['crc32'] == f'{zlib.crc32(DATA):08x}'
+    assert found['bytes'] == str(len(DATA))
+    assert found['hex32'] == DATA[:32].hex()
+    assert float(found['entropy']) > 7.99
+
+
+def test_entropy_format():
+    entropy = fingerprint.Entropy()
+    entropy.update(bytes(range(256)))
+    assert entropy.value() == '8.000000'
+    empty = fingerprint.Entropy()
+    assert empty.value() == '0.000000'
+
+
+def test_annotation_format(tmp_path, capsys):
+    path = tmp_path / 'hello.txt'
+    path.write_bytes(b'hello\n')
+    assert fingerprint.main([str(path)]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[:2] == [f'- artifact:{path}:', '']
+    assert [line.split(':', 1)[0] for line in lines[2:]] == [f'  + {key}' for key in fingerprint.ORDER]
+    assert '  + sha256:' + hashlib.sha256(b'hello\n').hexdigest() in lines
+    assert '  + mime-type:(text/plain)' in lines
+    assert all(line.endswith(')') for line in lines if line.split(':', 1)[0].strip('+ ') in fingerprint.PARENTHESIZED)
+
+
+def test_cli_exit_codes(tmp_path):
+    assert fingerprint.main([]) == 2
+    assert fingerprint.main([str(tmp_path / 'missing')]) == 1
+
+
+def test_upload_sets_sha512(catalog, auth, monkeypatch):
+    monkeypatch.setattr(fingerprint, 'CHUNK_SIZE', 4096)
+    builds = f'{BASE}/api/products/{catalog[1]}/builds'
+    build_id = client.get(builds).json()[0]['id']
+    response = client.put(f'{builds}/{build_id}/artifact', content=DATA, headers=auth)
+    assert response.status_code == 200
+    assert response.json()['fingerprints']['sha512'] == hashlib.sha512(DATA).hexdigest()
+    assert client.get(f'{builds}/{build_id}').json()['sha512'] == hashlib.sha512(DATA).hexdigest()
+
+
+def test_upload_needs_build_and_auth(catalog, auth):
+    builds = f'{BASE}/api/products/{catalog[1]}/builds'
+    assert client.put(f'{builds}/999/artifact', content=DATA, headers=auth).status_code == 404
+    assert client.put(f'{builds}/999/artifact', content=DATA).status_code == 401
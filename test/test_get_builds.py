@@ -0,0 +1,49 @@
+from fastapi.testclient import TestClient
+
+from server import BASE, app
+
+client = TestClient(app)
+
+
+def test_get_builds_newest_first(catalog):
+    response = client.get(f'{BASE}/api/builds/')
+    assert response.status_code == 200
+    builds = response.json()
+    assert [b['timestamp'][:10] for b in builds] == [f'2022-09-0{n}' for n in (5, 4, 3, 2, 1, 1, 1)]
+    assert builds[0]['timestamp'] == '2022-09-05 19:20:21.123456 +00:00'
+    assert [b['id'] for b in builds[-3:]] == sorted((b['id'] for b in builds[-3:]), reverse=True)
+
+
+def test_get_builds_between(catalog):
+    response = client.get(f'{BASE}/api/builds/', params={'since': '2022-09-02T00:00:00Z', 'until': '2022-09-04'})
+    assert response.status_code == 200
+    assert [b['version'] for b in response.json()] == ['2022.9.2', '2022.9.1']
+
+
+def test_get_builds_since_is_inclusive(catalog):
+    response = client.get(f'{BASE}/api/builds/', params={'since': '2022-09-05 19:20:21.123456 +00:00'})
+    assert [b['version'] for b in response.json()] == ['2022.9.4']
+
+
+def test_get_builds_follows_next_links(catalog):
+    response = client.get(f'{BASE}/api/builds/', params={'until': '2022-09-04', 'limit': 2})
+    ids = []
+    while True:
+        assert response.status_code == 200
+        ids.extend(b['id'] for b in response.json())
+        if 'next' not in response.links:
+            break
+        response = client.get(response.links['next']['url'])
+    assert ids == [b['id'] for b in client.get(f'{BASE}/api/builds/', params={'until': '2022-09-04'}).json()]
+    assert len(ids) == 5
+
+
+def test_get_builds_malformed_bound(catalog):
+    assert client.get(f'{BASE}/api/builds/', params={'since': 'yesterday'}).status_code == 422
+    assert client.get(f'{BASE}/api/builds/', params={'after': 'nonsense'}).status_code == 400
+
+
+def test_get_builds_not_modified(catalog):
+    response = client.get(f'{BASE}/api/builds/')
+    again = client.get(f'{BASE}/api/builds/', headers={'If-None-Match': response.headers['etag']})
+    assert again.status_code == 304
@@ -0,0 +1,97 @@
+from fastapi.testclient import TestClient
+
+from server import BASE, app
+
+client = TestClient(app)
+
+
+def test_get_product_builds(catalog):
+    response = client.get(f'{BASE}/api/products/{catalog[0]}/builds')
+    assert response.status_code == 200
+    builds = response.json()
+    assert [b['version'] for b in builds] == [f'2022.9.{n}' for n in range(5)]
+    assert 'link' not in response.headers
+
+
+def test_get_product_builds_follows_next_links(catalog):
+    response = client.get(f'{BASE}/api/products/{catalog[0]}/builds', params={'limit': 2})
+    versions = []
+    while True:
+        assert response.status_code == 200
+        versions.extend(b['version'] for b in response.json())
+        if 'next' not in response.links:
+            break
+        response = client.get(response.links['next']['url'])
+    assert versions == [f'2022.9.{n}' for n in range(5)]
+
+
+def test_get_product_builds_unknown_product(catalog):
+    response = client.get(f'{BASE}/api/products/{catalog[-1] + 1}/builds')
+    assert response.status_code == 404
+
+
+def test_get_product_builds_malformed_cursor(catalog):
+    response = client.get(f'{BASE}/api/products/{catalog[0]}/builds', params={'after': 'nonsense'})
+    assert response.status_code == 400
+
+
+def test_get_product_build_by_id(catalog, sql_statements):
+    build_id = client.get(f'{BASE}/api/products/{catalog[0]}/builds').json()[2]['id']
+    sql_statements.clear()
+    response = client.get(f'{BASE}/api/products/{catalog[0]}/builds/{build_id}')
+    assert response.status_code == 200
+    assert response.json()['version'] == '2022.9.2'
+    assert len(sql_statements) == 1
+
+
+def test_get_product_build_by_id_of_other_product(catalog):
+    build_id = client.get(f'{BASE}/api/products/{catalog[0]}/builds').json()[0]['id']
+    response = client.get(f'{BASE}/api/products/{catalog[1]}/builds/{build_id}')
+    assert response.status_code == 404
+    assert response.json()['detail'].startswith('No product/build')
+
+
+def test_get_latest_build(catalog, sql_statements):
+    response = client.get(f'{BASE}/api/products/{catalog[0]}/builds/latest')
+    assert response.status_code == 200
+    assert response.json()['version'] == '2022.9.4'
+    assert len(sql_statements) == 1
+    again = client.get(f'{BASE}/api/products/{catalog[0]}/builds/latest')
+    assert again.json() == response.json()
+    assert len(sql_statements) == 1
+
+
+def test_get_latest_build_follows_writes(catalog, auth):
+    client.get(f'{BASE}/api/products/{catalog[1]}/builds/latest')
+    client.post(
+        f'{BASE}/api/products/{catalog[1]}/builds',
+        json={'version': '2022.8.0', 'timestamp': '2022-08-01 00:00:00.000000 +00:00'},
+        headers=auth,
+    )
+    assert client.get(f'{BASE}/api/products/{catalog[1]}/builds/latest').json()['version'] == '2022.9.0'
+    client.post(f'{BASE}/api/products/{catalog[1]}/builds', json={'version': '2099.1.0'}, headers=auth)
+    assert client.get(f'{BASE}/api/products/{catalog[1]}/builds/latest').json()['version'] == '2099.1.0'
+
+
+def test_get_latest_build_without_builds(catalog, auth):
+    product = client.post(
+        f'{BASE}/api/products/', json={'family': 'things', 'name': 'new', 'description': ''}, headers=auth
+    ).json()
+    response = client.get(f'{BASE}/api/products/{product["id"]}/builds/latest')
+    assert response.status_code == 404
+    assert response.json()['detail'].startswith('No builds')
+    response = client.get(f'{BASE}/api/products/{product["id"] + 1}/builds/latest')
+    assert response.status_code == 404
+    assert response.json()['detail'].startswith('No product')
+
+
+def test_get_latest_builds(catalog):
+    ids = [catalog[2], catalog[0], catalog[2] + 1, catalog[1]]
+    response = client.get(f'{BASE}/api/products/builds/latest', params={'product_id': ids})
+    assert response.status_code == 200
+    assert [(b['product_id'], b['version']) for b in response.json()] == [
+        (catalog[2], '2022.9.0'),
+        (catalog[0], '2022.9.4'),
+        (catalog[1], '2022.9.0'),
+    ]
+    assert client.get(f'{BASE}/api/products/builds/latest').json() == []
@@ -11,3 +11,18 @@ def test_get_products():
     products = response.json()
     assert all(['name' in c for c in products])
     assert all(['family' in c for c in products])
+
+
+def test_get_products_pages_by_cursor(catalog):
+    response = client.get(f'{BASE}/api/products/', params={'limit': 2})
+    assert response.status_code == 200
+    assert [p['id'] for p in response.json()] == catalog[:2]
+    response = client.get(response.links['next']['url'])
+    assert [p['id'] for p in response.json()] == catalog[2:]
+    assert 'next' not in response.links
+
+
+def test_get_products_caps_limit(catalog):
+    response = client.get(f'{BASE}/api/products/', params={'limit': 10**6})
+    assert response.status_code == 200
+    assert len(response.json()) == len(catalog)
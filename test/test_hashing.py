@@ -0,0 +1,57 @@
+import threading
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+import hashing
+from db import engine
+from model import User, pwd_context
+from server import app
+
+client = TestClient(app)
+
+
+def login(password='rotor'):
+    return client.post('/auth/token', data={'username': 'rotor', 'password': password})
+
+
+def rotor_hash():
+    with Session(engine) as session:
+        return session.exec(select(User.password_hash).where(User.username == 'rotor')).one()
+
+
+def test_login_verifies_on_hashing_pool(database, monkeypatch):
+    threads = []
+    verify_and_update = User.verify_and_update
+
+    def record(user, password):
+        threads.append(threading.current_thread().name)
+        return verify_and_update(user, password)
+
+    monkeypatch.setattr(User, 'verify_and_update', record)
+    assert login().status_code == 200
+    assert threads and threads[0].startswith('hashing')
+
+
+def test_login_rejected_when_pool_is_full(database, monkeypatch):
+    monkeypatch.setattr(hashing, 'HASH_QUEUE', -hashing.HASH_WORKERS)
+    response = login()
+    assert response.status_code == 429
+    assert response.headers['retry-after'] == '1'
+
+
+def test_login_rehashes_other_cost(database):
+    with Session(engine) as session:
+        rotor = session.exec(select(User).where(User.username == 'rotor')).one()
+        rotor.password_hash = pwd_context.hash('rotor', rounds=4)
+        session.add(rotor)
+        session.commit()
+    assert login().status_code == 200
+    assert not pwd_context.needs_update(rotor_hash())
+    assert pwd_context.verify('rotor', rotor_hash())
+
+
+def test_failed_login_keeps_hash(database):
+    before = rotor_hash()
+    assert login('stator').status_code == 400
+    assert rotor_hash() == before
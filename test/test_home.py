@@ -1,5 +1,11 @@
+import re
+
 from fastapi.testclient import TestClient
+from sqlmodel import Session
 
+from db import engine
+from model import Product
+from router import web
 from server import BASE, app
 
 client = TestClient(app)
@@ -9,3 +15,18 @@ def test_home():
     response = client.get(f'{BASE}/')
     assert response.status_code == 200
     assert 'Braces' in response.text
+
+
+def test_search_offers_next_page(catalog, monkeypatch):
+    monkeypatch.setattr(web, 'SEARCH_PAGE_SIZE', 1)
+    with Session(engine) as session:
+        session.add(Product(family='things', name='thing-0', description='Another thing 0.'))
+        session.commit()
+    first = client.post(f'{BASE}/search', data={'q': 'another'})
+    assert first.status_code == 200
+    assert 'Another thing 0.' in first.text and 'Next page' not in first.text
+    first = client.post(f'{BASE}/search', data={'q': 'thing'})
+    assert 'Next page' in first.text
+    after = re.search(r'name="after" value="([^"]+)"', first.text).group(1)
+    second = client.post(f'{BASE}/search', data={'q': 'thing', 'after': after})
+    assert second.status_code == 200 and second.text != first.text
@@ -0,0 +1,45 @@
+import pytest
+
+from jsonstream import Decoder, MalformedRecord
+
+
+def chunked(body, size):
+    offsets = list(range(0, len(body), size)) + [len(body)]
+    return [body[start:end] for start, end in zip(offsets, offsets[1:])]
+
+
+def decode(chunks):
+    decoder = Decoder(max_record_size=64)
+    records = []
+    for chunk in chunks:
+        records.extend(decoder.feed(chunk))
+    records.extend(decoder.feed(b'', final=True))
+    return records
+
+
+def test_array_split_anywhere():
+    body = b' [ {"a": 1}, {"b": "\xc3\xa6"} ,12, [3] ] '
+    for size in range(1, len(body)):
+        assert decode(chunked(body, size)) == [{'a': 1}, {'b': 'æ'}, 12, [3]]
+
+
+def test_ndjson_without_trailing_newline():
+    assert decode([b'{"a": 1}\n\n{"b"', b': 2}']) == [{'a': 1}, {'b': 2}]
+
+
+def test_ndjson_malformed_line_does_not_stop():
+    records = decode([b'{"a": 1}\n{oops\n3\n'])
+    assert records[0] == {'a': 1} and isinstance(records[1], MalformedRecord) and records[2] == 3
+
+
+@pytest.mark.parametrize(
+    'body', [b'[{"a": 1} {"b": 2}]', b'[{"a": 1}', b'[{"a": 1},]', b'[{"a": "' + b'x' * 100 + b'"}]']
+)
+def test_array_errors(body):
+    with pytest.raises(ValueError):
+        decode(chunked(body, 8))
+
+
+def test_empty_body():
+    assert decode([b'']) == []
+    assert decode([b'[]']) == []
@@ -0,0 +1,60 @@
+import re
+
+from fastapi.testclient import TestClient
+
+import metrics
+from server import BASE, app
+
+client = TestClient(app)
+
+
+def timings(response):
+    return dict(re.findall(r'(\w+);dur=([\d.]+)', response.headers['server-timing']))
+
+
+def test_server_timing_counts_queries(catalog):
+    response = client.get(f'{BASE}/api/products/{catalog[0]}/builds')
+    assert response.status_code == 200
+    assert 'desc="2 queries"' in response.headers['server-timing']
+    found = timings(response)
+    assert float(found['total']) >= float(found['db']) > 0
+    assert float(found['serialize']) > 0
+
+
+def test_cached_product_is_served_without_queries(catalog):
+    url = f'{BASE}/api/products/{catalog[0]}'
+    client.get(url)
+    response = client.get(url)
+    assert 'desc="0 queries"' in response.headers['server-timing']
+    assert float(timings(response)['db']) == 0
+
+
+def test_metrics_by_route_template(catalog):
+    metrics.clear()
+    for product_id in catalog:
+        client.get(f'{BASE}/api/products/{product_id}/builds')
+    client.get(f'{BASE}/no/such/page')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    text = response.text
+    labels = f'method="GET",route="{BASE}/api/products/{{product_id}}/builds",status="200"'
+    assert f'bos_request_seconds_count{{{labels}}} 3' in text
+    assert f'bos_request_seconds_bucket{{{labels},le="+Inf"}} 3' in text
+    assert f'bos_db_queries_total{{{labels}}} 6' in text
+    assert 'route="unmatched",status="404"' in text
+    assert '/no/such/page' not in text
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics.clear()
+    route = metrics.Route()
+    for seconds in (0.0005, 0.003, 0.003, 20.0):
+        route.observe(seconds, metrics.Timing())
+    metrics._routes['GET', '/r', 200] = route
+    lines = [line for line in metrics.exposition() if line.startswith('bos_request_seconds_bucket')]
+    assert lines[0].endswith('le="0.001"} 1')
+    assert lines[2].endswith('le="0.005"} 3')
+    assert lines[-2].endswith('le="10.0"} 3')
+    assert lines[-1].endswith('le="+Inf"} 4')
+    metrics.clear()
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+from sqlmodel import Session, select
+
+import migrate_from_json
+from db import engine
+from model import Build, Product, format_timestamp
+
+
+def legacy(n, topic='thing'):
+    time_ref = f'2022090{n % 9 + 1}T19202{n % 10}Z' if n % 2 else f'2022-09-0{n % 9 + 1}T19:20:2{n % 10}Z'
+    return {
+        'id': n,
+        'topic': topic,
+        'summary': f'build {n}',
+        'source_url': f'https://example.com/vcs/{n}',
+        'tag': f'2022.9.{n}',
+        'time_ref': time_ref,
+        'target_url': f'https://example.com/brm/{n}',
+    }
+
+
+@pytest.fixture
+def datafile(tmp_path):
+    path = tmp_path / 'legacy.json'
+    path.write_text(json.dumps([legacy(n, topic=f'thing-{n % 3}') for n in range(7)]), encoding='utf-8')
+    return str(path)
+
+
+def catalog():
+    with Session(engine) as session:
+        products = session.exec(select(Product).order_by(Product.id)).all()
+        builds = session.exec(select(Build).order_by(Build.id)).all()
+        return products, builds
+
+
+def test_timestamp_of_both_legacy_formats():
+    assert migrate_from_json.timestamp('20220904T192021Z') == 1662319221_000000
+    assert migrate_from_json.timestamp('2022-09-04T19:20:21Z') == 1662319221_000000
+    for bad in ('2022-09-04 19:20:21', '20220230T192021Z', '2022-09-04T19:20:21Z '):
+        with pytest.raises(ValueError):
+            migrate_from_json.timestamp(bad)
+
+
+def test_import(datafile, capsys):
+    assert migrate_from_json.main([datafile, '--batch-size', '3']) == 0
+    assert capsys.readouterr().out == '7 builds and 3 products imported, 0 records skipped as done before\n'
+    products, builds = catalog()
+    assert [product.name for product in products] == ['thing-0', 'thing-1', 'thing-2']
+    assert [build.version for build in builds] == [f'2022.9.{n}' for n in range(7)]
+    assert {build.product_id for build in builds[::3]} == {products[0].id}
+    assert format_timestamp(builds[1].timestamp) == '2022-09-02 19:20:21.000000 +00:00'
+    assert format_timestamp(builds[2].timestamp) == '2022-09-03 19:20:22.000000 +00:00'
+    with open(f'{datafile}.checkpoint', encoding='utf-8') as handle:
+        assert json.load(handle)['records'] == 7
+
+
+def test_resume_after_interruption(datafile, monkeypatch, capsys):
+    write = migrate_from_json.Importer.write
+    calls = []
+
+    def interrupted(self, batch):
+        calls.append(len(batch))
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        write(self, batch)
+
+    monkeypatch.setattr(migrate_from_json.Importer, 'write', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        migrate_from_json.main([datafile, '--batch-size', '3'])
+    assert len(catalog()[1]) == 3
+    monkeypatch.undo()
+    capsys.readouterr()
+
+    assert migrate_from_json.main([datafile, '--batch-size', '3']) == 0
+    assert capsys.readouterr().out == '4 builds and 0 products imported, 3 records skipped as done before\n'
+    products, builds = catalog()
+    assert len(products) == 3
+    assert [build.version for build in builds] == [f'2022.9.{n}' for n in range(7)]
+
+    assert migrate_from_json.main([datafile]) == 0
+    assert len(catalog()[1]) == 7
+
+
+def test_checkpoint_of_another_file(datafile, tmp_path, capsys):
+    other = tmp_path / 'other.json'
+    other.write_text('[]', encoding='utf-8')
+    assert migrate_from_json.main([str(other), '--checkpoint', f'{datafile}.checkpoint']) == 0
+    assert migrate_from_json.main([datafile, '--checkpoint', f'{datafile}.checkpoint']) == 2
+    assert 'belongs to' in capsys.readouterr().err
@@ -0,0 +1,67 @@
+import os
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import make_url
+
+import db
+import etags
+import peers
+from server import BASE, app
+
+client = TestClient(app)
+DB_PATH = make_url(db.DB_URL).database
+
+
+@pytest.fixture
+def watching(database):
+    peers.watch(DB_PATH)
+    yield
+    peers._connection.close()
+    peers._connection = None
+
+
+def rename_elsewhere(product_id, name):
+    """Write as another worker process would, unseen by the routes of this one."""
+    with sqlite3.connect(DB_PATH) as connection:
+        connection.execute('UPDATE product SET name = ? WHERE id = ?', (name, product_id))
+
+
+def test_writes_of_other_processes_reach_the_caches(catalog, watching):
+    url = f'{BASE}/api/products/{catalog[0]}'
+    tag = client.get(url).headers['etag']
+    assert client.get(url, headers={'If-None-Match': tag}).status_code == 304
+    rename_elsewhere(catalog[0], 'renamed')
+    response = client.get(url, headers={'If-None-Match': tag})
+    assert response.status_code == 200
+    assert response.json()['name'] == 'renamed'
+    assert client.get(url, headers={'If-None-Match': response.headers['etag']}).status_code == 304
+
+
+def test_check_runs_callbacks_once_per_change(database, watching):
+    generation = etags.catalog()
+    assert not peers.check()
+    with sqlite3.connect(DB_PATH) as connection:
+        connection.execute("INSERT INTO product (family, name, description) VALUES ('f', 'n', 'd')")
+    assert peers.check()
+    assert not peers.check()
+    assert etags.catalog() == generation + 1
+    assert etags.product(12345) == etags.catalog()
+
+
+def test_unwatched_process_keeps_its_cache(catalog):
+    url = f'{BASE}/api/products/{catalog[0]}'
+    client.get(url)
+    rename_elsewhere(catalog[0], 'renamed')
+    assert client.get(url).json()['name'] == 'thing-0'
+
+
+def test_forked_worker_draws_its_own_epoch():
+    reader, writer = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(writer, etags.EPOCH.encode('ascii'))
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(reader, 64).decode('ascii') != etags.EPOCH
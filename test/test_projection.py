@@ -0,0 +1,86 @@
+from fastapi.testclient import TestClient
+
+from server import BASE, app
+
+client = TestClient(app)
+
+
+def selects(statements: list[str]) -> list[str]:
+    return [' '.join(statement.split()) for statement in statements if statement.lstrip().startswith('SELECT')]
+
+
+def test_products_fields_are_selected_alone(catalog, sql_statements):
+    sql_statements.clear()
+    response = client.get(f'{BASE}/api/products/', params={'fields': 'name'})
+    assert response.status_code == 200
+    assert response.json() == [{'name': f'thing-{n}'} for n in range(3)]
+    assert selects(sql_statements)[0].startswith('SELECT product.name, product.id FROM product')
+
+
+def test_products_embed_builds(catalog, sql_statements):
+    sql_statements.clear()
+    response = client.get(f'{BASE}/api/products/', params={'fields': 'id,builds.version', 'limit': 2})
+    assert response.status_code == 200
+    products = response.json()
+    assert products[0] == {'id': catalog[0], 'builds': [{'version': f'2022.9.{n}'} for n in range(5)]}
+    assert products[1] == {'id': catalog[1], 'builds': [{'version': '2022.9.0'}]}
+    assert 'next' in response.links
+    builds_query = selects(sql_statements)[1]
+    assert builds_query.startswith('SELECT build.version, build.product_id FROM build WHERE build.product_id IN')
+    assert 'sha512' not in builds_query
+
+
+def test_product_by_id_projected(catalog, sql_statements):
+    response = client.get(f'{BASE}/api/products/{catalog[1]}', params={'fields': 'name,description'})
+    assert response.json() == {'name': 'thing-1', 'description': 'Thing 1.'}
+    response = client.get(f'{BASE}/api/products/{catalog[1]}', params={'embed': 'builds'})
+    assert set(response.json()) == {'family', 'name', 'description', 'id', 'builds'}
+    assert response.json()['builds'][0]['timestamp'] == '2022-09-01 19:20:21.123456 +00:00'
+    sql_statements.clear()
+    again = client.get(f'{BASE}/api/products/{catalog[1]}', params={'embed': 'builds'})
+    assert again.json() == response.json()
+    assert sql_statements == []  # Cached per projection
+    assert len(client.get(f'{BASE}/api/products/{catalog[1]}').json()['builds']) == 1
+    assert client.get(f'{BASE}/api/products/{catalog[-1] + 1}', params={'fields': 'name'}).status_code == 404
+
+
+def test_product_builds_projected_pages(catalog):
+    response = client.get(f'{BASE}/api/products/{catalog[0]}/builds', params={'fields': 'version', 'limit': 2})
+    versions = []
+    while True:
+        assert response.status_code == 200
+        assert all(list(build) == ['version'] for build in response.json())
+        versions.extend(build['version'] for build in response.json())
+        if 'next' not in response.links:
+            break
+        response = client.get(response.links['next']['url'])
+    assert versions == [f'2022.9.{n}' for n in range(5)]
+
+
+def test_product_build_by_id_projected(catalog):
+    build = client.get(f'{BASE}/api/products/{catalog[0]}/builds').json()[1]
+    response = client.get(f'{BASE}/api/products/{catalog[0]}/builds/{build["id"]}', params={'fields': 'version,id'})
+    assert response.json() == {'version': '2022.9.1', 'id': build['id']}
+    assert 'etag' in response.headers
+    response = client.get(f'{BASE}/api/products/{catalog[0]}/builds/{build["id"]}', params={'fields': 'sha512'})
+    assert list(response.json()) == ['sha512']  # A single column is still a record
+
+
+def test_builds_projected(catalog):
+    response = client.get(f'{BASE}/api/builds/', params={'fields': 'product_id,timestamp', 'limit': 1})
+    assert response.json() == [{'timestamp': '2022-09-05 19:20:21.123456 +00:00', 'product_id': catalog[0]}]
+    assert 'next' in response.links
+    response = client.get(f'{BASE}/api/builds/', params={'fields': 'version', 'ids': '2,99'})
+    assert response.json() == {'found': {'2': {'version': '2022.9.1'}}, 'not_found': [99]}
+
+
+def test_products_batch_projected(catalog):
+    response = client.get(f'{BASE}/api/products/', params={'ids': f'{catalog[2]},99', 'fields': 'name'})
+    assert response.json() == {'found': {str(catalog[2]): {'name': 'thing-2'}}, 'not_found': [99]}
+
+
+def test_projection_rejects_unknown_fields(catalog):
+    assert client.get(f'{BASE}/api/products/', params={'fields': 'name,colour'}).status_code == 400
+    assert client.get(f'{BASE}/api/products/', params={'fields': 'builds.colour'}).status_code == 400
+    assert client.get(f'{BASE}/api/products/', params={'embed': 'owners'}).status_code == 400
+    assert client.get(f'{BASE}/api/builds/', params={'fields': 'builds.version'}).status_code == 400
@@ -0,0 +1,33 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from server import BASE, app
+
+client = TestClient(app)
+
+
+def product_detail(ids):
+    return client.get(f'{BASE}/api/products/{ids[0]}')
+
+
+def product_list(ids):
+    return client.get(f'{BASE}/api/products/')
+
+
+def product_builds(ids):
+    return client.get(f'{BASE}/api/products/{ids[0]}/builds')
+
+
+def search_page(ids):
+    return client.post(f'{BASE}/search', data={'q': 'thing'})
+
+
+@pytest.mark.parametrize(
+    'call, ceiling',
+    [(product_list, 1), (product_detail, 2), (product_builds, 2), (search_page, 2)],
+)
+def test_no_lazy_loading_per_product(catalog, sql_statements, call, ceiling):
+    sql_statements.clear()
+    response = call(catalog)
+    assert response.status_code == 200
+    assert len(sql_statements) <= ceiling, '\n'.join(sql_statements)
@@ -0,0 +1,79 @@
+from sqlalchemy import create_engine, inspect
+
+import schema
+from db import engine
+from router.products import latest_builds_query
+from schema import MIGRATIONS, init_schema, version
+
+
+def test_init_schema_creates_indexes(database):
+    indexes = {index['name']: index['column_names'] for index in inspect(engine).get_indexes('build')}
+    assert indexes['ix_build_product_id_id'] == ['product_id', 'id']
+    assert 'ix_build_product_id' not in indexes
+    assert 'ix_product_name' in {index['name'] for index in inspect(engine).get_indexes('product')}
+
+
+def test_init_schema_is_idempotent(database):
+    assert init_schema(engine) == len(MIGRATIONS)
+    with engine.connect() as connection:
+        assert version(connection) == len(MIGRATIONS)
+
+
+def test_name_filter_uses_index(database):
+    with engine.connect() as connection:
+        plan = connection.exec_driver_sql("EXPLAIN QUERY PLAN SELECT * FROM product WHERE name = 'thing'").fetchall()
+    assert any('ix_product_name' in row[-1] for row in plan)
+
+
+def test_build_pages_use_index_order(database):
+    with engine.connect() as connection:
+        plan = connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM build WHERE product_id = 1 AND (timestamp, id) > (0, 0)"
+            ' ORDER BY timestamp, id LIMIT 101'
+        ).fetchall()
+    details = ' '.join(row[-1] for row in plan)
+    assert 'ix_build_product_id_timestamp_id' in details
+    assert 'TEMP B-TREE' not in details
+
+
+def test_builds_across_products_use_timestamp_index(database):
+    with engine.connect() as connection:
+        plan = connection.exec_driver_sql(
+            'EXPLAIN QUERY PLAN SELECT * FROM build WHERE timestamp >= 0 AND timestamp < 1000000000000000'
+            ' AND (timestamp, id) < (1000, 0) ORDER BY timestamp DESC, id DESC LIMIT 101'
+        ).fetchall()
+    details = ' '.join(row[-1] for row in plan)
+    assert 'ix_build_timestamp_id' in details
+    assert 'TEMP B-TREE' not in details
+
+
+def test_migration_converts_text_timestamps(tmp_path, monkeypatch):
+    old = create_engine(f'sqlite:///{tmp_path}/old.db')
+    monkeypatch.setattr(schema, 'MIGRATIONS', MIGRATIONS[:4])
+    init_schema(old)
+    with old.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO product (id, family, name, description) VALUES (1, 'f', 'n', 'd')")
+        connection.exec_driver_sql(
+            'INSERT INTO build (id, product_id, version, timestamp) VALUES'
+            " (1, 1, 'a', '2022-09-04 19:20:21.123456 +00:00'), (2, 1, 'b', '2022-09-04 21:20:21.500 +02:00'),"
+            " (3, 1, 'c', '2022-09-04 19:20:21.'), (4, 1, 'd', 'whenever')"
+        )
+    monkeypatch.setattr(schema, 'MIGRATIONS', MIGRATIONS)
+    assert init_schema(old) == len(MIGRATIONS)
+    with old.connect() as connection:
+        rows = connection.exec_driver_sql('SELECT id, timestamp FROM build ORDER BY id').fetchall()
+        indexes = {row[1] for row in connection.exec_driver_sql("PRAGMA index_list('build')")}
+        hits = connection.exec_driver_sql("SELECT rowid FROM catalog_fts WHERE catalog_fts MATCH 'b'").fetchall()
+    assert rows == [(1, 1662319221_123456), (2, 1662319221_500000), (3, 1662319221_000000), (4, 0)]
+    assert {'ix_build_product_id_id', 'ix_build_product_id_timestamp_id', 'ix_build_timestamp_id'} <= indexes
+    assert hits == [(2,)]
+    old.dispose()
+
+
+def test_latest_build_uses_primary_keys(database):
+    query = latest_builds_query(1).compile(engine, compile_kwargs={'literal_binds': True})
+    with engine.connect() as connection:
+        plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {query}').fetchall()
+    details = [row[-1] for row in plan]
+    assert len(details) == 2
+    assert all('USING INTEGER PRIMARY KEY' in detail for detail in details)
@@ -0,0 +1,74 @@
+from fastapi.testclient import TestClient
+
+from router import search as search_api
+from server import BASE, app
+
+client = TestClient(app)
+URL = f'{BASE}/api/search/'
+
+
+def search(q, **params):
+    response = client.get(URL, params={'q': q, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_search_products_and_builds(catalog):
+    hits = search('thing 1')
+    assert {(hit['kind'], hit['product_id']) for hit in hits} == {('product', catalog[1])}
+    builds = search('2022.9.3')
+    assert [(hit['kind'], hit['product_id'], hit['version']) for hit in builds] == [('build', catalog[0], '2022.9.3')]
+
+
+def test_name_ranks_before_description(catalog, auth):
+    client.post(f'{BASE}/api/products/', json={'family': 'f', 'name': 'other', 'description': 'widget'}, headers=auth)
+    client.post(f'{BASE}/api/products/', json={'family': 'f', 'name': 'widget', 'description': 'other'}, headers=auth)
+    assert [hit['name'] for hit in search('widget')] == ['widget', 'other']
+
+
+def test_writes_keep_index_in_sync(catalog, auth):
+    builds = f'{BASE}/api/products/{catalog[2]}/builds'
+    build = client.post(builds, json={'version': '7.1', 'target': 'riscv64'}, headers=auth).json()
+    assert [hit['id'] for hit in search('riscv64')] == [build['id']]
+    client.patch(f"{builds}/{build['id']}", params={'target': 'aarch64'}, headers=auth)
+    assert search('riscv64') == []
+    assert [hit['id'] for hit in search('aarch64')] == [build['id']]
+    client.put(
+        f'{BASE}/api/products/{catalog[2]}', json={'family': 'f', 'name': 'gizmo', 'description': ''}, headers=auth
+    )
+    assert search('thing 2') == []
+    assert [hit['id'] for hit in search('gizmo')] == [catalog[2]]
+
+
+def test_bulk_builds_are_indexed(catalog, auth):
+    client.post(f'{BASE}/api/builds/bulk', json=[{'product_id': catalog[1], 'source': 'tarball'}], headers=auth)
+    assert [hit['kind'] for hit in search('tarball')] == ['build']
+
+
+def test_search_pages(catalog):
+    everything = search('thing')
+    assert len(everything) == 3
+    first = client.get(URL, params={'q': 'thing', 'limit': 2})
+    assert first.json() == everything[:2]
+    second = client.get(first.links['next']['url'])
+    assert second.json() == everything[2:]
+    assert 'link' not in second.headers
+
+
+def test_search_prefix_and_odd_input(catalog):
+    assert search('thi') == []
+    assert len(search('thi*')) == 3
+    assert search('"thing OR (') == []
+
+
+def test_search_needs_words(catalog):
+    assert client.get(URL, params={'q': '  '}).status_code == 400
+
+
+def test_broad_search_keeps_index_order(catalog, monkeypatch):
+    monkeypatch.setattr(search_api, 'RANKED_MATCHES', 2)
+    first = client.get(URL, params={'q': 'thing', 'limit': 2})
+    assert [hit['id'] for hit in first.json()] == [catalog[2], catalog[1]]
+    assert all(hit['rank'] is None for hit in first.json())
+    monkeypatch.setattr(search_api, 'RANKED_MATCHES', 1000)  # The cursor keeps the order of the first page
+    assert [hit['id'] for hit in client.get(first.links['next']['url']).json()] == [catalog[0]]
@@ -0,0 +1,89 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+import rebuild_stats
+from db import engine
+from model import Build, Product, ProductStats
+from server import BASE, app
+
+client = TestClient(app)
+
+
+def test_stats_per_product_and_family(catalog):
+    response = client.get(f'{BASE}/api/stats/')
+    assert response.status_code == 200
+    stats = response.json()
+    first = stats['products'][0]
+    assert first['product_id'] == catalog[0] and first['name'] == 'thing-0'
+    assert first['builds'] == 5
+    assert first['first_seen'] == '2022-09-01 19:20:21.123456 +00:00'
+    assert first['latest_timestamp'] == '2022-09-05 19:20:21.123456 +00:00'
+    assert first['latest_version'] == '2022.9.4'
+    assert stats['families'] == [
+        {
+            'family': 'things',
+            'products': 3,
+            'builds': 7,
+            'first_seen': '2022-09-01 19:20:21.123456 +00:00',
+            'latest_timestamp': '2022-09-05 19:20:21.123456 +00:00',
+            'latest_version': '2022.9.4',
+            'latest_build_id': first['latest_build_id'],
+            'latest_product_id': catalog[0],
+        }
+    ]
+
+
+def test_stats_follow_writes(catalog, auth):
+    response = client.post(
+        f'{BASE}/api/products/{catalog[1]}/builds',
+        json={'version': '2023.1.0', 'timestamp': '2023-01-01 00:00:00.000000 +00:00'},
+        headers=auth,
+    )
+    assert response.status_code == 200
+    for name in ('new', 'gone'):
+        client.post(f'{BASE}/api/products/', json={'family': 'other', 'name': name, 'description': ''}, headers=auth)
+    gone = client.get(f'{BASE}/api/products/', params={'name': 'gone'}).json()[0]['id']
+    assert client.delete(f'{BASE}/api/products/{gone}', headers=auth).status_code == 204
+    stats = client.get(f'{BASE}/api/stats/').json()
+    assert [(p['name'], p['builds']) for p in stats['products']] == [
+        ('new', 0),
+        ('thing-0', 5),
+        ('thing-1', 2),
+        ('thing-2', 1),
+    ]
+    assert stats['products'][2]['latest_version'] == '2023.1.0'
+    assert [(f['family'], f['products'], f['latest_product_id']) for f in stats['families']] == [
+        ('other', 1, None),
+        ('things', 3, catalog[1]),
+    ]
+
+
+def test_stats_after_build_delete(catalog):
+    with Session(engine) as session:
+        latest = session.exec(select(Build).where(Build.version == '2022.9.4')).one()
+        session.delete(latest)
+        session.commit()
+    first = client.get(f'{BASE}/api/stats/', params={'family': 'things'}).json()['products'][0]
+    assert first['builds'] == 4 and first['latest_version'] == '2022.9.3'
+
+
+def test_stats_of_one_family(catalog):
+    with Session(engine) as session:
+        session.add(Product(family='other', name='elsewhere', description=''))
+        session.commit()
+    stats = client.get(f'{BASE}/api/stats/', params={'family': 'other'}).json()
+    assert [p['name'] for p in stats['products']] == ['elsewhere']
+    assert stats['families'] == [
+        {'family': 'other', 'products': 1, 'builds': 0}
+        | dict.fromkeys(('first_seen', 'latest_timestamp', 'latest_version', 'latest_build_id', 'latest_product_id'))
+    ]
+
+
+def test_rebuild_recomputes(catalog):
+    before = client.get(f'{BASE}/api/stats/').json()
+    with engine.begin() as connection:
+        connection.exec_driver_sql('UPDATE product_stats SET builds = 0, latest_version = NULL')
+    assert rebuild_stats.rebuild(engine) == 3
+    with Session(engine) as session:
+        assert session.get(ProductStats, catalog[0]).builds == 5
+    assert client.get(f'{BASE}/api/stats/').json() == before